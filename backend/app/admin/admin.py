@@ -6,8 +6,9 @@ from sqladmin.authentication import AuthenticationBackend
 from starlette.requests import Request
 
 from app.config import settings
-from app.database.models import User, UserProfile, Project, UserSkills, Template, CV, JobOffering, Application
+from app.database.models import User, UserProfile, Project, UserSkills, Template, CV, JobOffering, Application, GenerationJob, LLMCall, IdempotencyKey
 from app.database.setup import engine
+from app.services import job_offering_service, pdf_service, template_service, user_skills_service
 
 
 class AdminCategory(StrEnum):
@@ -130,6 +131,12 @@ class UserSkillsAdmin(EnhancedModelView, model=UserSkills):
         "raw_input",
         "source",
     ]
+    
+    async def on_model_change(self, data, model, is_created, request):
+        # El fingerprint no está en el formulario: se recalcula con el texto nuevo
+        skill_text = data.get("skill_text", model.skill_text)
+        if skill_text is not None:
+            data["fingerprint"] = user_skills_service.skill_fingerprint(skill_text)
 
 
 class TemplateAdmin(EnhancedModelView, model=Template):
@@ -156,6 +163,13 @@ class TemplateAdmin(EnhancedModelView, model=Template):
         "template_content",
         "style",
     ]
+    
+    async def after_model_change(self, data, model, is_created, request):
+        # Soltar la versión compilada anterior del template editado
+        template_service.invalidate_template_cache(model.id)
+    
+    async def after_model_delete(self, model, request):
+        template_service.invalidate_template_cache(model.id)
 
 
 class CVAdmin(EnhancedModelView, model=CV):
@@ -184,6 +198,78 @@ class CVAdmin(EnhancedModelView, model=CV):
     ]
     
     column_details_exclude_list = ["conversation_history"]
+    
+    async def after_model_change(self, data, model, is_created, request):
+        pdf_service.schedule_thumbnail(model.rendered_content)
+
+
+class GenerationJobAdmin(EnhancedModelView, model=GenerationJob):
+    category = AdminCategory.CVS
+    name = "Job de Generación"
+    name_plural = "Jobs de Generación"
+    icon = "fa-solid fa-gears"
+    can_create = False
+    can_edit = False
+    
+    column_list = [
+        "id",
+        "job_type",
+        "status",
+        "cv_id",
+        "created_at",
+        "started_at",
+        "finished_at",
+    ]
+    
+    column_searchable_list = ["error"]
+
+
+class LLMCallAdmin(EnhancedModelView, model=LLMCall):
+    category = AdminCategory.CVS
+    name = "Llamada LLM"
+    name_plural = "Llamadas LLM"
+    icon = "fa-solid fa-stopwatch"
+    can_create = False
+    can_edit = False
+    
+    column_list = [
+        "id",
+        "endpoint",
+        "user_id",
+        "model",
+        "outcome",
+        "latency_ms",
+        "input_tokens",
+        "output_tokens",
+        "cache_read_tokens",
+        "retry_count",
+        "created_at",
+    ]
+    
+    column_searchable_list = ["endpoint", "error"]
+    column_default_sort = [("created_at", True)]
+
+
+class IdempotencyKeyAdmin(EnhancedModelView, model=IdempotencyKey):
+    category = AdminCategory.CVS
+    name = "Idempotency Key"
+    name_plural = "Idempotency Keys"
+    icon = "fa-solid fa-key"
+    can_create = False
+    can_edit = False
+    
+    column_list = [
+        "id",
+        "key",
+        "endpoint",
+        "status",
+        "status_code",
+        "created_at",
+        "expires_at",
+    ]
+    
+    column_searchable_list = ["key", "endpoint"]
+    column_default_sort = [("created_at", True)]
 
 
 class JobOfferingAdmin(EnhancedModelView, model=JobOffering):
@@ -226,6 +312,12 @@ class JobOfferingAdmin(EnhancedModelView, model=JobOffering):
         "api_url",
     ]
 
+    async def on_model_change(self, data, model, is_created, request):
+        # Recalcular el texto limpio que se envía al LLM con la descripción editada
+        if "description" in data:
+            model.description = data["description"]
+        job_offering_service.normalize_description(model)
+
 
 class ApplicationAdmin(EnhancedModelView, model=Application):
     category = AdminCategory.APPLICATIONS
@@ -300,6 +392,9 @@ def setup_admin(app: FastAPI) -> Admin:
     admin.add_view(ProjectAdmin)
     admin.add_view(TemplateAdmin)
     admin.add_view(CVAdmin)
+    admin.add_view(GenerationJobAdmin)
+    admin.add_view(LLMCallAdmin)
+    admin.add_view(IdempotencyKeyAdmin)
     admin.add_view(JobOfferingAdmin)
     admin.add_view(ApplicationAdmin)
     
@@ -9,6 +9,79 @@ class Settings(BaseSettings):
     anthropic_api_key: str = ""
     admin_username: str = "admin"
     admin_password: str = "admin"
+    # Proveedor de LLM: "anthropic" o "fake" (local, sin red, para benchmarks).
+    # El fake tiene latencia log-normal (mediana en ms y sigma) y una tasa de
+    # errores 529 simulados; `fake_llm_seed` la hace reproducible
+    llm_provider: str = "anthropic"
+    fake_llm_latency_median_ms: float = 800
+    fake_llm_latency_sigma: float = 0.5
+    fake_llm_error_rate: float = 0.0
+    fake_llm_seed: int | None = None
+    # Cassettes de llamadas al LLM: "passthrough", "record" (graba en disco cada
+    # respuesta) o "replay" (responde solo desde lo grabado)
+    llm_cassette_mode: str = "passthrough"
+    llm_cassette_dir: str = "cassettes"
+    # Gobernador de llamadas al LLM (compartido por toda la app): máximo de
+    # llamadas en vuelo, presupuesto de tokens por minuto (0 = sin límite),
+    # reintentos ante 429/529 y circuit breaker
+    llm_max_in_flight: int = 8
+    llm_tokens_per_minute: int = 0
+    llm_max_retries: int = 3
+    llm_backoff_base_seconds: float = 1.0
+    llm_backoff_max_seconds: float = 30.0
+    llm_breaker_failure_threshold: int = 5
+    llm_breaker_cooldown_seconds: float = 30.0
+    # Idempotency-Key: cuánto tiempo se guarda la respuesta para replays,
+    # cuánto espera un request duplicado a que termine el original y cuánto
+    # dura la reserva de una key en curso (por si el proceso murió)
+    idempotency_ttl_seconds: int = 24 * 3600
+    idempotency_wait_seconds: int = 120
+    idempotency_lease_seconds: int = 15 * 60
+    # Extracción de perfil: los textos largos se dividen en fragmentos de hasta
+    # N caracteres que se extraen en paralelo (máximo M a la vez por request)
+    extraction_chunk_chars: int = 6000
+    extraction_max_concurrency: int = 4
+    # Skills actuales que se incluyen como contexto en el prompt de extracción:
+    # los N más relacionados con el texto (BM25), dentro de un presupuesto de tokens
+    extraction_context_skills: int = 10
+    extraction_context_token_budget: int = 400
+    # Similitud (Jaccard de trigramas de caracteres) desde la que dos skills del
+    # mismo tipo se consideran el mismo; los casi duplicados extraídos no se guardan.
+    # Las experiencias laborales usan un umbral más alto
+    skill_dedupe_threshold: float = 0.7
+    skill_dedupe_experience_threshold: float = 0.85
+    # Templates de CV compilados que se mantienen en memoria (LRU) y directorio
+    # opcional para guardar su bytecode en disco (vacío = sin cache en disco)
+    template_cache_size: int = 64
+    template_bytecode_cache_dir: str = ""
+    # Compilación de CVs a PDF con el CLI de Typst: procesos en paralelo, timeout,
+    # directorio de PDFs (por hash del código) y paquetes/fuentes locales
+    typst_binary: str = "typst"
+    typst_max_workers: int = 2
+    typst_timeout_seconds: float = 30.0
+    pdf_artifact_dir: str = "artifacts/pdf"
+    typst_package_dir: str = "typst/packages"
+    typst_font_dir: str = "typst/fonts"
+    # Edición interactiva: un proceso `typst watch` residente por CV, con un
+    # máximo de sesiones y cierre tras N segundos sin compilar
+    typst_watch_enabled: bool = False
+    typst_watch_max_sessions: int = 8
+    typst_watch_idle_seconds: float = 300.0
+    # Miniaturas de CVs (primera página en PNG) para los listados: resolución en PPI
+    thumbnail_ppi: int = 36
+    # Cantidad de workers que procesan jobs de generación de CVs en background
+    generation_workers: int = 4
+    # Un job en `running` cuyo started_at supere este plazo se da por abandonado
+    # (proceso caído) y se re-encola al iniciar otro proceso
+    generation_job_lease_seconds: int = 15 * 60
+    # Cache de generaciones de CV (respuestas idénticas para prompts idénticos)
+    llm_cache_enabled: bool = True
+    llm_cache_ttl_seconds: int = 7 * 24 * 3600
+    llm_cache_max_bytes: int = 50 * 1024 * 1024
+    # Compactación del historial del chat al regenerar: se envían textuales los
+    # últimos N turnos (dentro del presupuesto de tokens) y el resto como resumen
+    conversation_keep_turns: int = 6
+    conversation_token_budget: int = 1500
     # Comma-separated list of allowed CORS origins
     cors_origins: str = "http://localhost:5173,http://localhost:4173,http://localhost:3000,http://localhost,http://localhost:80"
 
@@ -2,7 +2,7 @@ from datetime import datetime
 from typing import Optional
 import enum
 
-from sqlalchemy import String, Text, DateTime, ForeignKey, JSON, Enum
+from sqlalchemy import String, Text, DateTime, ForeignKey, JSON, Enum, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.database.setup import Base
@@ -16,6 +16,26 @@ class SkillType(str, enum.Enum):
     EXTRA = "extra"
 
 
+class GenerationJobType(str, enum.Enum):
+    """Enum para tipos de jobs de generación"""
+    CREATE_CV = "create-cv"
+    REGENERATE_CV = "regenerate-cv"
+
+
+class GenerationJobStatus(str, enum.Enum):
+    """Enum para estados de un job de generación"""
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class IdempotencyKeyStatus(str, enum.Enum):
+    """Enum para estados de una Idempotency-Key"""
+    IN_PROGRESS = "in-progress"
+    COMPLETED = "completed"
+
+
 class User(Base):
     __tablename__ = "users"
     
@@ -66,14 +86,27 @@ class UserSkills(Base):
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False, index=True)
     skill_text: Mapped[str] = mapped_column(Text, nullable=False)
     skill_type: Mapped[SkillType] = mapped_column(Enum(SkillType), nullable=False, index=True)
+    # SHA-256 del skill_text normalizado (ver user_skills_service.skill_fingerprint);
+    # el índice único evita guardar dos veces el mismo skill. En bases anteriores a
+    # esta columna correr scripts/backfill_skill_fingerprints.py
+    fingerprint: Mapped[str] = mapped_column(String(64), nullable=False)
     raw_input: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     source: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
+    # Skill casi igual que lo reemplaza (ver skill_dedupe_service.compact_user_skills);
+    # los reemplazados no se listan ni se envían al LLM
+    superseded_by_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("user_skills.id", ondelete="SET NULL"), nullable=True
+    )
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
     )
     
     user: Mapped["User"] = relationship("User", back_populates="user_skills")
+    
+    __table_args__ = (
+        UniqueConstraint("user_id", "skill_type", "fingerprint", name="uq_user_skills_fingerprint"),
+    )
 
 
 class Project(Base):
@@ -85,6 +118,10 @@ class Project(Base):
     target_role: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     cv_style: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)
     preferences: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    # Oferta a la que apuntan los CVs del proyecto (si no se indica otra al crear el CV)
+    job_offering_id: Mapped[Optional[str]] = mapped_column(
+        ForeignKey("job_offerings.id", ondelete="SET NULL"), nullable=True, index=True
+    )
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
@@ -117,10 +154,15 @@ class CV(Base):
     project_id: Mapped[int] = mapped_column(ForeignKey("projects.id"), nullable=False, index=True)
     template_id: Mapped[int] = mapped_column(ForeignKey("templates.id"), nullable=False, index=True)
     base_cv_id: Mapped[Optional[int]] = mapped_column(ForeignKey("cvs.id"), nullable=True, index=True)
+    job_offering_id: Mapped[Optional[str]] = mapped_column(
+        ForeignKey("job_offerings.id", ondelete="SET NULL"), nullable=True, index=True
+    )
     content: Mapped[dict] = mapped_column(JSON, nullable=False)
     rendered_content: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     compiled_path: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
     conversation_history: Mapped[Optional[list]] = mapped_column(JSON, nullable=True)
+    conversation_summary: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    summarized_turns: Mapped[int] = mapped_column(nullable=False, default=0)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
@@ -144,6 +186,12 @@ class JobOffering(Base):
     keyword: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
     company_name: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
     description: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    # Descripción sin HTML, con espacios normalizados y largo acotado; se calcula
+    # al guardar la oferta y es lo que se envía al LLM
+    description_text: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    # Resumen de una línea y tokens aproximados de description_text (ver job_offering_service)
+    description_snippet: Mapped[Optional[str]] = mapped_column(String(300), nullable=True)
+    description_tokens: Mapped[Optional[int]] = mapped_column(nullable=True)
     url: Mapped[Optional[str]] = mapped_column(String(1000), nullable=True)
     salary: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
     role_name: Mapped[Optional[str]] = mapped_column(String(500), nullable=True)
@@ -186,3 +234,65 @@ class Application(Base):
     job_offering: Mapped["JobOffering"] = relationship("JobOffering", back_populates="applications")
     cv: Mapped[Optional["CV"]] = relationship("CV", back_populates="application")
 
+
+
+class GenerationJob(Base):
+    __tablename__ = "generation_jobs"
+    
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    job_type: Mapped[GenerationJobType] = mapped_column(Enum(GenerationJobType), nullable=False)
+    status: Mapped[GenerationJobStatus] = mapped_column(
+        Enum(GenerationJobStatus), nullable=False, default=GenerationJobStatus.PENDING, index=True
+    )
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False)
+    cv_id: Mapped[Optional[int]] = mapped_column(ForeignKey("cvs.id", ondelete="SET NULL"), nullable=True, index=True)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+
+class LLMCacheEntry(Base):
+    __tablename__ = "llm_cache_entries"
+    
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    model: Mapped[str] = mapped_column(String(100), nullable=False)
+    response: Mapped[dict] = mapped_column(JSON, nullable=False)
+    size_bytes: Mapped[int] = mapped_column(nullable=False)
+    hit_count: Mapped[int] = mapped_column(nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    last_accessed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+
+
+class LLMCall(Base):
+    __tablename__ = "llm_calls"
+    
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    endpoint: Mapped[str] = mapped_column(String(100), nullable=False, index=True)
+    user_id: Mapped[Optional[int]] = mapped_column(nullable=True, index=True)
+    model: Mapped[str] = mapped_column(String(100), nullable=False)
+    input_tokens: Mapped[int] = mapped_column(nullable=False, default=0)
+    output_tokens: Mapped[int] = mapped_column(nullable=False, default=0)
+    cache_read_tokens: Mapped[int] = mapped_column(nullable=False, default=0)
+    cache_write_tokens: Mapped[int] = mapped_column(nullable=False, default=0)
+    latency_ms: Mapped[int] = mapped_column(nullable=False)
+    retry_count: Mapped[int] = mapped_column(nullable=False, default=0)
+    outcome: Mapped[str] = mapped_column(String(20), nullable=False)
+    error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (UniqueConstraint("key", "endpoint", name="uq_idempotency_keys_key_endpoint"),)
+    
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    key: Mapped[str] = mapped_column(String(255), nullable=False)
+    endpoint: Mapped[str] = mapped_column(String(255), nullable=False)
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    status: Mapped[IdempotencyKeyStatus] = mapped_column(Enum(IdempotencyKeyStatus), nullable=False)
+    status_code: Mapped[Optional[int]] = mapped_column(nullable=True)
+    response: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
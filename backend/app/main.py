@@ -1,11 +1,13 @@
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from app.admin.admin import setup_admin
 from app.config import settings
 from app.database.setup import init_db
+from app.services import generation_job_service, idempotency_service, llm_governor_service, pdf_service
 from app.routers import (
     user_router,
     user_profile_router,
@@ -16,13 +18,19 @@ from app.routers import (
     application_router,
     extraction_router,
     job_offering_router,
+    generation_job_router,
+    metrics_router,
 )
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()
+    await generation_job_service.start_workers()
+    pdf_service.start()
     yield
+    await pdf_service.stop()
+    await generation_job_service.stop_workers()
 
 
 app = FastAPI(
@@ -54,10 +62,31 @@ app.include_router(cv_router.router, prefix="/api/v1", tags=["cvs"])
 app.include_router(application_router.router, prefix="/api/v1", tags=["applications"])
 app.include_router(extraction_router.router, prefix="/api/v1", tags=["extraction"])
 app.include_router(job_offering_router.router, prefix="/api/v1", tags=["job_offerings"])
+app.include_router(generation_job_router.router, prefix="/api/v1", tags=["generation_jobs"])
+app.include_router(metrics_router.router, prefix="/api/v1", tags=["metrics"])
 
 setup_admin(app)
 
 
+@app.exception_handler(llm_governor_service.LLMUnavailableError)
+async def llm_unavailable_handler(request: Request, exc: llm_governor_service.LLMUnavailableError):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(idempotency_service.IdempotencyError)
+async def idempotency_error_handler(request: Request, exc: idempotency_service.IdempotencyError):
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)})
+
+
+@app.exception_handler(pdf_service.TypstCompileError)
+async def typst_compile_error_handler(request: Request, exc: pdf_service.TypstCompileError):
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)})
+
+
 @app.get("/")
 async def root():
     return {
@@ -73,4 +102,3 @@ async def health_check():
         "status": "healthy",
         "environment": settings.environment
     }
-
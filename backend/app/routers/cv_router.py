@@ -1,45 +1,92 @@
+import json
+import logging
 from datetime import datetime
+from typing import Any, AsyncIterator
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
 
+from app.database.models import CV
 from app.database.setup import get_db
 from app.schemas.cv_schema import CVCreate, CVResponse, CVUpdate, CVRegenerateRequest
-from app.services import cv_service
+from app.services import cv_service, idempotency_service, pdf_service
 
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
 
 @router.post("/projects/{project_id}/cvs", response_model=CVResponse, status_code=201)
-def create_cv(project_id: int, cv: CVCreate, db: Session = Depends(get_db)):
+async def create_cv(
+    project_id: int,
+    cv: CVCreate,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
+    db: Session = Depends(get_db)
+):
     """
     Crea un nuevo CV con generación de LLM.
     
     - **messages**: Lista de mensajes del chat (role: "user" o "assistant", content: texto)
     - Si no se pasan mensajes, se usa un mensaje por defecto
+    - **strategy**: `single` (por defecto) genera el CV en una sola llamada;
+      `parallel` genera cada sección con una llamada independiente en paralelo
+    - **Idempotency-Key** (header, opcional): reintentos con la misma key y el
+      mismo body reciben el CV ya creado en vez de crear otro
     """
     if cv.project_id != project_id:
         raise HTTPException(status_code=400, detail="Project ID mismatch")
     
+    async def create() -> dict:
+        db_cv = await cv_service.create_cv(db, cv)
+        return _cv_response(db_cv).model_dump(mode="json")
+    
     try:
-        db_cv = cv_service.create_cv(db, cv)
-        return db_cv
+        if idempotency_key:
+            return await idempotency_service.execute(
+                db, idempotency_key, f"POST /projects/{project_id}/cvs", cv.model_dump(mode="json"), 201, create
+            )
+        db_cv = await cv_service.create_cv(db, cv)
+        return _cv_response(db_cv)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 
+@router.post("/projects/{project_id}/cvs/stream")
+def create_cv_stream(project_id: int, cv: CVCreate, db: Session = Depends(get_db)):
+    """
+    Crea un nuevo CV entregando el contenido por Server-Sent Events a medida que
+    el LLM lo genera.
+    
+    Eventos: `summary`, `experience` (uno por experiencia), `education` (uno por
+    ítem), `skills`, `chat_response` y finalmente `cv` con el CV guardado
+    (mismo formato que `POST /projects/{project_id}/cvs`). Si algo falla a mitad
+    de camino se emite `error`. El stream usa siempre una sola llamada al LLM
+    (`strategy` se ignora).
+    """
+    if cv.project_id != project_id:
+        raise HTTPException(status_code=400, detail="Project ID mismatch")
+    
+    try:
+        events = cv_service.stream_create_cv(db, cv)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    return _event_stream_response(events)
+
+
 @router.get("/cvs/{cv_id}", response_model=CVResponse)
 def get_cv(cv_id: int, db: Session = Depends(get_db)):
     cv = cv_service.get_cv(db, cv_id)
     if not cv:
         raise HTTPException(status_code=404, detail="CV not found")
-    return cv
+    return _cv_response(cv)
 
 
 @router.get("/projects/{project_id}/cvs", response_model=list[CVResponse])
 def get_project_cvs(project_id: int, db: Session = Depends(get_db)):
-    return cv_service.get_project_cvs(db, project_id)
+    return [_cv_response(cv) for cv in cv_service.get_project_cvs(db, project_id)]
 
 
 @router.patch("/cvs/{cv_id}", response_model=CVResponse)
@@ -53,7 +100,97 @@ def update_cv(cv_id: int, cv: CVUpdate, db: Session = Depends(get_db)):
     db_cv = cv_service.update_cv(db, cv_id, cv)
     if not db_cv:
         raise HTTPException(status_code=404, detail="CV not found")
-    return db_cv
+    return _cv_response(db_cv)
+
+
+@router.post("/cvs/{cv_id}/compile", response_model=CVResponse)
+async def compile_cv(cv_id: int, db: Session = Depends(get_db)):
+    """
+    Compila el CV a PDF con Typst y guarda la ruta en `compiled_path`.
+    
+    Si ya existe un PDF para el mismo código Typst se reutiliza sin compilar.
+    Responde 422 si Typst rechaza el código y 503 si el compilador no está disponible.
+    """
+    cv = cv_service.get_cv(db, cv_id)
+    if not cv:
+        raise HTTPException(status_code=404, detail="CV not found")
+    await pdf_service.compile_cv(db, cv)
+    return _cv_response(cv)
+
+
+@router.get(
+    "/cvs/{cv_id}/pdf",
+    response_class=FileResponse,
+    responses={200: {"content": {"application/pdf": {}}}, 206: {}, 304: {}},
+)
+async def download_cv_pdf(
+    cv_id: int,
+    if_none_match: str | None = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Descarga el PDF del CV, compilándolo con Typst solo si su contenido cambió.
+    
+    - **ETag**: hash del código Typst; con `If-None-Match` igual responde 304 sin compilar
+    - **Range**: soporta descargas parciales (206)
+    """
+    cv = cv_service.get_cv(db, cv_id)
+    if not cv:
+        raise HTTPException(status_code=404, detail="CV not found")
+    if cv.rendered_content is None:
+        raise HTTPException(status_code=409, detail="CV has no rendered content")
+    
+    # El cliente puede tener el PDF en cache, pero debe revalidarlo en cada vista
+    headers = {"ETag": pdf_service.etag(cv.rendered_content), "Cache-Control": "private, no-cache"}
+    if if_none_match and pdf_service.etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    
+    path = await pdf_service.compile_cv(db, cv)
+    return FileResponse(
+        path,
+        media_type="application/pdf",
+        filename=f"cv-{cv_id}.pdf",
+        content_disposition_type="inline",
+        headers=headers,
+    )
+
+
+@router.get(
+    "/cvs/{cv_id}/thumbnail",
+    response_class=FileResponse,
+    responses={200: {"content": {"image/png": {}}}, 304: {}},
+)
+async def get_cv_thumbnail(
+    cv_id: int,
+    v: str | None = Query(None, description="Versión de la miniatura (ver `thumbnail_url` del CV)"),
+    if_none_match: str | None = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Miniatura PNG de la primera página del CV, para listados.
+    
+    Con `v` igual a la versión actual (la `thumbnail_url` del CV) la URL
+    identifica un contenido que no cambia, así que se puede cachear por un año
+    (`immutable`). Sin `v` (o con una versión antigua) el cliente debe
+    revalidar con el ETag.
+    """
+    cv = cv_service.get_cv(db, cv_id)
+    if not cv:
+        raise HTTPException(status_code=404, detail="CV not found")
+    if cv.rendered_content is None:
+        raise HTTPException(status_code=409, detail="CV has no rendered content")
+    
+    etag = pdf_service.thumbnail_etag(cv.rendered_content)
+    versioned = v == pdf_service.thumbnail_version(cv.rendered_content)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "private, max-age=31536000, immutable" if versioned else "private, no-cache",
+    }
+    if if_none_match and pdf_service.etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    
+    path = await pdf_service.render_thumbnail(cv)
+    return FileResponse(path, media_type="image/png", headers=headers)
 
 
 @router.delete("/cvs/{cv_id}", status_code=204)
@@ -64,7 +201,7 @@ def delete_cv(cv_id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/cvs/{cv_id}/regenerate", response_model=CVResponse)
-def regenerate_cv(
+async def regenerate_cv(
     cv_id: int,
     request: CVRegenerateRequest,
     db: Session = Depends(get_db)
@@ -74,6 +211,10 @@ def regenerate_cv(
     
     Los nuevos mensajes se agregan al historial existente y se regenera el CV completo
     con el LLM tomando en cuenta toda la conversación.
+    
+    - **mode**: `full` (por defecto) reescribe el CV completo; `patch` pide al LLM
+      solo los cambios sobre el contenido actual (más rápido para ediciones
+      pequeñas como "acorta mi resumen")
     """
     # Convertir ChatMessage a dict
     new_messages = []
@@ -84,7 +225,63 @@ def regenerate_cv(
             "timestamp": msg.timestamp or datetime.utcnow().isoformat(),
         })
     
-    cv = cv_service.regenerate_cv(db, cv_id, new_messages)
+    cv = await cv_service.regenerate_cv(db, cv_id, new_messages, request.mode)
     if not cv:
         raise HTTPException(status_code=404, detail="CV not found")
-    return cv
+    return _cv_response(cv)
+
+
+@router.post("/cvs/{cv_id}/regenerate/stream")
+def regenerate_cv_stream(
+    cv_id: int,
+    request: CVRegenerateRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Regenera un CV entregando el contenido por Server-Sent Events
+    (mismos eventos que `POST /projects/{project_id}/cvs/stream`).
+    Siempre reescribe el CV completo: `mode` se ignora en este endpoint.
+    """
+    new_messages = []
+    for msg in request.messages:
+        new_messages.append({
+            "role": msg.role,
+            "content": msg.content,
+            "timestamp": msg.timestamp or datetime.utcnow().isoformat(),
+        })
+    
+    events = cv_service.stream_regenerate_cv(db, cv_id, new_messages)
+    if events is None:
+        raise HTTPException(status_code=404, detail="CV not found")
+    
+    return _event_stream_response(events)
+
+
+def _cv_response(cv: CV) -> CVResponse:
+    response = CVResponse.model_validate(cv)
+    if cv.rendered_content is not None:
+        version = pdf_service.thumbnail_version(cv.rendered_content)
+        response.thumbnail_url = f"/api/v1/cvs/{cv.id}/thumbnail?v={version}"
+    return response
+
+
+def _event_stream_response(events: AsyncIterator[tuple[str, Any]]) -> StreamingResponse:
+    async def body():
+        try:
+            async for event, data in events:
+                if event == "cv":
+                    data = _cv_response(data).model_dump(mode="json")
+                yield _format_sse(event, data)
+        except Exception as e:
+            logger.exception("CV stream failed")
+            yield _format_sse("error", {"detail": str(e)})
+    
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _format_sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -1,18 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 from sqlalchemy.orm import Session
 
 from app.database.setup import get_db
 from app.schemas.extraction_schema import ExtractProfileRequest, ExtractProfileResponse
-from app.services import extraction_service
+from app.services import extraction_service, idempotency_service, llm_governor_service
 
 
 router = APIRouter()
 
 
 @router.post("/users/{user_id}/extract-profile", response_model=ExtractProfileResponse, status_code=status.HTTP_200_OK)
-def extract_and_update_profile(
+async def extract_and_update_profile(
     user_id: int,
     request: ExtractProfileRequest,
+    idempotency_key: str | None = Header(None, alias="Idempotency-Key"),
     db: Session = Depends(get_db)
 ):
     """
@@ -22,6 +23,8 @@ def extract_and_update_profile(
     - Considera la información actual para evitar redundancias
     - Actualiza o crea UserProfile si encuentra datos relevantes
     - Agrega nuevos UserSkills sin duplicar los existentes
+    - **Idempotency-Key** (header, opcional): reintentos con la misma key y el
+      mismo texto reciben la respuesta original sin volver a extraer ni agregar skills
     
     **Ejemplos de texto válido:**
     - CV completo
@@ -35,39 +38,58 @@ def extract_and_update_profile(
     - Certificaciones → skill_type: "certificate"
     - Otros (idiomas, soft skills) → skill_type: "extra"
     """
+    async def extract() -> dict:
+        response = await _extract_and_apply(db, user_id, request.text)
+        return response.model_dump(mode="json")
+    
     try:
-        # Extraer datos con LLM
-        extracted_data = extraction_service.extract_profile_data(db, user_id, request.text)
-        
-        # Aplicar los datos extraídos
-        result = extraction_service.apply_extracted_data(db, user_id, extracted_data)
-        
-        # Construir mensaje de respuesta
-        if result["skills_added"] == 0 and not result["profile_updated"] and not result["profile_created"]:
-            message = "No se encontró información nueva para agregar"
-        else:
-            parts = []
-            if result["profile_created"]:
-                parts.append("perfil creado")
-            elif result["profile_updated"]:
-                parts.append("perfil actualizado")
-            if result["skills_added"] > 0:
-                parts.append(f"{result['skills_added']} skills agregados")
-            message = "Éxito: " + ", ".join(parts)
-        
-        return ExtractProfileResponse(
-            message=message,
-            profile_updated=result["profile_updated"],
-            profile_created=result["profile_created"],
-            skills_added=result["skills_added"],
-            details=result["details"]
-        )
+        if idempotency_key:
+            return await idempotency_service.execute(
+                db,
+                idempotency_key,
+                f"POST /users/{user_id}/extract-profile",
+                request.model_dump(mode="json"),
+                status.HTTP_200_OK,
+                extract,
+            )
+        return await _extract_and_apply(db, user_id, request.text)
         
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except (llm_governor_service.LLMUnavailableError, idempotency_service.IdempotencyError):
+        # Se responden con su propio código (ver handlers en main)
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error extracting profile data: {str(e)}"
         )
 
+
+async def _extract_and_apply(db: Session, user_id: int, text: str) -> ExtractProfileResponse:
+    # Extraer datos con LLM
+    extracted_data = await extraction_service.extract_profile_data(db, user_id, text)
+    
+    # Aplicar los datos extraídos
+    result = extraction_service.apply_extracted_data(db, user_id, extracted_data)
+    
+    # Construir mensaje de respuesta
+    if result["skills_added"] == 0 and not result["profile_updated"] and not result["profile_created"]:
+        message = "No se encontró información nueva para agregar"
+    else:
+        parts = []
+        if result["profile_created"]:
+            parts.append("perfil creado")
+        elif result["profile_updated"]:
+            parts.append("perfil actualizado")
+        if result["skills_added"] > 0:
+            parts.append(f"{result['skills_added']} skills agregados")
+        message = "Éxito: " + ", ".join(parts)
+    
+    return ExtractProfileResponse(
+        message=message,
+        profile_updated=result["profile_updated"],
+        profile_created=result["profile_created"],
+        skills_added=result["skills_added"],
+        details=result["details"]
+    )
@@ -0,0 +1,78 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.orm import Session
+
+from app.database.setup import get_db
+from app.schemas.cv_schema import CVCreate, CVRegenerateRequest
+from app.schemas.generation_job_schema import GenerationJobResponse
+from app.services import generation_job_service
+
+
+router = APIRouter()
+
+
+@router.post(
+    "/projects/{project_id}/cvs/jobs",
+    response_model=GenerationJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def enqueue_create_cv(project_id: int, cv: CVCreate, response: Response, db: Session = Depends(get_db)):
+    """
+    Encola la creación de un CV y responde de inmediato con el job.
+    
+    El estado se consulta en `GET /generation-jobs/{job_id}`; al terminar,
+    `cv_id` apunta al CV generado.
+    """
+    if cv.project_id != project_id:
+        raise HTTPException(status_code=400, detail="Project ID mismatch")
+    
+    try:
+        job = generation_job_service.enqueue_create_cv(db, cv)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    generation_job_service.dispatch(job.id)
+    response.headers["Location"] = f"/api/v1/generation-jobs/{job.id}"
+    return job
+
+
+@router.post(
+    "/cvs/{cv_id}/regenerate/jobs",
+    response_model=GenerationJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def enqueue_regenerate_cv(
+    cv_id: int,
+    request: CVRegenerateRequest,
+    response: Response,
+    db: Session = Depends(get_db)
+):
+    """Encola la regeneración de un CV con nuevos mensajes del chat."""
+    new_messages = []
+    for msg in request.messages:
+        new_messages.append({
+            "role": msg.role,
+            "content": msg.content,
+            "timestamp": msg.timestamp or datetime.utcnow().isoformat(),
+        })
+    
+    try:
+        job = generation_job_service.enqueue_regenerate_cv(db, cv_id, new_messages, request.mode)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    generation_job_service.dispatch(job.id)
+    response.headers["Location"] = f"/api/v1/generation-jobs/{job.id}"
+    return job
+
+
+@router.get("/generation-jobs/{job_id}", response_model=GenerationJobResponse)
+def get_generation_job(job_id: int, db: Session = Depends(get_db)):
+    job = generation_job_service.get_generation_job(db, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Generation job {job_id} not found"
+        )
+    return job
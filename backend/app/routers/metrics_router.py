@@ -0,0 +1,70 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.database.setup import get_db
+from app.schemas.metrics_schema import (
+    LLMCacheStatsResponse,
+    LLMCallStatsResponse,
+    LLMGovernorStatsResponse,
+    PDFCompilerStatsResponse,
+    TemplateCacheStatsResponse,
+)
+from app.services import (
+    llm_cache_service,
+    llm_governor_service,
+    llm_telemetry_service,
+    pdf_service,
+    template_service,
+)
+
+
+router = APIRouter()
+
+
+@router.get("/metrics/llm-cache", response_model=LLMCacheStatsResponse)
+def get_llm_cache_stats(db: Session = Depends(get_db)):
+    """
+    Estado del cache de generaciones de CV.
+    
+    `hits` y `misses` cuentan desde el último reinicio del proceso; `entries` y
+    `size_bytes` reflejan lo que hay guardado en la base de datos.
+    """
+    return llm_cache_service.get_cache_stats(db)
+
+
+@router.get("/metrics/llm-calls", response_model=list[LLMCallStatsResponse])
+def get_llm_call_stats(
+    days: int = Query(7, ge=1, le=90, description="Number of days to include, counting today"),
+    endpoint: str | None = Query(None, description="Only include this LLM endpoint (e.g. generate_cv)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Latencia (p50/p95/p99) y tokens de las llamadas al LLM, agrupados por día y endpoint.
+    
+    Endpoints registrados: `generate_cv`, `stream_cv`, `summarize_conversation`, `extract_profile`.
+    """
+    return llm_telemetry_service.get_call_stats(db, days=days, endpoint=endpoint)
+
+
+@router.get("/metrics/llm-governor", response_model=LLMGovernorStatsResponse)
+def get_llm_governor_stats():
+    """
+    Estado actual del gobernador de llamadas al LLM: llamadas en vuelo, largo de
+    la cola, tokens consumidos en el último minuto y estado del circuit breaker.
+    """
+    return llm_governor_service.get_governor_stats()
+
+
+@router.get("/metrics/template-cache", response_model=TemplateCacheStatsResponse)
+def get_template_cache_stats():
+    """Templates de CV compilados en memoria y aciertos del cache."""
+    return template_service.get_template_cache_stats()
+
+
+@router.get("/metrics/pdf-compiler", response_model=PDFCompilerStatsResponse)
+def get_pdf_compiler_stats():
+    """
+    Estado del pool de compilación a PDF: procesos en curso, largo de la cola,
+    compilaciones, aciertos del almacén por hash y percentiles de tiempo.
+    """
+    return pdf_service.get_compiler_stats()
@@ -11,7 +11,10 @@ router = APIRouter()
 
 @router.post("/projects", response_model=ProjectResponse, status_code=status.HTTP_201_CREATED)
 def create_project(project_data: ProjectCreate, user_id: int, db: Session = Depends(get_db)):
-    project = project_service.create_project(db, user_id, project_data)
+    try:
+        project = project_service.create_project(db, user_id, project_data)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     return project
 
 
@@ -34,7 +37,10 @@ def get_user_projects(user_id: int, db: Session = Depends(get_db)):
 
 @router.patch("/projects/{project_id}", response_model=ProjectResponse)
 def update_project(project_id: int, project_data: ProjectUpdate, db: Session = Depends(get_db)):
-    project = project_service.update_project(db, project_id, project_data)
+    try:
+        project = project_service.update_project(db, project_id, project_data)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     if not project:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -40,7 +40,10 @@ def get_user_skills_by_user(user_id: int, db: Session = Depends(get_db)):
 
 @router.patch("/skills/{skills_id}", response_model=UserSkillsResponse)
 def update_user_skills(skills_id: int, skills_data: UserSkillsUpdate, db: Session = Depends(get_db)):
-    skills = user_skills_service.update_user_skills(db, skills_id, skills_data)
+    try:
+        skills = user_skills_service.update_user_skills(db, skills_id, skills_data)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     if not skills:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
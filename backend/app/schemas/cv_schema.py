@@ -1,6 +1,8 @@
 from datetime import datetime
 from pydantic import BaseModel, ConfigDict
 
+from app.types.cv_types import CVGenerationStrategy, CVRegenerateMode
+
 
 class ChatMessage(BaseModel):
     """Mensaje individual del chat"""
@@ -13,7 +15,9 @@ class CVCreate(BaseModel):
     project_id: int
     template_id: int
     base_cv_id: int | None = None
+    job_offering_id: str | None = None  # Si no se indica, se usa la oferta del proyecto
     messages: list[ChatMessage] = []  # Lista de mensajes del chat
+    strategy: CVGenerationStrategy = CVGenerationStrategy.SINGLE
 
 
 class CVResponse(BaseModel):
@@ -21,10 +25,14 @@ class CVResponse(BaseModel):
     project_id: int
     template_id: int
     base_cv_id: int | None
+    job_offering_id: str | None = None
     content: dict
     rendered_content: str | None
     compiled_path: str | None
     conversation_history: list | None
+    conversation_summary: str | None = None
+    # URL versionada de la miniatura (cacheable indefinidamente); la completa el router
+    thumbnail_url: str | None = None
     created_at: datetime
     updated_at: datetime
     
@@ -39,3 +47,4 @@ class CVUpdate(BaseModel):
 class CVRegenerateRequest(BaseModel):
     """Request para regenerar un CV con nuevos mensajes"""
     messages: list[ChatMessage]  # Nuevos mensajes para iterar
+    mode: CVRegenerateMode = CVRegenerateMode.FULL
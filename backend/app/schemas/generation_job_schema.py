@@ -0,0 +1,17 @@
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict
+
+from app.database.models import GenerationJobType, GenerationJobStatus
+
+
+class GenerationJobResponse(BaseModel):
+    id: int
+    job_type: GenerationJobType
+    status: GenerationJobStatus
+    cv_id: int | None
+    error: str | None
+    created_at: datetime
+    started_at: datetime | None
+    finished_at: datetime | None
+    
+    model_config = ConfigDict(from_attributes=True)
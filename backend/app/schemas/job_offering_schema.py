@@ -26,6 +26,9 @@ class JobOfferingResponse(BaseModel):
     keyword: str
     company_name: str | None
     description: str | None
+    description_text: str | None = None
+    description_snippet: str | None = None
+    description_tokens: int | None = None
     url: str | None
     salary: str | None
     role_name: str | None
@@ -0,0 +1,59 @@
+from datetime import date
+from pydantic import BaseModel
+
+
+class LLMCacheStatsResponse(BaseModel):
+    """Contadores del cache de generaciones LLM"""
+    hits: int
+    misses: int
+    hit_rate: float
+    entries: int
+    size_bytes: int
+
+
+class LLMCallStatsResponse(BaseModel):
+    """Agregado de llamadas al LLM para un día y endpoint"""
+    day: date
+    endpoint: str
+    calls: int
+    errors: int
+    retries: int
+    latency_p50_ms: int
+    latency_p95_ms: int
+    latency_p99_ms: int
+    input_tokens: int
+    output_tokens: int
+    cache_read_tokens: int
+    cache_write_tokens: int
+
+
+class LLMGovernorStatsResponse(BaseModel):
+    in_flight: int
+    max_in_flight: int
+    queue_depth: int
+    tokens_last_minute: int
+    tokens_per_minute: int  # 0 = sin límite
+    breaker_state: str  # "closed", "open" o "half-open"
+    consecutive_failures: int
+    retry_after_seconds: int
+
+
+class TemplateCacheStatsResponse(BaseModel):
+    """Cache en memoria de templates de CV compilados (contadores desde el último reinicio)"""
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+
+
+class PDFCompilerStatsResponse(BaseModel):
+    """Pool de compilación Typst a PDF (contadores desde el último reinicio)"""
+    in_flight: int
+    max_workers: int
+    queue_depth: int
+    compiles: int
+    cache_hits: int
+    errors: int
+    compile_p50_ms: int  # Sobre las últimas compilaciones
+    compile_p95_ms: int
+    watch_sessions: int  # Procesos `typst watch` residentes
@@ -7,6 +7,7 @@ class ProjectCreate(BaseModel):
     target_role: str | None = None
     cv_style: str | None = None
     preferences: dict | None = None
+    job_offering_id: str | None = None
 
 
 class ProjectResponse(BaseModel):
@@ -16,6 +17,7 @@ class ProjectResponse(BaseModel):
     target_role: str | None
     cv_style: str | None
     preferences: dict | None
+    job_offering_id: str | None = None
     created_at: datetime
     updated_at: datetime
     
@@ -27,4 +29,5 @@ class ProjectUpdate(BaseModel):
     target_role: str | None = None
     cv_style: str | None = None
     preferences: dict | None = None
+    job_offering_id: str | None = None
 
@@ -0,0 +1,58 @@
+"""
+Utilidades compartidas por los servicios que acotan trabajo concurrente
+(`llm_governor_service`, `pdf_service`) y reportan latencias
+(`llm_telemetry_service`).
+"""
+import asyncio
+import math
+from collections import deque
+
+
+class FIFOSlots:
+    """
+    Cupos de concurrencia con cola FIFO: como `asyncio.Semaphore`, pero quien
+    llega primero entra primero, y se puede leer cuántos esperan.
+    """
+    
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+    
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+    
+    async def acquire(self) -> None:
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return
+        
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # El cupo ya se había traspasado a esta llamada
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+    
+    def release(self) -> None:
+        # El cupo pasa directo al primero de la cola (in_flight no cambia)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+def percentile(sorted_values: list[int], percentile: int) -> int:
+    """Percentil por el método nearest-rank."""
+    if not sorted_values:
+        return 0
+    rank = max(math.ceil(percentile / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
@@ -0,0 +1,64 @@
+"""
+Compactación del historial de chat de un CV.
+
+El historial completo se sigue guardando en `CV.conversation_history`, pero al
+LLM solo se le envían los turnos recientes; los más antiguos se reemplazan por
+un resumen acumulado (`CV.conversation_summary`) que se actualiza de forma
+incremental. `CV.summarized_turns` indica cuántos turnos del inicio del
+historial ya están incorporados en el resumen.
+"""
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.models import CV
+from app.services import llm_service
+
+
+def estimate_tokens(text: str) -> int:
+    """Aproximación barata de tokens (~4 caracteres por token)."""
+    return len(text) // 4 + 1
+
+
+def select_recent_turns(
+    history: list[dict],
+    keep_turns: int,
+    token_budget: int,
+) -> int:
+    """
+    Retorna el índice desde el cual se envían turnos textuales: a lo más
+    `keep_turns` turnos y dentro de `token_budget`. El último turno se envía siempre.
+    """
+    start = len(history)
+    used = 0
+    while start > 0 and len(history) - start < keep_turns:
+        cost = estimate_tokens(history[start - 1]["content"])
+        if start < len(history) and used + cost > token_budget:
+            break
+        used += cost
+        start -= 1
+    return start
+
+
+async def compact_history(db: Session, cv: CV, history: list[dict]) -> list[dict]:
+    """
+    Actualiza el resumen del CV con los turnos que quedaron fuera de la ventana
+    reciente y retorna los turnos que deben ir textuales en el prompt.
+    """
+    start = select_recent_turns(
+        history,
+        settings.conversation_keep_turns,
+        settings.conversation_token_budget,
+    )
+    summarized = cv.summarized_turns or 0
+    
+    if start > summarized:
+        cv.conversation_summary = await llm_service.summarize_conversation(
+            db,
+            previous_summary=cv.conversation_summary,
+            turns=history[summarized:start],
+            user_id=cv.project.user_id,
+        )
+        cv.summarized_turns = start
+        summarized = start
+    
+    return history[summarized:]
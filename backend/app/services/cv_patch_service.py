@@ -0,0 +1,93 @@
+"""
+Aplicación de patches (estilo JSON-Patch, RFC 6902) sobre el contenido de un CV.
+
+Soporta `add`, `remove` y `replace` con rutas JSON Pointer. El resultado se
+valida contra `GeneratedCVContentSimple`; cualquier problema (ruta inexistente,
+índice fuera de rango, contenido inválido) se reporta como ValueError.
+"""
+import copy
+from typing import Any
+
+from app.types.cv_content_types import CVPatchOperation, GeneratedCVContentSimple, GeneratedCVPatch
+
+
+def apply_cv_patch(content: dict, patch: GeneratedCVPatch) -> GeneratedCVContentSimple:
+    """
+    Aplica las operaciones de `patch` sobre una copia de `content` y retorna el
+    contenido resultante validado (con el `chat_response` del patch).
+    """
+    document = copy.deepcopy(content)
+    for operation in patch.operations:
+        _apply_operation(document, operation)
+    
+    document["chat_response"] = patch.chat_response
+    # ValidationError de pydantic es subclase de ValueError
+    return GeneratedCVContentSimple.model_validate(document)
+
+
+def _apply_operation(document: dict, operation: CVPatchOperation) -> None:
+    tokens = _parse_pointer(operation.path)
+    if not tokens:
+        raise ValueError("Patch operations cannot target the whole document")
+    if tokens[0] == "chat_response":
+        raise ValueError("chat_response cannot be patched")
+    
+    parent = document
+    for token in tokens[:-1]:
+        parent = _child(parent, token, operation.path)
+    key = tokens[-1]
+    
+    if isinstance(parent, list):
+        _apply_to_list(parent, key, operation)
+    elif isinstance(parent, dict):
+        _apply_to_dict(parent, key, operation)
+    else:
+        raise ValueError(f"Invalid patch path {operation.path}")
+
+
+def _apply_to_list(parent: list, key: str, operation: CVPatchOperation) -> None:
+    if operation.op == "add":
+        index = len(parent) if key == "-" else _list_index(key, len(parent) + 1, operation.path)
+        parent.insert(index, operation.value)
+        return
+    
+    index = _list_index(key, len(parent), operation.path)
+    if operation.op == "remove":
+        del parent[index]
+    else:
+        parent[index] = operation.value
+
+
+def _apply_to_dict(parent: dict, key: str, operation: CVPatchOperation) -> None:
+    if operation.op == "add":
+        parent[key] = operation.value
+        return
+    
+    if key not in parent:
+        raise ValueError(f"Invalid patch path {operation.path}")
+    if operation.op == "remove":
+        del parent[key]
+    else:
+        parent[key] = operation.value
+
+
+def _child(node: Any, token: str, path: str) -> Any:
+    if isinstance(node, list):
+        return node[_list_index(token, len(node), path)]
+    if isinstance(node, dict) and token in node:
+        return node[token]
+    raise ValueError(f"Invalid patch path {path}")
+
+
+def _list_index(token: str, size: int, path: str) -> int:
+    if not token.isdigit() or int(token) >= size:
+        raise ValueError(f"Invalid patch path {path}")
+    return int(token)
+
+
+def _parse_pointer(path: str) -> list[str]:
+    if path == "":
+        return []
+    if not path.startswith("/"):
+        raise ValueError(f"Invalid patch path {path}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in path[1:].split("/")]
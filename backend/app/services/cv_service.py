@@ -1,94 +1,68 @@
-from typing import Optional
+import asyncio
+import hashlib
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Optional
 from datetime import datetime
 
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from sqlalchemy.orm.attributes import flag_modified
 
-from app.database.models import CV, User, UserSkills, Project, Template
+from app.database.models import CV, User, Project, Template
 from app.schemas.cv_schema import CVCreate, CVUpdate
-from app.services import llm_service, template_service
+from app.services import (
+    conversation_service,
+    cv_patch_service,
+    job_offering_service,
+    llm_service,
+    pdf_service,
+    template_service,
+    user_skills_service,
+)
+from app.types.cv_content_types import GeneratedCVContentSimple
+from app.types.cv_types import CVGenerationContext, CVGenerationStrategy, CVRegenerateMode
 
 
-def create_cv(db: Session, cv_data: CVCreate) -> CV:
+logger = logging.getLogger(__name__)
+
+# Regeneraciones en curso por (cv_id, hash de los mensajes nuevos) y locks por
+# CV. Solo coordinan requests dentro del mismo proceso.
+_inflight_regenerations: dict[tuple[int, str], asyncio.Future] = {}
+_cv_locks: dict[int, asyncio.Lock] = {}
+_cv_lock_users: dict[int, int] = {}
+
+
+async def create_cv(db: Session, cv_data: CVCreate) -> CV:
     """
     Crea un nuevo CV con generación automática de contenido usando LLM.
-    """
-    template = db.query(Template).filter(Template.id == cv_data.template_id).first()
-    if not template:
-        raise ValueError(f"Template {cv_data.template_id} not found")
     
-    project = db.query(Project).filter(Project.id == cv_data.project_id).first()
-    if not project:
-        raise ValueError(f"Project {cv_data.project_id} not found")
-    
-    user = db.query(User).filter(User.id == project.user_id).first()
-    if not user:
-        raise ValueError(f"User {project.user_id} not found")
-    
-    user_skills = db.query(UserSkills).filter(UserSkills.user_id == user.id).all()
-    
-    base_cv = None
-    if cv_data.base_cv_id:
-        base_cv = db.query(CV).filter(CV.id == cv_data.base_cv_id).first()
-    
-    # TODO: Obtener company_info cuando tengamos las tablas Empresa/JobOffer
-    company_info = None
-    
-    # Convertir messages a formato interno
-    conversation_history = []
-    for msg in cv_data.messages:
-        conversation_history.append({
-            "role": msg.role,
-            "content": msg.content,
-            "timestamp": msg.timestamp or datetime.utcnow().isoformat(),
-        })
-    
-    # Si no hay mensajes, agregar uno por defecto
-    if not conversation_history:
-        conversation_history.append({
-            "role": "user",
-            "content": "Generar CV profesional",
-            "timestamp": datetime.utcnow().isoformat(),
-        })
+    Con `strategy=parallel` cada sección se genera con una llamada independiente
+    y en paralelo (ver `llm_service.generate_cv_content_parallel`).
+    """
+    context = _build_create_context(db, cv_data)
     
-    generated_content = llm_service.generate_cv_content(
-        db=db,
-        user=user,
-        user_skills=user_skills,
-        project=project,
-        base_cv=base_cv,
-        company_info=company_info,
-        conversation_history=conversation_history,
-    )
+    if cv_data.strategy == CVGenerationStrategy.PARALLEL:
+        generated_content = await llm_service.generate_cv_content_parallel(db=db, **context.llm_kwargs())
+    else:
+        generated_content = await llm_service.generate_cv_content(db=db, **context.llm_kwargs())
     
-    content_dict = generated_content.model_dump()
+    return _save_new_cv(db, cv_data, context, generated_content)
     
-    # Extraer la respuesta del chat antes de guardar el contenido
-    chat_response = content_dict.pop('chat_response', None)
     
-    rendered_content = template_service.render_template(template, content_dict)
+def stream_create_cv(db: Session, cv_data: CVCreate) -> AsyncIterator[tuple[str, Any]]:
+    """
+    Variante de `create_cv` que entrega eventos `(nombre, datos)` a medida que el
+    LLM completa cada sección. El último evento es `("cv", CV)` con el CV guardado.
     
-    # Agregar la respuesta del asistente al historial
-    if chat_response:
-        conversation_history.append({
-            "role": "assistant",
-            "content": chat_response,
-            "timestamp": datetime.utcnow().isoformat(),
-        })
+    Valida template/proyecto/usuario antes de empezar (lanza ValueError).
+    """
+    context = _build_create_context(db, cv_data)
     
-    db_cv = CV(
-        project_id=cv_data.project_id,
-        template_id=cv_data.template_id,
-        base_cv_id=cv_data.base_cv_id,
-        content=content_dict,
-        rendered_content=rendered_content,
-        conversation_history=conversation_history,
+    return _stream_and_save(
+        db, context, lambda content: _save_new_cv(db, cv_data, context, content)
     )
-    
-    db.add(db_cv)
-    db.commit()
-    db.refresh(db_cv)
-    return db_cv
 
 
 def get_cv(db: Session, cv_id: int) -> Optional[CV]:
@@ -127,9 +101,13 @@ def update_cv(db: Session, cv_id: int, cv_data: CVUpdate) -> Optional[CV]:
         template = db.query(Template).filter(Template.id == cv.template_id).first()
         if template:
             cv.rendered_content = template_service.render_template(template, cv.content)
+            # El PDF compilado corresponde al contenido anterior
+            cv.compiled_path = None
     
     db.commit()
     db.refresh(cv)
+    if content_changed:
+        pdf_service.schedule_thumbnail(cv.rendered_content)
     return cv
 
 
@@ -143,18 +121,214 @@ def delete_cv(db: Session, cv_id: int) -> bool:
     return True
 
 
-def regenerate_cv(
+async def regenerate_cv(
     db: Session,
     cv_id: int,
-    new_messages: list[dict]
+    new_messages: list[dict],
+    mode: CVRegenerateMode = CVRegenerateMode.FULL,
 ) -> Optional[CV]:
     """
     Regenera un CV existente con nuevos mensajes del chat.
+    
+    En modo `patch` el LLM devuelve solo los cambios sobre el contenido actual.
+    Si el patch no se puede aplicar o el resultado no es válido, se regenera el
+    CV completo.
+    
+    Requests idénticos concurrentes (mismo CV, mismos mensajes y modo, ej. un
+    doble submit) comparten una sola generación. Regeneraciones distintas del
+    mismo CV se ejecutan una después de la otra.
+    """
+    key = (cv_id, _regeneration_fingerprint(new_messages, mode))
+    
+    inflight = _inflight_regenerations.get(key)
+    if inflight is not None:
+        try:
+            regenerated_id = await asyncio.shield(inflight)
+        except asyncio.CancelledError:
+            if not inflight.cancelled():
+                raise
+            # Se canceló la generación que estábamos esperando: intentar de nuevo
+            return await regenerate_cv(db, cv_id, new_messages, mode)
+        return _reload_cv(db, regenerated_id)
+    
+    future = asyncio.get_running_loop().create_future()
+    future.add_done_callback(_consume_exception)
+    _inflight_regenerations[key] = future
+    try:
+        async with _cv_lock(cv_id):
+            cv = await _regenerate_cv(db, cv_id, new_messages, mode)
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(cv.id if cv else None)
+        return cv
+    finally:
+        _inflight_regenerations.pop(key, None)
+
+
+def stream_regenerate_cv(
+    db: Session,
+    cv_id: int,
+    new_messages: list[dict]
+) -> Optional[AsyncIterator[tuple[str, Any]]]:
+    """
+    Variante de `regenerate_cv` que entrega eventos por sección (ver `stream_create_cv`).
+    Retorna None si el CV no existe. Se serializa con las demás regeneraciones
+    del mismo CV, pero no se comparte con requests idénticos.
     """
     cv = get_cv(db, cv_id)
     if not cv:
         return None
     
+    async def events():
+        # Espera a otras regeneraciones del mismo CV y parte de su resultado
+        async with _cv_lock(cv_id):
+            db.refresh(cv)
+            context = _build_regenerate_context(db, cv, new_messages)
+            if not context:
+                raise ValueError(f"Project {cv.project_id} not found")
+    
+            await _compact_history(db, cv, context)
+            async for event in _stream_and_save(
+                db, context, lambda content: _save_regenerated_cv(db, cv, context, content)
+            ):
+                yield event
+    
+    return events()
+
+
+async def _regenerate_cv(
+    db: Session,
+    cv_id: int,
+    new_messages: list[dict],
+    mode: CVRegenerateMode,
+) -> Optional[CV]:
+    cv = get_cv(db, cv_id)
+    if not cv:
+        return None
+    
+    context = _build_regenerate_context(db, cv, new_messages)
+    if not context:
+        return None
+    
+    await _compact_history(db, cv, context)
+    
+    generated_content = None
+    if mode == CVRegenerateMode.PATCH and cv.content:
+        generated_content = await _generate_patched_content(db, cv, context)
+    if generated_content is None:
+        generated_content = await llm_service.generate_cv_content(db=db, **context.llm_kwargs())
+    
+    return _save_regenerated_cv(db, cv, context, generated_content)
+
+
+@asynccontextmanager
+async def _cv_lock(cv_id: int) -> AsyncIterator[None]:
+    """Serializa las regeneraciones de un mismo CV dentro del proceso."""
+    lock = _cv_locks.setdefault(cv_id, asyncio.Lock())
+    _cv_lock_users[cv_id] = _cv_lock_users.get(cv_id, 0) + 1
+    try:
+        async with lock:
+            yield
+    finally:
+        _cv_lock_users[cv_id] -= 1
+        if not _cv_lock_users[cv_id]:
+            del _cv_lock_users[cv_id]
+            del _cv_locks[cv_id]
+
+
+def _regeneration_fingerprint(new_messages: list[dict], mode: CVRegenerateMode) -> str:
+    """Hash de los mensajes nuevos (sin timestamps, que cambian en cada request)."""
+    payload = json.dumps(
+        {
+            "mode": CVRegenerateMode(mode).value,
+            "messages": [(msg["role"], msg["content"]) for msg in new_messages],
+        },
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _reload_cv(db: Session, cv_id: Optional[int]) -> Optional[CV]:
+    if cv_id is None:
+        return None
+    cv = get_cv(db, cv_id)
+    if cv:
+        db.refresh(cv)
+    return cv
+
+
+def _consume_exception(future: asyncio.Future) -> None:
+    # Evita el warning "exception was never retrieved" cuando nadie más esperaba
+    if not future.cancelled():
+        future.exception()
+
+
+def _build_create_context(db: Session, cv_data: CVCreate) -> CVGenerationContext:
+    template = db.query(Template).filter(Template.id == cv_data.template_id).first()
+    if not template:
+        raise ValueError(f"Template {cv_data.template_id} not found")
+    
+    project = db.query(Project).filter(Project.id == cv_data.project_id).first()
+    if not project:
+        raise ValueError(f"Project {cv_data.project_id} not found")
+    
+    user = db.query(User).filter(User.id == project.user_id).first()
+    if not user:
+        raise ValueError(f"User {project.user_id} not found")
+    
+    user_skills = user_skills_service.get_user_skills_by_user(db, user.id)
+    
+    base_cv = None
+    if cv_data.base_cv_id:
+        base_cv = db.query(CV).filter(CV.id == cv_data.base_cv_id).first()
+    
+    # La oferta del request tiene prioridad sobre la del proyecto
+    job_offering_id = cv_data.job_offering_id or project.job_offering_id
+    company_info = None
+    if job_offering_id:
+        job_offering = job_offering_service.get_job_offering(db, job_offering_id)
+        if not job_offering:
+            raise ValueError(f"Job offering {job_offering_id} not found")
+        company_info = job_offering_service.build_company_info(db, job_offering)
+    
+    # Convertir messages a formato interno
+    conversation_history = []
+    for msg in cv_data.messages:
+        conversation_history.append({
+            "role": msg.role,
+            "content": msg.content,
+            "timestamp": msg.timestamp or datetime.utcnow().isoformat(),
+        })
+    
+    # Si no hay mensajes, agregar uno por defecto
+    if not conversation_history:
+        conversation_history.append({
+            "role": "user",
+            "content": "Generar CV profesional",
+            "timestamp": datetime.utcnow().isoformat(),
+        })
+    
+    return CVGenerationContext(
+        template=template,
+        project=project,
+        user=user,
+        user_skills=user_skills,
+        base_cv=base_cv,
+        company_info=company_info,
+        conversation_history=conversation_history,
+    )
+
+
+def _build_regenerate_context(
+    db: Session,
+    cv: CV,
+    new_messages: list[dict]
+) -> Optional[CVGenerationContext]:
     project = db.query(Project).filter(Project.id == cv.project_id).first()
     if not project:
         return None
@@ -163,10 +337,14 @@ def regenerate_cv(
     if not user:
         return None
     
-    user_skills = db.query(UserSkills).filter(UserSkills.user_id == user.id).all()
+    user_skills = user_skills_service.get_user_skills_by_user(db, user.id)
     template = db.query(Template).filter(Template.id == cv.template_id).first()
     
     company_info = None
+    job_offering_id = cv.job_offering_id or project.job_offering_id
+    job_offering = job_offering_service.get_job_offering(db, job_offering_id) if job_offering_id else None
+    if job_offering:
+        company_info = job_offering_service.build_company_info(db, job_offering)
     
     # Agregar nuevos mensajes al historial existente
     if cv.conversation_history is None:
@@ -175,16 +353,85 @@ def regenerate_cv(
     updated_history = cv.conversation_history.copy()
     updated_history.extend(new_messages)
     
-    generated_content = llm_service.generate_cv_content(
-        db=db,
+    return CVGenerationContext(
+        template=template,
+        project=project,
         user=user,
         user_skills=user_skills,
-        project=project,
         base_cv=cv,
         company_info=company_info,
         conversation_history=updated_history,
     )
     
+
+async def _compact_history(db: Session, cv: CV, context: CVGenerationContext) -> None:
+    """
+    Limita los turnos que se envían al LLM; los antiguos quedan resumidos en el CV.
+    """
+    context.prompt_history = await conversation_service.compact_history(
+        db, cv, context.conversation_history
+    )
+    context.conversation_summary = cv.conversation_summary
+
+
+async def _generate_patched_content(
+    db: Session,
+    cv: CV,
+    context: CVGenerationContext,
+) -> Optional[GeneratedCVContentSimple]:
+    patch = await llm_service.generate_cv_patch(db=db, **context.llm_kwargs())
+    try:
+        return cv_patch_service.apply_cv_patch(cv.content, patch)
+    except ValueError as e:
+        logger.warning("Could not apply patch to CV %s, regenerating in full: %s", cv.id, e)
+        return None
+
+
+def _save_new_cv(
+    db: Session,
+    cv_data: CVCreate,
+    context: CVGenerationContext,
+    generated_content: GeneratedCVContentSimple,
+) -> CV:
+    content_dict = generated_content.model_dump()
+    
+    # Extraer la respuesta del chat antes de guardar el contenido
+    chat_response = content_dict.pop('chat_response', None)
+    
+    rendered_content = template_service.render_template(context.template, content_dict)
+    
+    # Agregar la respuesta del asistente al historial
+    conversation_history = context.conversation_history
+    if chat_response:
+        conversation_history.append({
+            "role": "assistant",
+            "content": chat_response,
+            "timestamp": datetime.utcnow().isoformat(),
+        })
+    
+    db_cv = CV(
+        project_id=cv_data.project_id,
+        template_id=cv_data.template_id,
+        base_cv_id=cv_data.base_cv_id,
+        job_offering_id=cv_data.job_offering_id or context.project.job_offering_id,
+        content=content_dict,
+        rendered_content=rendered_content,
+        conversation_history=conversation_history,
+    )
+    
+    db.add(db_cv)
+    db.commit()
+    db.refresh(db_cv)
+    pdf_service.schedule_thumbnail(db_cv.rendered_content)
+    return db_cv
+
+
+def _save_regenerated_cv(
+    db: Session,
+    cv: CV,
+    context: CVGenerationContext,
+    generated_content: GeneratedCVContentSimple,
+) -> CV:
     content_dict = generated_content.model_dump()
     
     # Extraer la respuesta del chat antes de guardar el contenido
@@ -192,10 +439,13 @@ def regenerate_cv(
     
     cv.content = content_dict
     
-    if template:
-        cv.rendered_content = template_service.render_template(template, content_dict)
+    if context.template:
+        cv.rendered_content = template_service.render_template(context.template, content_dict)
+        # El PDF compilado corresponde al contenido anterior
+        cv.compiled_path = None
     
     # Agregar la respuesta del asistente al historial
+    updated_history = context.conversation_history
     if chat_response:
         updated_history.append({
             "role": "assistant",
@@ -209,4 +459,84 @@ def regenerate_cv(
     
     db.commit()
     db.refresh(cv)
+    pdf_service.schedule_thumbnail(cv.rendered_content)
     return cv
+
+
+# Secciones que se emiten al completarse. Las listas se emiten ítem por ítem
+# con el nombre del evento en singular; el resto como un solo evento.
+_STREAMED_FIELDS = ("summary", "skills", "chat_response")
+_STREAMED_LIST_FIELDS = {"experiences": "experience", "education": "education"}
+
+
+async def _stream_and_save(
+    db: Session,
+    context: CVGenerationContext,
+    save: Callable[[GeneratedCVContentSimple], CV],
+) -> AsyncIterator[tuple[str, Any]]:
+    async for event, data in _stream_sections(db, context):
+        if event == "content":
+            yield "cv", save(data)
+        else:
+            yield event, data
+
+
+async def _stream_sections(
+    db: Session,
+    context: CVGenerationContext,
+) -> AsyncIterator[tuple[str, Any]]:
+    """
+    Consume el stream parcial del LLM y entrega un evento por cada sección que
+    ya no va a cambiar. Como el modelo escribe los campos en orden, un campo está
+    completo cuando empezó el siguiente (o terminó el stream), y un ítem de una
+    lista está completo cuando aparece el siguiente ítem.
+    
+    Termina con `("content", GeneratedCVContentSimple)` con el resultado validado.
+    """
+    field_order = list(GeneratedCVContentSimple.model_fields)
+    emitted_fields: set[str] = set()
+    emitted_items: dict[str, int] = {}
+    
+    def completed_events(partial, finished: bool):
+        values = {name: getattr(partial, name, None) for name in field_order}
+        started = [i for i, name in enumerate(field_order) if values[name] is not None]
+        frontier = started[-1] if started else -1
+    
+        for name in field_order:
+            if name in emitted_fields:
+                continue
+            field_done = finished or field_order.index(name) < frontier
+    
+            if name in _STREAMED_LIST_FIELDS:
+                items = values[name] or []
+                ready = len(items) if field_done else max(len(items) - 1, 0)
+                for i in range(emitted_items.get(name, 0), ready):
+                    yield _STREAMED_LIST_FIELDS[name], {"index": i, **_section_data(items[i])}
+                emitted_items[name] = max(emitted_items.get(name, 0), ready)
+            elif name in _STREAMED_FIELDS and field_done and values[name] is not None:
+                yield name, _section_data(values[name])
+    
+            if field_done:
+                emitted_fields.add(name)
+    
+    last_partial = None
+    async for partial in llm_service.stream_cv_content(db=db, **context.llm_kwargs()):
+        last_partial = partial
+        for event in completed_events(partial, finished=False):
+            yield event
+    
+    if last_partial is None:
+        raise ValueError("LLM stream ended without content")
+    
+    for event in completed_events(last_partial, finished=True):
+        yield event
+    
+    yield "content", GeneratedCVContentSimple.model_validate(_section_data(last_partial))
+
+
+def _section_data(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(warnings=False)
+    if isinstance(value, list):
+        return [_section_data(item) for item in value]
+    return value
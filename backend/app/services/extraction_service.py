@@ -1,17 +1,43 @@
-import instructor
-from anthropic import Anthropic
+import asyncio
+import math
+import re
+from collections import Counter
+
 from sqlalchemy.orm import Session
 
 from app.config import settings
 from app.database.models import User, UserProfile, UserSkills, SkillType
-from app.types.extraction_types import ExtractedProfileData
-from app.services import user_profile_service, user_skills_service
+from app.types.extraction_types import ExtractedProfile, ExtractedProfileData, ExtractedSkill
+from app.types.prompt_types import AssembledPrompt
+from app.services import (
+    conversation_service,
+    llm_provider_service,
+    llm_telemetry_service,
+    prompt_service,
+    skill_dedupe_service,
+    user_profile_service,
+    user_skills_service,
+)
+
+
+client = llm_provider_service.create_client()
+llm_telemetry_service.instrument_client(client)
+
+EXTRACTION_MODEL = "claude-haiku-4-5"
+EXTRACTION_MAX_TOKENS = 3000
 
+# Encabezados de sección ("EXPERIENCIA", "## Educación", "Certificaciones:")
+_HEADING_RE = re.compile(r"^(#{1,6}\s+\S.*|[^\n]{1,60}:|[^a-záéíóúñ\n]*[A-ZÁÉÍÓÚÑ]{3,}[^a-záéíóúñ\n]*)$")
+_PARAGRAPH_BREAK_RE = re.compile(r"\n\s*\n")
+_WORD_RE = re.compile(r"\w{2,}")
 
-client = instructor.from_anthropic(Anthropic(api_key=settings.anthropic_api_key))
+# Cada skill de contexto se muestra truncado a este largo
+SKILL_CONTEXT_MAX_CHARS = 100
+BM25_K1 = 1.5
+BM25_B = 0.75
 
 
-def extract_profile_data(db: Session, user_id: int, text: str) -> ExtractedProfileData:
+async def extract_profile_data(db: Session, user_id: int, text: str) -> ExtractedProfileData:
     """
     Extrae información de perfil y skills desde un texto usando LLM.
     Considera la información actual del usuario para evitar redundancias.
@@ -25,11 +51,153 @@ def extract_profile_data(db: Session, user_id: int, text: str) -> ExtractedProfi
     current_profile = user_profile_service.get_user_profile_by_user(db, user_id)
     current_skills = user_skills_service.get_user_skills_by_user(db, user_id)
     
-    # Construir prompt con contexto
+    chunks = split_into_chunks(text, settings.extraction_chunk_chars)
+    if len(chunks) == 1:
+        return await _extract_chunk(db, user_id, current_profile, current_skills, chunks[0])
+    
+    # Cada fragmento es una llamada independiente; la latencia queda acotada por
+    # el fragmento más lento y no por el largo del documento
+    semaphore = asyncio.Semaphore(settings.extraction_max_concurrency)
+    
+    async def extract(chunk: str) -> ExtractedProfileData:
+        async with semaphore:
+            return await _extract_chunk(db, user_id, current_profile, current_skills, chunk)
+    
+    results = await asyncio.gather(*(extract(chunk) for chunk in chunks))
+    return merge_extracted_data(results)
+
+
+async def _extract_chunk(
+    db: Session,
+    user_id: int,
+    current_profile: UserProfile | None,
+    current_skills: list[UserSkills],
+    text: str,
+) -> ExtractedProfileData:
+    prompt = build_extraction_prompt(current_profile, current_skills, text)
+    
+    async with llm_telemetry_service.track_call(db, "extract_profile", EXTRACTION_MODEL, user_id) as call:
+        response = await client.chat.completions.create(
+            model=EXTRACTION_MODEL,
+            max_tokens=EXTRACTION_MAX_TOKENS,
+            system=prompt.system,
+            messages=prompt.messages,
+            response_model=ExtractedProfileData,
+        )
+        call.response = response
+    
+    return response
+
+
+def split_into_chunks(text: str, max_chars: int) -> list[str]:
+    """
+    Divide el texto en fragmentos de hasta `max_chars` caracteres sin cortar
+    párrafos. Un encabezado de sección abre un fragmento nuevo cuando el actual
+    ya va por la mitad, para que cada sección quede junta. Solo los párrafos
+    más largos que `max_chars` se cortan, por líneas y luego por palabras.
+    """
+    text = text.strip()
+    if len(text) <= max_chars:
+        return [text]
+    
+    chunks: list[str] = []
+    current: list[str] = []
+    current_len = 0
+    
+    for paragraph in _split_paragraphs(text, max_chars):
+        starts_section = _HEADING_RE.match(paragraph.split("\n", 1)[0].strip()) is not None
+        too_long = current_len + len(paragraph) + 2 > max_chars
+        if current and (too_long or (starts_section and current_len >= max_chars // 2)):
+            chunks.append("\n\n".join(current))
+            current, current_len = [], 0
+        current.append(paragraph)
+        current_len += len(paragraph) + 2
+    
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def _split_paragraphs(text: str, max_chars: int) -> list[str]:
+    paragraphs = []
+    for paragraph in _PARAGRAPH_BREAK_RE.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            paragraphs.append(paragraph)
+            continue
+        for piece in _split_long(paragraph, "\n", max_chars):
+            paragraphs.extend(_split_long(piece, " ", max_chars) if len(piece) > max_chars else [piece])
+    return paragraphs
+
+
+def _split_long(text: str, separator: str, max_chars: int) -> list[str]:
+    """Agrupa las partes de `text` separadas por `separator` en piezas de hasta `max_chars`."""
+    pieces = []
+    current = ""
+    for part in text.split(separator):
+        if current and len(current) + len(separator) + len(part) > max_chars:
+            pieces.append(current)
+            current = part
+        else:
+            current = f"{current}{separator}{part}" if current else part
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def merge_extracted_data(results: list[ExtractedProfileData]) -> ExtractedProfileData:
+    """
+    Combina las extracciones de varios fragmentos del mismo texto.
+    
+    Para el perfil gana el primer valor encontrado (en orden del texto), salvo
+    los años de experiencia (el mayor) y los idiomas (unión). Los skills se
+    deduplican por tipo y texto normalizado.
+    """
+    profiles = [result.profile for result in results if result.profile]
+    profile = None
+    if profiles:
+        years = [p.years_of_experience for p in profiles if p.years_of_experience is not None]
+        profile = ExtractedProfile(
+            current_role=next((p.current_role for p in profiles if p.current_role), None),
+            years_of_experience=max(years) if years else None,
+            salary_range=next((p.salary_range for p in profiles if p.salary_range), None),
+            spoken_languages=_unique(
+                language for p in profiles for language in p.spoken_languages
+            ),
+        )
+    
+    skills: list[ExtractedSkill] = []
+    seen = set()
+    for result in results:
+        for skill in result.skills:
+            key = (skill.skill_type, user_skills_service.normalize_skill_text(skill.skill_text))
+            if key in seen:
+                continue
+            seen.add(key)
+            skills.append(skill)
+    
+    return ExtractedProfileData(profile=profile, skills=skills)
+
+
+def _unique(values) -> list[str]:
+    unique = {}
+    for value in values:
+        unique.setdefault(" ".join(value.casefold().split()), value)
+    return list(unique.values())
+
+
+def build_extraction_prompt(
+    current_profile: UserProfile | None,
+    current_skills: list[UserSkills],
+    text: str,
+) -> AssembledPrompt:
+    """
+    Construye el prompt de extracción. Las instrucciones fijas van en el prefijo
+    cacheable (ver `prompt_service`); aquí solo va el contexto del usuario y su texto.
+    """
     prompt_parts = [
-        "Eres un experto en análisis de perfiles profesionales.",
-        "Tu tarea es extraer información estructurada del siguiente texto.",
-        "",
         "INFORMACIÓN ACTUAL DEL USUARIO:",
     ]
     
@@ -46,12 +214,13 @@ def extract_profile_data(db: Session, user_id: int, text: str) -> ExtractedProfi
     if current_skills:
         prompt_parts.extend([
             "",
-            "SKILLS ACTUALES QUE YA TIENE:",
+            "SKILLS ACTUALES QUE YA TIENE (los más relacionados con el texto):",
         ])
-        for skill in current_skills[:10]:  # Solo mostrar algunos para no saturar
-            prompt_parts.append(f"  - [{skill.skill_type.value}] {skill.skill_text[:100]}")
-        if len(current_skills) > 10:
-            prompt_parts.append(f"  ... y {len(current_skills) - 10} más")
+        # Solo los más relevantes para no saturar el prompt
+        context_lines = _skill_context_lines(current_skills, text)
+        prompt_parts.extend(context_lines)
+        if len(current_skills) > len(context_lines):
+            prompt_parts.append(f"  ... y {len(current_skills) - len(context_lines)} más")
     else:
         prompt_parts.append("\nNo tiene skills registrados aún.")
     
@@ -59,38 +228,59 @@ def extract_profile_data(db: Session, user_id: int, text: str) -> ExtractedProfi
         "",
         "TEXTO DEL USUARIO PARA ANALIZAR:",
         text,
-        "",
-        "INSTRUCCIONES:",
-        "1. Extrae SOLO información NUEVA o que actualice/mejore la existente",
-        "2. NO repitas skills que ya están registrados con la misma información",
-        "3. Si encuentras información más completa sobre algo existente, puedes incluirla",
-        "4. Clasifica los skills correctamente:",
-        "   - 'experience': Experiencias laborales, años trabajados, empresas",
-        "   - 'dev-skill': Tecnologías, lenguajes, frameworks, herramientas",
-        "   - 'certificate': Certificaciones, títulos, cursos completados",
-        "   - 'extra': Cualquier otra cosa relevante (idiomas, soft skills, etc.)",
-        "5. Para el perfil, actualiza solo si encuentras información más precisa",
-        "6. Los idiomas que extraigas para skills tipo 'extra' también agrégalos a spoken_languages del perfil",
-        "7. Sé específico en las descripciones de skills (ej: 'Python - 5 años, Django y FastAPI')",
-        "",
-        "IMPORTANTE: Si no encuentras información nueva relevante, devuelve listas vacías.",
     ])
     
-    prompt = "\n".join(prompt_parts)
-    
-    response = client.chat.completions.create(
-        model="claude-haiku-4-5",
-        max_tokens=3000,
-        messages=[
-            {
-                "role": "user",
-                "content": prompt,
-            }
-        ],
-        response_model=ExtractedProfileData,
+    return prompt_service.assemble_prompt(
+        prompt_service.EXTRACTION_INSTRUCTIONS,
+        ExtractedProfileData,
+        "\n".join(prompt_parts),
     )
+
+
+def rank_skills(skills: list[UserSkills], text: str) -> list[UserSkills]:
+    """
+    Ordena los skills por relevancia BM25 respecto a `text` (cada skill es un
+    documento y las palabras del texto son la consulta). Los empates, incluidos
+    los skills sin palabras en común, mantienen el orden original.
+    """
+    documents = [Counter(_tokenize(skill.skill_text)) for skill in skills]
+    if not documents:
+        return []
     
-    return response
+    query_terms = set(_tokenize(text))
+    avg_length = sum(sum(doc.values()) for doc in documents) / len(documents) or 1
+    document_frequency = Counter(term for doc in documents for term in doc if term in query_terms)
+    
+    def score(doc: Counter) -> float:
+        length = sum(doc.values())
+        total = 0.0
+        for term in query_terms & doc.keys():
+            df = document_frequency[term]
+            idf = math.log(1 + (len(documents) - df + 0.5) / (df + 0.5))
+            tf = doc[term]
+            total += idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length))
+        return total
+    
+    scores = [score(doc) for doc in documents]
+    order = sorted(range(len(skills)), key=lambda i: -scores[i])
+    return [skills[i] for i in order]
+
+
+def _skill_context_lines(skills: list[UserSkills], text: str) -> list[str]:
+    """Líneas de los skills más relevantes, hasta el máximo y el presupuesto de tokens."""
+    lines = []
+    tokens = 0
+    for skill in rank_skills(skills, text)[:settings.extraction_context_skills]:
+        line = f"  - [{skill.skill_type.value}] {skill.skill_text[:SKILL_CONTEXT_MAX_CHARS]}"
+        tokens += conversation_service.estimate_tokens(line)
+        if tokens > settings.extraction_context_token_budget:
+            break
+        lines.append(line)
+    return lines
+
+
+def _tokenize(text: str) -> list[str]:
+    return _WORD_RE.findall(text.casefold())
 
 
 def apply_extracted_data(
@@ -154,30 +344,35 @@ def apply_extracted_data(
             result["profile_created"] = True
             result["details"].append("Perfil creado")
     
-    # Agregar skills
+    # Agregar skills en un solo INSERT; los que ya tiene el usuario (o casi
+    # iguales) se omiten
     if extracted_data.skills:
         from app.schemas.user_skills_schema import UserSkillsCreate
         
-        for skill in extracted_data.skills:
-            # Convertir string a SkillType
-            skill_type_map = {
-                "experience": SkillType.EXPERIENCE,
-                "dev-skill": SkillType.DEV_SKILL,
-                "certificate": SkillType.CERTIFICATE,
-                "extra": SkillType.EXTRA
-            }
-            skill_type = skill_type_map.get(skill.skill_type, SkillType.EXTRA)
-            
-            user_skills_service.create_user_skills(
-                db, user_id, UserSkillsCreate(
-                    skill_text=skill.skill_text,
-                    skill_type=skill_type,
-                    source=skill.source
-                )
+        # Convertir string a SkillType
+        skill_type_map = {
+            "experience": SkillType.EXPERIENCE,
+            "dev-skill": SkillType.DEV_SKILL,
+            "certificate": SkillType.CERTIFICATE,
+            "extra": SkillType.EXTRA
+        }
+        skills_data = [
+            UserSkillsCreate(
+                skill_text=skill.skill_text,
+                skill_type=skill_type_map.get(skill.skill_type, SkillType.EXTRA),
+                source=skill.source
             )
-            result["skills_added"] += 1
+            for skill in extracted_data.skills
+        ]
+        new_skills = skill_dedupe_service.filter_near_duplicates(
+            user_skills_service.get_user_skills_by_user(db, user_id), skills_data
+        )
+        result["skills_added"] = user_skills_service.bulk_create_user_skills(db, user_id, new_skills)
         
         result["details"].append(f"{result['skills_added']} skills agregados")
+        skipped = len(skills_data) - result["skills_added"]
+        if skipped:
+            result["details"].append(f"{skipped} skills repetidos omitidos")
     
     return result
 
@@ -0,0 +1,195 @@
+"""
+Cola de jobs de generación de CVs.
+
+Los jobs se persisten en la tabla `generation_jobs` y un pool de workers asyncio
+los procesa fuera del request HTTP. Al iniciar la app se re-encolan los jobs que
+quedaron pendientes, y los que quedaron a medio procesar hace más de
+`settings.generation_job_lease_seconds` (los más recientes pueden estar
+corriendo en otro proceso).
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.models import CV, GenerationJob, GenerationJobStatus, GenerationJobType, Project, Template
+from app.database.setup import SessionLocal
+from app.schemas.cv_schema import CVCreate
+from app.services import cv_service
+from app.types.cv_types import CVRegenerateMode
+
+
+logger = logging.getLogger(__name__)
+
+_queue: Optional[asyncio.Queue] = None
+_workers: list[asyncio.Task] = []
+
+
+def enqueue_create_cv(db: Session, cv_data: CVCreate) -> GenerationJob:
+    """
+    Crea un job para generar un CV nuevo.
+    Valida template y proyecto de inmediato para no encolar jobs que fallarán.
+    """
+    if not db.query(Template).filter(Template.id == cv_data.template_id).first():
+        raise ValueError(f"Template {cv_data.template_id} not found")
+    if not db.query(Project).filter(Project.id == cv_data.project_id).first():
+        raise ValueError(f"Project {cv_data.project_id} not found")
+    
+    return _create_job(db, GenerationJobType.CREATE_CV, cv_data.model_dump(mode="json"))
+
+
+def enqueue_regenerate_cv(
+    db: Session,
+    cv_id: int,
+    new_messages: list[dict],
+    mode: CVRegenerateMode = CVRegenerateMode.FULL,
+) -> GenerationJob:
+    """Crea un job para regenerar un CV existente con nuevos mensajes."""
+    if not db.query(CV).filter(CV.id == cv_id).first():
+        raise ValueError(f"CV {cv_id} not found")
+    
+    payload = {"messages": new_messages, "mode": mode.value}
+    return _create_job(db, GenerationJobType.REGENERATE_CV, payload, cv_id=cv_id)
+
+
+def get_generation_job(db: Session, job_id: int) -> Optional[GenerationJob]:
+    return db.query(GenerationJob).filter(GenerationJob.id == job_id).first()
+
+
+async def process_job(db: Session, job_id: int) -> Optional[GenerationJob]:
+    """
+    Ejecuta un job pendiente. Retorna None si el job no existe o ya fue tomado
+    por otro worker.
+    """
+    claimed = (
+        db.query(GenerationJob)
+        .filter(GenerationJob.id == job_id, GenerationJob.status == GenerationJobStatus.PENDING)
+        .update(
+            {"status": GenerationJobStatus.RUNNING, "started_at": datetime.utcnow()},
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    if not claimed:
+        return None
+    
+    job = get_generation_job(db, job_id)
+    try:
+        if job.job_type == GenerationJobType.CREATE_CV:
+            cv = await cv_service.create_cv(db, CVCreate(**job.payload))
+        else:
+            mode = CVRegenerateMode(job.payload.get("mode", CVRegenerateMode.FULL))
+            cv = await cv_service.regenerate_cv(db, job.cv_id, job.payload["messages"], mode)
+            if not cv:
+                raise ValueError(f"CV {job.cv_id} not found")
+        job.cv_id = cv.id
+        job.status = GenerationJobStatus.SUCCEEDED
+    except Exception as e:
+        db.rollback()
+        job = get_generation_job(db, job_id)
+        job.status = GenerationJobStatus.FAILED
+        job.error = str(e)
+        logger.exception("Generation job %s failed", job_id)
+    
+    job.finished_at = datetime.utcnow()
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def dispatch(job_id: int) -> None:
+    """
+    Entrega un job a los workers si el pool está corriendo. Se debe llamar desde
+    el event loop (la cola de asyncio no es thread-safe): los endpoints que
+    encolan son `async def`.
+    """
+    if _queue is not None:
+        _queue.put_nowait(job_id)
+
+
+async def start_workers(
+    concurrency: int | None = None,
+    session_factory: Callable[[], Session] = SessionLocal,
+) -> None:
+    """Inicia el pool de workers y re-encola los jobs pendientes."""
+    global _queue
+    
+    concurrency = settings.generation_workers if concurrency is None else concurrency
+    if concurrency <= 0:
+        return
+    
+    _queue = asyncio.Queue()
+    for job_id in _recover_pending_jobs(session_factory):
+        _queue.put_nowait(job_id)
+    
+    for _ in range(concurrency):
+        _workers.append(asyncio.create_task(_worker(session_factory)))
+
+
+async def stop_workers() -> None:
+    global _queue
+    
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _queue = None
+
+
+def _create_job(
+    db: Session,
+    job_type: GenerationJobType,
+    payload: dict,
+    cv_id: int | None = None,
+) -> GenerationJob:
+    job = GenerationJob(job_type=job_type, payload=payload, cv_id=cv_id)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def _recover_pending_jobs(session_factory: Callable[[], Session]) -> list[int]:
+    """
+    Devuelve los jobs pendientes. Los que quedaron en `running` desde hace más
+    que el lease (su proceso se cayó a mitad) vuelven a `pending` para
+    reintentarse; los más recientes se dejan al worker que los tomó, que puede
+    seguir vivo en otro proceso (varios workers de uvicorn, rolling restart).
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.generation_job_lease_seconds)
+    db = session_factory()
+    try:
+        # UPDATE condicional: si dos procesos arrancan a la vez, solo uno lo reclama
+        db.query(GenerationJob).filter(
+            GenerationJob.status == GenerationJobStatus.RUNNING,
+            GenerationJob.started_at < cutoff,
+        ).update(
+            {"status": GenerationJobStatus.PENDING, "started_at": None},
+            synchronize_session=False,
+        )
+        db.commit()
+        pending = (
+            db.query(GenerationJob.id)
+            .filter(GenerationJob.status == GenerationJobStatus.PENDING)
+            .order_by(GenerationJob.id)
+            .all()
+        )
+        return [job_id for (job_id,) in pending]
+    finally:
+        db.close()
+
+
+async def _worker(session_factory: Callable[[], Session]) -> None:
+    while True:
+        job_id = await _queue.get()
+        db = session_factory()
+        try:
+            await process_job(db, job_id)
+        except Exception:
+            logger.exception("Unexpected error processing generation job %s", job_id)
+        finally:
+            db.close()
+            _queue.task_done()
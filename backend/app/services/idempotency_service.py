@@ -0,0 +1,169 @@
+"""
+Soporte para el header `Idempotency-Key` en endpoints POST que llaman al LLM.
+
+La primera request con una key la registra como "en curso" en la tabla
+`idempotency_keys`. Al terminar guarda la respuesta y los reintentos con la
+misma key la reciben sin volver a ejecutar nada. Un duplicado que llega mientras
+la original sigue en curso espera a que termine.
+
+Si la operación falla, la key se libera para que el cliente pueda reintentar.
+Una key "en curso" vence a los `idempotency_lease_seconds`, por si el proceso
+murió a mitad de camino; debe ser mayor que la generación más lenta.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.models import IdempotencyKey, IdempotencyKeyStatus
+
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL_SECONDS = 0.5
+
+
+class IdempotencyError(Exception):
+    """Uso inválido de una Idempotency-Key; `status_code` es el código HTTP a responder."""
+    
+    def __init__(self, message: str, status_code: int) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+async def execute(
+    db: Session,
+    key: str,
+    endpoint: str,
+    payload: Any,
+    status_code: int,
+    operation: Callable[[], Awaitable[dict]],
+) -> JSONResponse:
+    """
+    Ejecuta `operation` (que retorna la respuesta ya serializada) a lo más una
+    vez por `key` y `endpoint`.
+    
+    Lanza IdempotencyError si la key se reutiliza con otro payload (422) o si la
+    request original no termina a tiempo (409).
+    """
+    request_hash = _request_hash(payload)
+    record = await _claim(db, key, endpoint, request_hash)
+    if record is not None:
+        return _replay(record)
+    
+    try:
+        response = await operation()
+    except BaseException:
+        db.rollback()
+        _release(db, key, endpoint)
+        raise
+    
+    _complete(db, key, endpoint, request_hash, status_code, response)
+    return JSONResponse(status_code=status_code, content=response)
+
+
+async def _claim(db: Session, key: str, endpoint: str, request_hash: str) -> Optional[IdempotencyKey]:
+    """
+    Registra la key como en curso y retorna None, o retorna el registro ya
+    completado de una request anterior (esperando si sigue en curso).
+    """
+    deadline = datetime.utcnow() + timedelta(seconds=settings.idempotency_wait_seconds)
+    
+    while True:
+        _purge_expired(db)
+        db.add(IdempotencyKey(
+            key=key,
+            endpoint=endpoint,
+            request_hash=request_hash,
+            status=IdempotencyKeyStatus.IN_PROGRESS,
+            expires_at=datetime.utcnow() + timedelta(seconds=settings.idempotency_lease_seconds),
+        ))
+        try:
+            db.commit()
+            return None
+        except IntegrityError:
+            db.rollback()
+    
+        record = _get(db, key, endpoint)
+        if record is None:
+            # La original falló y liberó la key entre el insert y la consulta
+            continue
+        if record.request_hash != request_hash:
+            raise IdempotencyError("Idempotency-Key was already used with a different request", 422)
+        if record.status == IdempotencyKeyStatus.COMPLETED:
+            return record
+        if datetime.utcnow() >= deadline:
+            raise IdempotencyError("A request with this Idempotency-Key is still in progress", 409)
+    
+        await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+
+def _complete(
+    db: Session, key: str, endpoint: str, request_hash: str, status_code: int, response: dict
+) -> None:
+    record = _get(db, key, endpoint)
+    if record is None:
+        # La reserva venció mientras la operación seguía en curso: se vuelve a
+        # registrar para que los reintentos reciban esta respuesta
+        logger.warning(
+            "Idempotency key %s for %s expired while in progress; consider raising IDEMPOTENCY_LEASE_SECONDS",
+            key, endpoint,
+        )
+        record = IdempotencyKey(key=key, endpoint=endpoint, request_hash=request_hash)
+        db.add(record)
+    record.status = IdempotencyKeyStatus.COMPLETED
+    record.status_code = status_code
+    record.response = response
+    record.expires_at = datetime.utcnow() + timedelta(seconds=settings.idempotency_ttl_seconds)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Otra request ya tomó la key vencida; se responde igual, sin replay
+        db.rollback()
+        logger.warning("Could not store response for idempotency key %s (%s)", key, endpoint)
+
+
+def _release(db: Session, key: str, endpoint: str) -> None:
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.key == key,
+        IdempotencyKey.endpoint == endpoint,
+        IdempotencyKey.status == IdempotencyKeyStatus.IN_PROGRESS,
+    ).delete(synchronize_session=False)
+    db.commit()
+
+
+def _get(db: Session, key: str, endpoint: str) -> Optional[IdempotencyKey]:
+    # populate_existing: otra sesión pudo completar la key mientras esperábamos
+    return (
+        db.query(IdempotencyKey)
+        .populate_existing()
+        .filter(IdempotencyKey.key == key, IdempotencyKey.endpoint == endpoint)
+        .first()
+    )
+
+
+def _purge_expired(db: Session) -> None:
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.expires_at < datetime.utcnow()
+    ).delete(synchronize_session=False)
+    db.commit()
+
+
+def _replay(record: IdempotencyKey) -> JSONResponse:
+    return JSONResponse(
+        status_code=record.status_code,
+        content=record.response,
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def _request_hash(payload: Any) -> str:
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
@@ -1,14 +1,127 @@
+import html
+import re
 from typing import Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 
 from app.database.models import JobOffering
 from app.schemas.job_offering_schema import JobOfferingCreate, JobOfferingUpdate
+from app.services.conversation_service import estimate_tokens
+
+
+# Largo máximo de la descripción limpia que se envía al LLM
+DESCRIPTION_TEXT_MAX_CHARS = 2000
+# Largo del resumen de una línea para listados
+DESCRIPTION_SNIPPET_MAX_CHARS = 280
+BACKFILL_CHUNK_SIZE = 500
+
+_HTML_BLOCK_TAG_RE = re.compile(r"<\s*(br|/p|/li|/h[1-6]|/div)\b[^>]*>", re.IGNORECASE)
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+_INLINE_SPACE_RE = re.compile(r"[ \t\r\f\v]+")
+_BLANK_LINES_RE = re.compile(r"\n\s*\n+")
+
+
+def clean_description(description: str | None, max_chars: int = DESCRIPTION_TEXT_MAX_CHARS) -> str | None:
+    """
+    Convierte la descripción HTML de una oferta en texto plano para el prompt.
+    
+    Conserva los saltos de párrafo, decodifica entidades y corta en el último
+    espacio en blanco antes de `max_chars`.
+    """
+    if not description:
+        return None
+    
+    text = _HTML_BLOCK_TAG_RE.sub("\n", description)
+    text = _HTML_TAG_RE.sub("", text)
+    text = html.unescape(text).replace("\xa0", " ")
+    text = _INLINE_SPACE_RE.sub(" ", text)
+    text = _BLANK_LINES_RE.sub("\n\n", "\n".join(line.strip() for line in text.split("\n")))
+    return _truncate(text.strip(), max_chars) or None
+    
+
+def normalize_description(job_offering: JobOffering) -> None:
+    """
+    Calcula las columnas derivadas de `description` (texto plano, snippet y
+    tokens aproximados). Se llama al ingresar o editar la oferta, así las
+    lecturas no vuelven a procesar el HTML.
+    """
+    text = clean_description(job_offering.description)
+    job_offering.description_text = text
+    job_offering.description_snippet = (
+        _truncate(" ".join(text.split()), DESCRIPTION_SNIPPET_MAX_CHARS) if text else None
+    )
+    job_offering.description_tokens = estimate_tokens(text) if text else None
+
+
+def backfill_descriptions(
+    db: Session,
+    chunk_size: int = BACKFILL_CHUNK_SIZE,
+    recompute: bool = False,
+) -> int:
+    """
+    Normaliza las ofertas existentes por bloques de `chunk_size` filas,
+    haciendo commit por bloque. Por defecto solo procesa las que aún no
+    tienen `description_text`; con `recompute` las procesa todas.
+    
+    Retorna la cantidad de ofertas actualizadas.
+    """
+    updated = 0
+    last_id = None
+    
+    while True:
+        query = db.query(JobOffering).filter(JobOffering.description.isnot(None))
+        if not recompute:
+            query = query.filter(JobOffering.description_text.is_(None))
+        if last_id is not None:
+            query = query.filter(JobOffering.id > last_id)
+        chunk = query.order_by(JobOffering.id).limit(chunk_size).all()
+        if not chunk:
+            return updated
+        
+        for job_offering in chunk:
+            normalize_description(job_offering)
+        last_id = chunk[-1].id
+        db.commit()
+        # Soltar las filas ya procesadas para que la memoria no crezca con la tabla
+        db.expunge_all()
+        updated += len(chunk)
+
+
+def build_company_info(db: Session, job_offering: JobOffering) -> dict:
+    """
+    Contexto de la oferta para el prompt del CV.
+    
+    Usa la descripción limpia guardada al ingresar la oferta; las filas antiguas
+    sin `description_text` se normalizan una vez y quedan guardadas.
+    """
+    if job_offering.description_text is None and job_offering.description:
+        normalize_description(job_offering)
+        db.commit()
+    
+    info = {
+        "company_name": job_offering.company_name,
+        "role_name": job_offering.role_name,
+        "location": job_offering.location,
+        "work_mode": job_offering.work_mode,
+        "description": job_offering.description_text,
+    }
+    return {key: value for key, value in info.items() if value}
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    """Corta `text` en el último espacio en blanco antes de `max_chars`."""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    if len(cut.split()) > 1:
+        cut = cut.rsplit(None, 1)[0]
+    return cut.rstrip(" ,.;:\n") + "…"
 
 
 def create_job_offering(db: Session, job_offering_data: JobOfferingCreate) -> JobOffering:
     """Create a new job offering"""
     db_job_offering = JobOffering(**job_offering_data.model_dump())
+    normalize_description(db_job_offering)
     db.add(db_job_offering)
     db.commit()
     db.refresh(db_job_offering)
@@ -65,6 +178,8 @@ def update_job_offering(
     update_data = job_offering_data.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_job_offering, key, value)
+    if "description" in update_data:
+        normalize_description(db_job_offering)
     
     db.commit()
     db.refresh(db_job_offering)
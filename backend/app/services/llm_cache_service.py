@@ -0,0 +1,142 @@
+"""
+Cache de respuestas LLM direccionado por contenido.
+
+La llave es un hash SHA-256 del prompt normalizado junto con el modelo, los
+parámetros de la llamada y el schema de respuesta, así que cualquier cambio en
+los datos del usuario, del proyecto o del historial genera una llave distinta.
+"""
+import hashlib
+import json
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Optional, TypeVar
+
+from pydantic import BaseModel
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.models import LLMCacheEntry
+from app.schemas.metrics_schema import LLMCacheStatsResponse
+
+
+T = TypeVar("T", bound=BaseModel)
+
+# Contadores del proceso actual (se reinician con la app)
+_counters = {"hits": 0, "misses": 0}
+
+
+def build_cache_key(
+    model: str,
+    max_tokens: int,
+    messages: list[dict],
+    response_model: type[BaseModel],
+    system: list[dict] | None = None,
+) -> str:
+    payload = {
+        "model": model,
+        "max_tokens": max_tokens,
+        "system": [_normalize(block["text"]) for block in system or []],
+        "messages": [
+            {"role": message["role"], "content": _normalize(message["content"])}
+            for message in messages
+        ],
+        "response_schema": response_model.model_json_schema(),
+    }
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def get_cached_response(db: Session, key: str, response_model: type[T]) -> Optional[T]:
+    """Retorna la respuesta cacheada si existe y no expiró; registra hit/miss."""
+    if not settings.llm_cache_enabled:
+        return None
+    
+    now = datetime.utcnow()
+    entry = (
+        db.query(LLMCacheEntry)
+        .filter(LLMCacheEntry.key == key, LLMCacheEntry.expires_at > now)
+        .first()
+    )
+    if not entry:
+        _counters["misses"] += 1
+        return None
+    
+    _counters["hits"] += 1
+    entry.hit_count += 1
+    entry.last_accessed_at = now
+    db.commit()
+    return response_model.model_validate(entry.response)
+
+
+def store_response(db: Session, key: str, model: str, response: BaseModel) -> None:
+    """Guarda una respuesta y aplica expiración y límite de tamaño del cache."""
+    if not settings.llm_cache_enabled:
+        return
+    
+    data = response.model_dump(mode="json")
+    now = datetime.utcnow()
+    entry = LLMCacheEntry(
+        key=key,
+        model=model,
+        response=data,
+        size_bytes=len(json.dumps(data, ensure_ascii=False).encode("utf-8")),
+        hit_count=0,
+        created_at=now,
+        last_accessed_at=now,
+        expires_at=now + timedelta(seconds=settings.llm_cache_ttl_seconds),
+    )
+    db.merge(entry)
+    db.commit()
+    
+    _evict(db)
+
+
+def get_cache_stats(db: Session) -> LLMCacheStatsResponse:
+    entries, size_bytes = db.query(
+        func.count(LLMCacheEntry.key), func.coalesce(func.sum(LLMCacheEntry.size_bytes), 0)
+    ).one()
+    lookups = _counters["hits"] + _counters["misses"]
+    return LLMCacheStatsResponse(
+        hits=_counters["hits"],
+        misses=_counters["misses"],
+        hit_rate=_counters["hits"] / lookups if lookups else 0.0,
+        entries=entries,
+        size_bytes=size_bytes,
+    )
+
+
+def reset_counters() -> None:
+    _counters["hits"] = 0
+    _counters["misses"] = 0
+
+
+def _normalize(text: str) -> str:
+    text = unicodedata.normalize("NFC", text)
+    return "\n".join(line.rstrip() for line in text.strip().splitlines())
+
+
+def _evict(db: Session) -> None:
+    """Borra entradas expiradas y luego las menos usadas hasta respetar el tamaño máximo."""
+    db.query(LLMCacheEntry).filter(LLMCacheEntry.expires_at <= datetime.utcnow()).delete(
+        synchronize_session=False
+    )
+    
+    total = db.query(func.coalesce(func.sum(LLMCacheEntry.size_bytes), 0)).scalar()
+    if total > settings.llm_cache_max_bytes:
+        rows = (
+            db.query(LLMCacheEntry.key, LLMCacheEntry.size_bytes)
+            .order_by(LLMCacheEntry.last_accessed_at)
+            .all()
+        )
+        to_delete = []
+        for key, size_bytes in rows:
+            if total <= settings.llm_cache_max_bytes:
+                break
+            to_delete.append(key)
+            total -= size_bytes
+        db.query(LLMCacheEntry).filter(LLMCacheEntry.key.in_(to_delete)).delete(
+            synchronize_session=False
+        )
+    
+    db.commit()
@@ -0,0 +1,121 @@
+"""
+Cassettes de llamadas al LLM (record/replay).
+
+Envuelve el cliente del proveedor según `settings.llm_cassette_mode`:
+
+- `passthrough`: no hace nada (por defecto).
+- `record`: llama al proveedor y guarda cada respuesta en disco.
+- `replay`: responde solo desde disco; si no hay cassette lanza `CassetteMissError`.
+
+Cada cassette es un JSON en `settings.llm_cassette_dir`, con nombre igual al hash
+canónico del prompt, modelo y schema de respuesta (el mismo que usa el cache de
+generaciones, ver `llm_cache_service.build_cache_key`).
+"""
+import enum
+import json
+import os
+import types
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable
+
+from pydantic import BaseModel
+
+from app.services import llm_cache_service
+
+
+class CassetteMode(str, enum.Enum):
+    PASSTHROUGH = "passthrough"
+    RECORD = "record"
+    REPLAY = "replay"
+
+
+class CassetteMissError(LookupError):
+    """No hay respuesta grabada para el prompt pedido (modo replay)."""
+
+
+def wrap_client(client: Any, mode: str, directory: str) -> Any:
+    """Retorna `client` envuelto según el modo, o el mismo cliente en passthrough."""
+    try:
+        mode = CassetteMode(mode)
+    except ValueError:
+        raise ValueError(f"Unknown LLM cassette mode {mode}")
+    
+    if mode == CassetteMode.PASSTHROUGH:
+        return client
+    return CassetteLLMClient(client, mode, Path(directory))
+
+
+class CassetteLLMClient:
+    """Cliente con la misma interfaz que el del proveedor (ver `llm_provider_service`)."""
+    
+    def __init__(self, inner: Any, mode: CassetteMode, directory: Path) -> None:
+        self.inner = inner
+        self.mode = mode
+        self.directory = directory
+        self.chat = types.SimpleNamespace(completions=_CassetteCompletions(self))
+    
+    def on(self, hook_name: str, handler: Callable) -> None:
+        self.inner.on(hook_name, handler)
+    
+    def cassette_key(self, response_model: type[BaseModel], **kwargs: Any) -> str:
+        return llm_cache_service.build_cache_key(
+            kwargs.get("model", ""),
+            kwargs.get("max_tokens", 0),
+            kwargs.get("messages") or [],
+            response_model,
+            system=kwargs.get("system"),
+        )
+    
+    def load(self, key: str, response_model: type[BaseModel]) -> BaseModel:
+        path = self._path(key)
+        if not path.exists():
+            raise CassetteMissError(f"No LLM cassette for {response_model.__name__} ({key})")
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return response_model.model_validate(data["response"])
+    
+    def save(self, key: str, response: BaseModel, model: str) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "model": model,
+            "response_model": type(response).__name__,
+            "response": response.model_dump(mode="json"),
+        }
+        # Escritura atómica para que runs en paralelo no lean cassettes a medias
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp_path, path)
+    
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+
+class _CassetteCompletions:
+    def __init__(self, owner: CassetteLLMClient) -> None:
+        self._owner = owner
+    
+    async def create(self, response_model: type[BaseModel], **kwargs: Any) -> BaseModel:
+        key = self._owner.cassette_key(response_model, **kwargs)
+        if self._owner.mode == CassetteMode.REPLAY:
+            return self._owner.load(key, response_model)
+    
+        response = await self._owner.inner.chat.completions.create(response_model=response_model, **kwargs)
+        self._owner.save(key, response, kwargs.get("model", ""))
+        return response
+    
+    async def create_partial(self, response_model: type[BaseModel], **kwargs: Any) -> AsyncIterator[BaseModel]:
+        key = self._owner.cassette_key(response_model, **kwargs)
+        if self._owner.mode == CassetteMode.REPLAY:
+            yield self._owner.load(key, response_model)
+            return
+    
+        last_partial = None
+        async for partial in self._owner.inner.chat.completions.create_partial(
+            response_model=response_model, **kwargs
+        ):
+            last_partial = partial
+            yield partial
+    
+        if last_partial is not None:
+            response = response_model.model_validate(last_partial.model_dump(warnings=False))
+            self._owner.save(key, response, kwargs.get("model", ""))
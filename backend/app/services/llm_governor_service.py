@@ -0,0 +1,349 @@
+"""
+Gobernador compartido de llamadas al LLM.
+
+Todas las llamadas (de cualquier servicio) pasan por una única instancia de
+`LLMGovernor`, que aplica:
+
+- Un máximo de llamadas en vuelo; las demás esperan en cola (FIFO).
+- Un presupuesto de tokens por minuto (ventana deslizante de 60 s).
+- Reintentos con backoff exponencial y jitter ante 429/529.
+- Un circuit breaker: tras varias fallas seguidas del proveedor deja de
+  llamarlo durante un tiempo y falla de inmediato con `LLMUnavailableError`
+  (la API responde 503 con `Retry-After`).
+
+`GovernedLLMClient` envuelve el cliente del proveedor con la misma interfaz
+(ver `llm_provider_service`).
+"""
+import asyncio
+import enum
+import json
+import logging
+import random
+import time
+import types
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Optional
+
+from anthropic import APIConnectionError
+
+from app.config import settings
+from app.schemas.metrics_schema import LLMGovernorStatsResponse
+from app.services import llm_telemetry_service
+from app.services.concurrency_service import FIFOSlots
+
+
+logger = logging.getLogger(__name__)
+
+# Códigos que indican límite de tasa o sobrecarga del proveedor
+RETRYABLE_STATUS_CODES = {429, 529}
+
+TOKEN_WINDOW_SECONDS = 60
+
+
+class BreakerState(str, enum.Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+
+class LLMUnavailableError(RuntimeError):
+    """El proveedor no está disponible; reintentar después de `retry_after` segundos."""
+    
+    def __init__(self, message: str, retry_after: int) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMGovernor:
+    def __init__(
+        self,
+        max_in_flight: int,
+        tokens_per_minute: int = 0,
+        max_retries: int = 3,
+        backoff_base_seconds: float = 1.0,
+        backoff_max_seconds: float = 30.0,
+        breaker_failure_threshold: int = 5,
+        breaker_cooldown_seconds: float = 30.0,
+    ) -> None:
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.breaker_failure_threshold = breaker_failure_threshold
+        self.breaker_cooldown_seconds = breaker_cooldown_seconds
+    
+        self._slots = FIFOSlots(max_in_flight)
+        self._token_log: deque[list] = deque()  # [timestamp, tokens]
+        self.consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+    
+    @property
+    def max_in_flight(self) -> int:
+        return self._slots.limit
+    
+    @property
+    def in_flight(self) -> int:
+        return self._slots.in_flight
+    
+    @property
+    def queue_depth(self) -> int:
+        return self._slots.queue_depth
+    
+    @property
+    def breaker_state(self) -> BreakerState:
+        if self._opened_at is None:
+            return BreakerState.CLOSED
+        if time.monotonic() - self._opened_at < self.breaker_cooldown_seconds:
+            return BreakerState.OPEN
+        return BreakerState.HALF_OPEN
+    
+    def retry_after(self) -> int:
+        """Segundos hasta que el breaker permita volver a probar el proveedor."""
+        if self._opened_at is None:
+            return 0
+        remaining = self.breaker_cooldown_seconds - (time.monotonic() - self._opened_at)
+        return max(int(remaining + 0.999), 1)
+    
+    def tokens_last_minute(self) -> int:
+        self._expire_tokens()
+        return sum(tokens for _, tokens in self._token_log)
+    
+    async def call(self, estimated_tokens: int, func: Callable[[], Any]) -> Any:
+        """Ejecuta `func` (que retorna un awaitable) bajo todas las políticas."""
+        for attempt in range(self.max_retries + 1):
+            probe = self._check_breaker()
+            try:
+                await self._slots.acquire()
+                try:
+                    entry = await self._reserve_tokens(estimated_tokens)
+                    try:
+                        response = await func()
+                    except Exception as e:
+                        self._on_failure(e)
+                        delay = self._retry_delay(e, attempt)
+                        if delay is None:
+                            raise
+                    else:
+                        self._on_success()
+                        self._settle_tokens(entry, response)
+                        return response
+                finally:
+                    self._slots.release()
+            finally:
+                if probe:
+                    self._probe_in_flight = False
+    
+            logger.warning("LLM call rate limited/overloaded, retrying in %.1fs (attempt %d)", delay, attempt + 1)
+            await asyncio.sleep(delay)
+    
+    async def stream(self, estimated_tokens: int, func: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """
+        Igual que `call`, pero para streams. Solo se reintenta si el error ocurre
+        antes de entregar el primer elemento.
+        """
+        for attempt in range(self.max_retries + 1):
+            probe = self._check_breaker()
+            try:
+                await self._slots.acquire()
+                try:
+                    entry = await self._reserve_tokens(estimated_tokens)
+                    started = False
+                    last = None
+                    try:
+                        async for item in func():
+                            started = True
+                            last = item
+                            yield item
+                    except Exception as e:
+                        self._on_failure(e)
+                        delay = None if started else self._retry_delay(e, attempt)
+                        if delay is None:
+                            raise
+                    else:
+                        self._on_success()
+                        self._settle_tokens(entry, last)
+                        return
+                finally:
+                    self._slots.release()
+            finally:
+                if probe:
+                    self._probe_in_flight = False
+    
+            logger.warning("LLM stream rate limited/overloaded, retrying in %.1fs (attempt %d)", delay, attempt + 1)
+            await asyncio.sleep(delay)
+    
+    def _check_breaker(self) -> bool:
+        """Falla si el breaker está abierto. Retorna True si esta llamada es la de prueba (half-open)."""
+        state = self.breaker_state
+        if state == BreakerState.OPEN or (state == BreakerState.HALF_OPEN and self._probe_in_flight):
+            raise LLMUnavailableError("LLM provider unavailable (circuit open)", self.retry_after())
+        if state == BreakerState.HALF_OPEN:
+            self._probe_in_flight = True
+            return True
+        return False
+    
+    def _on_success(self) -> None:
+        self.consecutive_failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+    
+    def _on_failure(self, error: Exception) -> None:
+        if not is_provider_failure(error):
+            self._probe_in_flight = False
+            return
+    
+        self.consecutive_failures += 1
+        if self._probe_in_flight or self.consecutive_failures >= self.breaker_failure_threshold:
+            if self._opened_at is None or self._probe_in_flight:
+                logger.error("LLM circuit breaker opened after %d failures", self.consecutive_failures)
+            self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+    
+    def _retry_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Retorna cuánto esperar antes de reintentar, o None si no corresponde."""
+        status_code = provider_status_code(error)
+        if status_code not in RETRYABLE_STATUS_CODES:
+            return None
+        if self.breaker_state != BreakerState.CLOSED or attempt >= self.max_retries:
+            raise LLMUnavailableError(
+                f"LLM provider unavailable ({status_code})",
+                self.retry_after() or int(self.backoff_max_seconds),
+            ) from error
+    
+        # Backoff exponencial con "full jitter"; respeta el retry-after del proveedor
+        delay = random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** attempt))
+        return max(delay, _retry_after_header(error))
+    
+    async def _reserve_tokens(self, tokens: int) -> Optional[list]:
+        if self.tokens_per_minute <= 0:
+            return None
+    
+        while True:
+            self._expire_tokens()
+            used = sum(logged for _, logged in self._token_log)
+            # Una llamada más grande que el presupuesto pasa sola cuando la ventana está vacía
+            if used + tokens <= self.tokens_per_minute or not self._token_log:
+                entry = [time.monotonic(), tokens]
+                self._token_log.append(entry)
+                return entry
+            await asyncio.sleep(max(self._token_log[0][0] + TOKEN_WINDOW_SECONDS - time.monotonic(), 0.05))
+    
+    def _settle_tokens(self, entry: Optional[list], response: Any) -> None:
+        """Reemplaza la estimación reservada por el uso real, si se conoce."""
+        usage = llm_telemetry_service.extract_usage(response)
+        if entry is not None and usage is not None:
+            entry[1] = usage.input_tokens + usage.output_tokens + usage.cache_write_tokens
+    
+    def _expire_tokens(self) -> None:
+        limit = time.monotonic() - TOKEN_WINDOW_SECONDS
+        while self._token_log and self._token_log[0][0] < limit:
+            self._token_log.popleft()
+
+
+class GovernedLLMClient:
+    """Cliente con la misma interfaz que el del proveedor, pasando por el gobernador."""
+    
+    def __init__(self, inner: Any, governor: Optional[LLMGovernor] = None) -> None:
+        self.inner = inner
+        self._governor = governor
+        self.chat = types.SimpleNamespace(completions=_GovernedCompletions(self))
+    
+    @property
+    def governor(self) -> LLMGovernor:
+        return self._governor or get_governor()
+    
+    def on(self, hook_name: str, handler: Callable) -> None:
+        self.inner.on(hook_name, handler)
+
+
+class _GovernedCompletions:
+    def __init__(self, owner: GovernedLLMClient) -> None:
+        self._owner = owner
+    
+    async def create(self, **kwargs: Any) -> Any:
+        return await self._owner.governor.call(
+            estimate_request_tokens(kwargs),
+            lambda: self._owner.inner.chat.completions.create(**kwargs),
+        )
+    
+    async def create_partial(self, **kwargs: Any) -> AsyncIterator[Any]:
+        async for partial in self._owner.governor.stream(
+            estimate_request_tokens(kwargs),
+            lambda: self._owner.inner.chat.completions.create_partial(**kwargs),
+        ):
+            yield partial
+
+
+_governor: Optional[LLMGovernor] = None
+
+
+def get_governor() -> LLMGovernor:
+    """Instancia compartida, creada con la configuración actual."""
+    global _governor
+    if _governor is None:
+        _governor = LLMGovernor(
+            max_in_flight=settings.llm_max_in_flight,
+            tokens_per_minute=settings.llm_tokens_per_minute,
+            max_retries=settings.llm_max_retries,
+            backoff_base_seconds=settings.llm_backoff_base_seconds,
+            backoff_max_seconds=settings.llm_backoff_max_seconds,
+            breaker_failure_threshold=settings.llm_breaker_failure_threshold,
+            breaker_cooldown_seconds=settings.llm_breaker_cooldown_seconds,
+        )
+    return _governor
+
+
+def reset_governor() -> None:
+    """Descarta el estado (cola, tokens, breaker); la próxima llamada usa la configuración actual."""
+    global _governor
+    _governor = None
+
+
+def get_governor_stats() -> LLMGovernorStatsResponse:
+    governor = get_governor()
+    return LLMGovernorStatsResponse(
+        in_flight=governor.in_flight,
+        max_in_flight=governor.max_in_flight,
+        queue_depth=governor.queue_depth,
+        tokens_last_minute=governor.tokens_last_minute(),
+        tokens_per_minute=governor.tokens_per_minute,
+        breaker_state=governor.breaker_state.value,
+        consecutive_failures=governor.consecutive_failures,
+        retry_after_seconds=governor.retry_after(),
+    )
+
+
+def estimate_request_tokens(kwargs: dict) -> int:
+    """Tokens que reserva una llamada: prompt estimado más el máximo de salida."""
+    prompt = json.dumps([kwargs.get("system"), kwargs.get("messages")], ensure_ascii=False, default=str)
+    # ~4 caracteres por token, igual que `conversation_service.estimate_tokens`
+    return len(prompt) // 4 + 1 + kwargs.get("max_tokens", 0)
+
+
+def provider_status_code(error: BaseException) -> Optional[int]:
+    """Código HTTP del error del proveedor, buscando también en la causa (instructor los envuelve)."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        status_code = getattr(error, "status_code", None)
+        if isinstance(status_code, int):
+            return status_code
+        error = error.__cause__ or error.__context__
+    return None
+
+
+def is_provider_failure(error: BaseException) -> bool:
+    """Errores que indican que el proveedor está mal (no errores de validación del output)."""
+    status_code = provider_status_code(error)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+    return isinstance(error, (APIConnectionError, asyncio.TimeoutError))
+
+
+def _retry_after_header(error: BaseException) -> float:
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after", 0))
+    except (AttributeError, TypeError, ValueError):
+        return 0.0
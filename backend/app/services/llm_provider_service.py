@@ -0,0 +1,197 @@
+"""
+Proveedores de LLM.
+
+Los servicios obtienen su cliente con `create_client()`, que elige el proveedor
+según `settings.llm_provider`:
+
+- `anthropic`: Anthropic envuelto con instructor (producción).
+- `fake`: cliente local y determinista que genera respuestas válidas según el
+  `response_model` pedido, con latencia (log-normal) y tasa de error
+  configurables. Sirve para correr benchmarks del flujo completo sin red.
+
+Sobre cualquiera de los dos se puede activar la capa de record/replay
+(ver `llm_cassette_service`).
+
+Todos los clientes exponen la misma interfaz que usa la app:
+`client.chat.completions.create(...)`, `client.chat.completions.create_partial(...)`
+y `client.on(hook, handler)`.
+"""
+import asyncio
+import enum
+import hashlib
+import json
+import random
+import types
+import typing
+from typing import Any, AsyncIterator, Callable
+
+import httpx
+import instructor
+from anthropic import AsyncAnthropic, InternalServerError
+from pydantic import BaseModel
+
+from app.config import settings
+from app.services import llm_cassette_service, llm_governor_service, llm_telemetry_service
+
+
+class LLMProvider(str, enum.Enum):
+    ANTHROPIC = "anthropic"
+    FAKE = "fake"
+
+
+def create_client() -> Any:
+    """
+    Crea el cliente del proveedor configurado en `settings.llm_provider`. Las
+    llamadas pasan por el gobernador compartido (`llm_governor_service`) y, si
+    `settings.llm_cassette_mode` lo pide, por la capa de cassettes (por fuera,
+    así un replay no consume cupo del gobernador).
+    """
+    governed = llm_governor_service.GovernedLLMClient(_create_provider_client())
+    return llm_cassette_service.wrap_client(
+        governed, settings.llm_cassette_mode, settings.llm_cassette_dir
+    )
+
+
+def _create_provider_client() -> Any:
+    try:
+        provider = LLMProvider(settings.llm_provider)
+    except ValueError:
+        raise ValueError(f"Unknown LLM provider {settings.llm_provider}")
+    
+    if provider == LLMProvider.FAKE:
+        return FakeLLMClient(
+            latency_median_ms=settings.fake_llm_latency_median_ms,
+            latency_sigma=settings.fake_llm_latency_sigma,
+            error_rate=settings.fake_llm_error_rate,
+            seed=settings.fake_llm_seed,
+        )
+    # Sin reintentos del SDK: los hace el governor, que los cuenta en el breaker y el TPM
+    anthropic_client = AsyncAnthropic(api_key=settings.anthropic_api_key, max_retries=0)
+    # Antes de instructor.from_anthropic, que toma `messages.create` al crearse
+    anthropic_client.messages.create = llm_telemetry_service.record_stream_usage(anthropic_client.messages.create)
+    return instructor.from_anthropic(anthropic_client)
+
+
+class FakeLLMClient:
+    """
+    Cliente compatible con instructor que no llama a ninguna API.
+    
+    El contenido depende solo del prompt (mismo prompt, misma respuesta). La
+    latencia y los errores salen de un generador aleatorio propio, reproducible
+    si se configura `seed`. Los errores simulan un 529 (overloaded) de Anthropic.
+    """
+    
+    def __init__(
+        self,
+        latency_median_ms: float = 800,
+        latency_sigma: float = 0.5,
+        error_rate: float = 0.0,
+        seed: int | None = None,
+    ) -> None:
+        self.latency_median_ms = latency_median_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._hooks: dict[str, list[Callable]] = {}
+        self.chat = types.SimpleNamespace(completions=_FakeCompletions(self))
+    
+    def on(self, hook_name: str, handler: Callable) -> None:
+        self._hooks.setdefault(hook_name, []).append(handler)
+    
+    def _emit(self, hook_name: str, *args: Any, **kwargs: Any) -> None:
+        for handler in self._hooks.get(hook_name, []):
+            handler(*args, **kwargs)
+    
+    def _sample_latency(self) -> float:
+        """Latencia en segundos, log-normal con mediana `latency_median_ms`."""
+        if self.latency_median_ms <= 0:
+            return 0.0
+        return self._rng.lognormvariate(0, self.latency_sigma) * self.latency_median_ms / 1000
+    
+    def _maybe_fail(self) -> None:
+        if self.error_rate > 0 and self._rng.random() < self.error_rate:
+            request = httpx.Request("POST", "https://fake-llm.local/v1/messages")
+            raise InternalServerError(
+                "Overloaded (fake LLM provider)",
+                response=httpx.Response(529, request=request),
+                body=None,
+            )
+
+
+class _FakeCompletions:
+    def __init__(self, owner: FakeLLMClient) -> None:
+        self._owner = owner
+    
+    async def create(self, response_model: type[BaseModel], **kwargs: Any) -> BaseModel:
+        self._owner._emit("completion:kwargs", response_model=response_model, **kwargs)
+        await asyncio.sleep(self._owner._sample_latency())
+        self._owner._maybe_fail()
+        return fake_response(response_model, kwargs.get("messages"))
+    
+    async def create_partial(self, response_model: type[BaseModel], **kwargs: Any) -> AsyncIterator[BaseModel]:
+        self._owner._emit("completion:kwargs", response_model=response_model, **kwargs)
+        response = fake_response(response_model, kwargs.get("messages"))
+        fields = list(response_model.model_fields)
+        step = self._owner._sample_latency() / max(len(fields), 1)
+    
+        self._owner._maybe_fail()
+        for i in range(1, len(fields) + 1):
+            await asyncio.sleep(step)
+            yield response_model.model_construct(
+                **{name: getattr(response, name) for name in fields[:i]}
+            )
+
+
+def fake_response(response_model: type[BaseModel], messages: Any = None) -> BaseModel:
+    """Genera una instancia válida de `response_model`, determinista según `messages`."""
+    seed = hashlib.sha256(json.dumps(messages, sort_keys=True, default=str).encode()).hexdigest()
+    return _fake_model(response_model, random.Random(seed))
+
+
+# Valores realistas para campos cuyo nombre tiene un formato conocido
+_FIELD_VALUES: dict[str, Callable[[random.Random], Any]] = {
+    "email": lambda rng: f"usuario{rng.randint(1, 999)}@example.com",
+    "phone": lambda rng: f"+569{rng.randint(10000000, 99999999)}",
+    "date": lambda rng: f"{rng.randint(2010, 2020)} - {rng.randint(2021, 2025)}",
+    "skill_type": lambda rng: rng.choice(["experience", "dev-skill", "certificate", "extra"]),
+    "source": lambda rng: "text_extraction",
+    "years_of_experience": lambda rng: rng.randint(1, 15),
+    # Operaciones de patch aplicables a cualquier CV
+    "op": lambda rng: "replace",
+    "path": lambda rng: "/summary",
+}
+
+
+def _fake_model(model: type[BaseModel], rng: random.Random) -> BaseModel:
+    values = {}
+    for name, field in model.model_fields.items():
+        if name in _FIELD_VALUES:
+            values[name] = _FIELD_VALUES[name](rng)
+        else:
+            values[name] = _fake_value(field.annotation, name, rng)
+    return model.model_validate(values)
+
+
+def _fake_value(annotation: Any, name: str, rng: random.Random) -> Any:
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    
+    if origin in (typing.Union, types.UnionType):
+        return _fake_value(next(arg for arg in args if arg is not type(None)), name, rng)
+    if origin is typing.Literal:
+        return rng.choice(args)
+    if origin is list:
+        return [_fake_value(args[0] if args else str, name, rng) for _ in range(rng.randint(2, 4))]
+    if origin is dict:
+        return {}
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _fake_model(annotation, rng)
+    if isinstance(annotation, type) and issubclass(annotation, enum.Enum):
+        return rng.choice(list(annotation))
+    if annotation is bool:
+        return rng.random() < 0.5
+    if annotation is int:
+        return rng.randint(1, 10)
+    if annotation is float:
+        return round(rng.uniform(0, 10), 2)
+    return f"{name.replace('_', ' ').capitalize()} {rng.randint(1, 999)}"
@@ -1,66 +1,119 @@
-import re
-import instructor
-from anthropic import Anthropic
+import asyncio
+import json
+from typing import AsyncIterator, TypeVar
+
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
-from app.config import settings
 from app.database.models import User, UserSkills, Project, CV
-from app.types.cv_content_types import GeneratedCVContentSimple
+from app.services import llm_cache_service, llm_provider_service, llm_telemetry_service, prompt_service
+from app.types.conversation_types import ConversationSummary
+from app.types.cv_content_types import (
+    CVChatResponse,
+    CVEducationSection,
+    CVExperiencesSection,
+    CVHeaderSection,
+    CVSkillsSection,
+    GeneratedCVContentSimple,
+    GeneratedCVPatch,
+)
+from app.types.prompt_types import AssembledPrompt
+
+
+client = llm_provider_service.create_client()
+llm_telemetry_service.instrument_client(client)
+
+CV_MODEL = "claude-haiku-4-5"
+CV_MAX_TOKENS = 4000
+CV_PATCH_MAX_TOKENS = 1500
+CV_SECTION_MAX_TOKENS = 1500
+CHAT_RESPONSE_MAX_TOKENS = 200
+SUMMARY_MAX_TOKENS = 600
 
+# Secciones de la generación en paralelo, en el orden en que se combinan
+_CV_SECTIONS = (
+    ("header", CVHeaderSection),
+    ("experiences", CVExperiencesSection),
+    ("education", CVEducationSection),
+    ("skills", CVSkillsSection),
+)
 
-client = instructor.from_anthropic(Anthropic(api_key=settings.anthropic_api_key))
+T = TypeVar("T", bound=BaseModel)
 
+# Etiquetas de `company_info` (ver `job_offering_service.build_company_info`)
+_COMPANY_INFO_LABELS = {
+    "company_name": "Empresa",
+    "role_name": "Cargo",
+    "location": "Ubicación",
+    "work_mode": "Modalidad",
+    "description": "Descripción",
+}
 
-def clean_html_text(text: str) -> str:
+
+def build_cv_prompt(
+    user: User,
+    user_skills: list[UserSkills],
+    project: Project,
+    base_cv: CV | None = None,
+    company_info: dict | None = None,
+    conversation_history: list[dict] | None = None,
+    conversation_summary: str | None = None,
+) -> AssembledPrompt:
     """
-    Limpia tags HTML de un texto, dejando solo el contenido legible.
-    
-    Args:
-        text: Texto con posibles tags HTML
-        
-    Returns:
-        Texto limpio sin tags HTML
+    Construye el prompt de generación de CV. Las instrucciones fijas van en el
+    prefijo cacheable (ver `prompt_service`) y aquí solo se arma la parte que
+    depende del usuario.
     """
-    if not text:
-        return text
-    
-    # Eliminar tags HTML
-    text = re.sub(r'<[^>]+>', '', text)
-    
-    # Decodificar entidades HTML comunes
-    text = text.replace('&nbsp;', ' ')
-    text = text.replace('&lt;', '<')
-    text = text.replace('&gt;', '>')
-    text = text.replace('&amp;', '&')
-    text = text.replace('&quot;', '"')
-    text = text.replace('&#39;', "'")
-    
-    # Limpiar espacios múltiples y saltos de línea excesivos
-    text = re.sub(r'\s+', ' ', text)
-    text = re.sub(r'\n\s*\n', '\n\n', text)
+    prompt_parts = _cv_prompt_parts(
+        user, user_skills, project, base_cv, company_info, conversation_history, conversation_summary
+    )
     
-    return text.strip()
+    return prompt_service.assemble_prompt(
+        prompt_service.CV_INSTRUCTIONS,
+        GeneratedCVContentSimple,
+        "\n".join(prompt_parts),
+    )
 
 
-def generate_cv_content(
-    db: Session,
+def build_cv_patch_prompt(
     user: User,
     user_skills: list[UserSkills],
     project: Project,
-    base_cv: CV | None = None,
+    base_cv: CV,
     company_info: dict | None = None,
     conversation_history: list[dict] | None = None,
-) -> GeneratedCVContentSimple:
+    conversation_summary: str | None = None,
+) -> AssembledPrompt:
     """
-    Genera el contenido estructurado de un CV usando LLM (Anthropic + Instructor).
-    
-    Devuelve un objeto Pydantic con exactamente los campos que el template necesita.
+    Prompt para regenerar en modo patch: mismo contexto que `build_cv_prompt`,
+    pero el CV actual va como JSON para que el modelo pueda referenciar sus rutas.
     """
+    prompt_parts = _cv_prompt_parts(
+        user, user_skills, project, None, company_info, conversation_history, conversation_summary
+    )
+    prompt_parts.extend([
+        "",
+        "CV ACTUAL (JSON, las rutas de las operaciones se refieren a este documento):",
+        json.dumps(base_cv.content, ensure_ascii=False, indent=1),
+    ])
     
+    return prompt_service.assemble_prompt(
+        prompt_service.CV_PATCH_INSTRUCTIONS,
+        GeneratedCVPatch,
+        "\n".join(prompt_parts),
+    )
+
+
+def _cv_prompt_parts(
+    user: User,
+    user_skills: list[UserSkills],
+    project: Project,
+    base_cv: CV | None,
+    company_info: dict | None,
+    conversation_history: list[dict] | None,
+    conversation_summary: str | None,
+) -> list[str]:
     prompt_parts = [
-        "Eres un experto en la creación de CVs profesionales.",
-        "Tu tarea es generar un CV completo y atractivo basado en la información proporcionada.",
-        "",
         "INFORMACIÓN DEL USUARIO:",
         f"- Nombre: {user.full_name}",
         f"- Email: {user.email}",
@@ -124,20 +177,13 @@ def generate_cv_content(
         ])
     
     if company_info:
-        # Limpiar HTML de la información de la empresa antes de enviarlo al LLM
-        cleaned_info = company_info
-        if isinstance(company_info, dict):
-            cleaned_info = {
-                key: clean_html_text(str(value)) if isinstance(value, str) else value
-                for key, value in company_info.items()
-            }
-        elif isinstance(company_info, str):
-            cleaned_info = clean_html_text(company_info)
-        
+        # La descripción ya viene limpia desde la ingesta de la oferta
+        prompt_parts.extend(["", "INFORMACIÓN DE LA EMPRESA/OFERTA:"])
+        prompt_parts.extend(
+            f"{_COMPANY_INFO_LABELS.get(key, key)}: {value}"
+            for key, value in company_info.items()
+        )
         prompt_parts.extend([
-            "",
-            "INFORMACIÓN DE LA EMPRESA/OFERTA:",
-            f"{cleaned_info}",
             "",
             "Adapta el CV específicamente para esta empresa y posición.",
         ])
@@ -147,10 +193,17 @@ def generate_cv_content(
             "NOTA: No hay información específica de empresa. Genera un CV genérico pero profesional.",
         ])
     
+    if conversation_summary:
+        prompt_parts.extend([
+            "",
+            "RESUMEN DE LA CONVERSACIÓN ANTERIOR:",
+            conversation_summary,
+        ])
+    
     if conversation_history:
         prompt_parts.extend([
             "",
-            "CONVERSACIÓN CON EL USUARIO:",
+            "CONVERSACIÓN CON EL USUARIO:" if not conversation_summary else "CONVERSACIÓN RECIENTE CON EL USUARIO:",
         ])
         for msg in conversation_history:
             role_label = "Usuario" if msg["role"] == "user" else "Asistente"
@@ -158,36 +211,261 @@ def generate_cv_content(
     
     prompt_parts.extend([
         "",
-        "FORMATO REQUERIDO:",
-        "- Genera experiencias laborales realistas y relevantes (al menos 2)",
-        "- Incluye educación apropiada al perfil (al menos 1)",
-        "- Organiza habilidades por categorías (al menos 3 categorías)",
-        "- Escribe todo en ESPAÑOL",
-        "- El resumen debe ser conciso (2-3 líneas)",
-        "- Las descripciones deben ser claras y orientadas a resultados",
-        f"- IMPORTANTE: Usa EXACTAMENTE el nombre '{user.full_name}' sin modificarlo. Divide en firstname y lastname según corresponda.",
-        "- Si no tienes información específica de experiencia o educación, inventa datos profesionales coherentes",
-        "",
-        "RESPUESTA DEL CHAT:",
-        "- Genera un campo 'chat_response' con una respuesta MUY CONCISA (máximo 2 líneas)",
-        "- Solo menciona LO MÁS IMPORTANTE que se agregó/modificó en el CV",
-        "- Formato ejemplo: 'He agregado experiencia en [empresa] y actualizado las habilidades técnicas.'",
-        "- Si es la primera generación: 'He creado tu CV con [X] experiencias y [Y] habilidades.'",
-        "- Sé específico pero breve. NO des explicaciones largas.",
+        f"IMPORTANTE: El nombre del usuario es EXACTAMENTE '{user.full_name}'.",
     ])
     
-    prompt = "\n".join(prompt_parts)
-    
-    response = client.chat.completions.create(
-        model="claude-haiku-4-5",
-        max_tokens=4000,
-        messages=[
-            {
-                "role": "user",
-                "content": prompt,
-            }
-        ],
-        response_model=GeneratedCVContentSimple,
+    return prompt_parts
+    
+
+async def generate_cv_content(
+    db: Session,
+    user: User,
+    user_skills: list[UserSkills],
+    project: Project,
+    base_cv: CV | None = None,
+    company_info: dict | None = None,
+    conversation_history: list[dict] | None = None,
+    conversation_summary: str | None = None,
+) -> GeneratedCVContentSimple:
+    """
+    Genera el contenido estructurado de un CV usando LLM (Anthropic + Instructor).
+    
+    Devuelve un objeto Pydantic con exactamente los campos que el template necesita.
+    Si ya se generó un CV con exactamente el mismo prompt, se devuelve desde el cache.
+    """
+    prompt = build_cv_prompt(
+        user=user,
+        user_skills=user_skills,
+        project=project,
+        base_cv=base_cv,
+        company_info=company_info,
+        conversation_history=conversation_history,
+        conversation_summary=conversation_summary,
+    )
+    
+    return await _create_cached(
+        db, "generate_cv", user.id, prompt, GeneratedCVContentSimple, CV_MAX_TOKENS
+    )
+
+
+async def generate_cv_patch(
+    db: Session,
+    user: User,
+    user_skills: list[UserSkills],
+    project: Project,
+    base_cv: CV,
+    company_info: dict | None = None,
+    conversation_history: list[dict] | None = None,
+    conversation_summary: str | None = None,
+) -> GeneratedCVPatch:
+    """
+    Pide al LLM solo los cambios sobre `base_cv.content` (operaciones estilo
+    JSON-Patch). Un ajuste pequeño cuesta decenas de tokens de salida en vez de
+    reescribir el CV completo. Aplicar y validar el patch es responsabilidad de
+    `cv_patch_service`.
+    """
+    prompt = build_cv_patch_prompt(
+        user=user,
+        user_skills=user_skills,
+        project=project,
+        base_cv=base_cv,
+        company_info=company_info,
+        conversation_history=conversation_history,
+        conversation_summary=conversation_summary,
+    )
+    
+    return await _create_cached(
+        db, "patch_cv", user.id, prompt, GeneratedCVPatch, CV_PATCH_MAX_TOKENS
+    )
+
+
+async def generate_cv_content_parallel(
+    db: Session,
+    user: User,
+    user_skills: list[UserSkills],
+    project: Project,
+    base_cv: CV | None = None,
+    company_info: dict | None = None,
+    conversation_history: list[dict] | None = None,
+    conversation_summary: str | None = None,
+) -> GeneratedCVContentSimple:
+    """
+    Igual que `generate_cv_content`, pero genera cada sección del CV (datos
+    personales y resumen, experiencias, educación y habilidades) con una llamada
+    independiente, todas en paralelo. Al final una llamada corta genera el
+    `chat_response`. La latencia total queda cerca de la sección más lenta en vez
+    de la suma de todas.
+    """
+    user_content = "\n".join(_cv_prompt_parts(
+        user, user_skills, project, base_cv, company_info, conversation_history, conversation_summary
+    ))
+    
+    header, experiences, education, skills = await asyncio.gather(*(
+        _create_cached(
+            db,
+            f"generate_cv.{section}",
+            user.id,
+            prompt_service.assemble_prompt(
+                prompt_service.CV_SECTION_INSTRUCTIONS[section], response_model, user_content
+            ),
+            response_model,
+            CV_SECTION_MAX_TOKENS,
+        )
+        for section, response_model in _CV_SECTIONS
+    ))
+    
+    content = {
+        **header.model_dump(),
+        **experiences.model_dump(),
+        **education.model_dump(),
+        **skills.model_dump(),
+    }
+    
+    chat_prompt_parts = [
+        f"CV generado: {len(experiences.experiences)} experiencias, "
+        f"{len(education.education)} ítems de educación y "
+        f"{sum(len(s.skill_list.split(',')) for s in skills.skills)} habilidades.",
+        f"Resumen: {header.summary}",
+    ]
+    if conversation_history:
+        chat_prompt_parts.append(f"Último mensaje del usuario: {conversation_history[-1]['content']}")
+    
+    chat = await _create_cached(
+        db,
+        "generate_cv.chat_response",
+        user.id,
+        prompt_service.assemble_prompt(
+            prompt_service.CV_CHAT_RESPONSE_INSTRUCTIONS, CVChatResponse, "\n".join(chat_prompt_parts)
+        ),
+        CVChatResponse,
+        CHAT_RESPONSE_MAX_TOKENS,
+    )
+    
+    return GeneratedCVContentSimple(**content, chat_response=chat.chat_response)
+
+
+async def stream_cv_content(
+    db: Session,
+    user: User,
+    user_skills: list[UserSkills],
+    project: Project,
+    base_cv: CV | None = None,
+    company_info: dict | None = None,
+    conversation_history: list[dict] | None = None,
+    conversation_summary: str | None = None,
+) -> AsyncIterator[GeneratedCVContentSimple]:
+    """
+    Igual que `generate_cv_content`, pero entrega versiones parciales del CV
+    a medida que el modelo las va generando.
+    
+    Los objetos parciales pueden tener campos en None o listas incompletas;
+    el último objeto entregado corresponde a la respuesta completa. Un acierto en
+    el cache se entrega como un único objeto completo.
+    """
+    prompt = build_cv_prompt(
+        user=user,
+        user_skills=user_skills,
+        project=project,
+        base_cv=base_cv,
+        company_info=company_info,
+        conversation_history=conversation_history,
+        conversation_summary=conversation_summary,
+    )
+    
+    cache_key = llm_cache_service.build_cache_key(
+        CV_MODEL, CV_MAX_TOKENS, prompt.messages, GeneratedCVContentSimple, system=prompt.system
+    )
+    cached = llm_cache_service.get_cached_response(db, cache_key, GeneratedCVContentSimple)
+    if cached:
+        yield cached
+        return
+    
+    last_partial = None
+    async with llm_telemetry_service.track_call(db, "stream_cv", CV_MODEL, user.id) as call:
+        partials = client.chat.completions.create_partial(
+            model=CV_MODEL,
+            max_tokens=CV_MAX_TOKENS,
+            system=prompt.system,
+            messages=prompt.messages,
+            response_model=GeneratedCVContentSimple,
+        )
+    
+        async for partial in partials:
+            last_partial = partial
+            yield partial
+        call.response = last_partial
+    
+    if last_partial is not None:
+        response = GeneratedCVContentSimple.model_validate(last_partial.model_dump(warnings=False))
+        llm_cache_service.store_response(db, cache_key, CV_MODEL, response)
+
+
+async def summarize_conversation(
+    db: Session,
+    previous_summary: str | None,
+    turns: list[dict],
+    user_id: int | None = None,
+) -> str:
+    """
+    Incorpora `turns` al resumen acumulado de la conversación y retorna el resumen nuevo.
+    """
+    prompt_parts = []
+    if previous_summary:
+        prompt_parts.extend([
+            "RESUMEN ACUMULADO:",
+            previous_summary,
+            "",
+        ])
+    
+    prompt_parts.append("TURNOS NUEVOS:")
+    for msg in turns:
+        role_label = "Usuario" if msg["role"] == "user" else "Asistente"
+        prompt_parts.append(f"{role_label}: {msg['content']}")
+    
+    prompt = prompt_service.assemble_prompt(
+        prompt_service.CONVERSATION_SUMMARY_INSTRUCTIONS,
+        ConversationSummary,
+        "\n".join(prompt_parts),
+    )
+    
+    async with llm_telemetry_service.track_call(db, "summarize_conversation", CV_MODEL, user_id) as call:
+        response = await client.chat.completions.create(
+            model=CV_MODEL,
+            max_tokens=SUMMARY_MAX_TOKENS,
+            system=prompt.system,
+            messages=prompt.messages,
+            response_model=ConversationSummary,
+        )
+        call.response = response
+    
+    return response.summary
+
+
+async def _create_cached(
+    db: Session,
+    endpoint: str,
+    user_id: int,
+    prompt: AssembledPrompt,
+    response_model: type[T],
+    max_tokens: int,
+) -> T:
+    """Llamada al LLM pasando por el cache de respuestas y registrando telemetría."""
+    cache_key = llm_cache_service.build_cache_key(
+        CV_MODEL, max_tokens, prompt.messages, response_model, system=prompt.system
     )
+    cached = llm_cache_service.get_cached_response(db, cache_key, response_model)
+    if cached:
+        return cached
+    
+    async with llm_telemetry_service.track_call(db, endpoint, CV_MODEL, user_id) as call:
+        response = await client.chat.completions.create(
+            model=CV_MODEL,
+            max_tokens=max_tokens,
+            system=prompt.system,
+            messages=prompt.messages,
+            response_model=response_model,
+        )
+        call.response = response
     
+    llm_cache_service.store_response(db, cache_key, CV_MODEL, response)
     return response
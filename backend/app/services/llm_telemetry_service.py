@@ -0,0 +1,210 @@
+"""
+Telemetría de llamadas al LLM.
+
+Cada llamada queda registrada en la tabla `llm_calls` con latencia, tokens
+(incluyendo lecturas/escrituras del prompt cache), reintentos de validación de
+instructor y resultado. Uso:
+
+    async with llm_telemetry_service.track_call(db, "generate_cv", model, user_id) as call:
+        call.response = await client.chat.completions.create(...)
+"""
+import functools
+import logging
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.database.models import LLMCall
+from app.schemas.metrics_schema import LLMCallStatsResponse
+from app.services.concurrency_service import percentile
+from app.types.prompt_types import LLMUsage
+
+
+logger = logging.getLogger(__name__)
+
+
+class _TrackedCall:
+    def __init__(self) -> None:
+        self.attempts = 0
+        self.response: Any = None
+        self.stream_usage: Optional[LLMUsage] = None
+
+
+_current_call: ContextVar[Optional[_TrackedCall]] = ContextVar("current_llm_call", default=None)
+
+
+def instrument_client(client: Any) -> None:
+    """Registra el hook que cuenta los intentos (incluye reintentos de validación)."""
+    client.on("completion:kwargs", _count_attempt)
+
+
+def record_stream_usage(create: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+    """
+    Envuelve `messages.create` del SDK de Anthropic para registrar el uso de los
+    streams. En `create_partial` instructor no adjunta la respuesta cruda a los
+    parciales, así que el uso se lee de los eventos `message_start` y
+    `message_delta` a medida que instructor consume el stream.
+    """
+    @functools.wraps(create)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        response = await create(*args, **kwargs)
+        call = _current_call.get()
+        if not kwargs.get("stream") or call is None:
+            return response
+        return _read_stream_usage(response, call)
+    
+    return wrapper
+
+
+@asynccontextmanager
+async def track_call(
+    db: Session,
+    endpoint: str,
+    model: str,
+    user_id: int | None = None,
+) -> AsyncIterator[_TrackedCall]:
+    call = _TrackedCall()
+    token = _current_call.set(call)
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception as e:
+        _record(db, call, endpoint, model, user_id, started, outcome="error", error=str(e))
+        raise
+    else:
+        _record(db, call, endpoint, model, user_id, started, outcome="success")
+    finally:
+        _current_call.reset(token)
+
+
+def extract_usage(response: Any) -> LLMUsage | None:
+    """
+    Obtiene el uso de tokens de la respuesta cruda de Anthropic que instructor
+    adjunta al modelo (`_raw_response`). Retorna None si no está disponible.
+    """
+    usage = getattr(getattr(response, "_raw_response", None), "usage", None)
+    if usage is None:
+        return None
+    
+    return LLMUsage(
+        input_tokens=getattr(usage, "input_tokens", None) or 0,
+        output_tokens=getattr(usage, "output_tokens", None) or 0,
+        cache_read_tokens=getattr(usage, "cache_read_input_tokens", None) or 0,
+        cache_write_tokens=getattr(usage, "cache_creation_input_tokens", None) or 0,
+    )
+
+
+def get_call_stats(
+    db: Session,
+    days: int = 7,
+    endpoint: str | None = None,
+) -> list[LLMCallStatsResponse]:
+    """
+    Agrega las llamadas de los últimos `days` días por día y por endpoint.
+    Los percentiles se calculan en Python para no depender del motor de BD.
+    """
+    since = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)
+    query = db.query(LLMCall).filter(LLMCall.created_at >= since)
+    if endpoint:
+        query = query.filter(LLMCall.endpoint == endpoint)
+    
+    buckets: dict[tuple, list[LLMCall]] = {}
+    for call in query.order_by(LLMCall.created_at).all():
+        buckets.setdefault((call.created_at.date(), call.endpoint), []).append(call)
+    
+    stats = []
+    for (day, call_endpoint), calls in sorted(buckets.items()):
+        latencies = sorted(call.latency_ms for call in calls)
+        stats.append(LLMCallStatsResponse(
+            day=day,
+            endpoint=call_endpoint,
+            calls=len(calls),
+            errors=sum(1 for call in calls if call.outcome != "success"),
+            retries=sum(call.retry_count for call in calls),
+            latency_p50_ms=percentile(latencies, 50),
+            latency_p95_ms=percentile(latencies, 95),
+            latency_p99_ms=percentile(latencies, 99),
+            input_tokens=sum(call.input_tokens for call in calls),
+            output_tokens=sum(call.output_tokens for call in calls),
+            cache_read_tokens=sum(call.cache_read_tokens for call in calls),
+            cache_write_tokens=sum(call.cache_write_tokens for call in calls),
+        ))
+    return stats
+
+
+def _count_attempt(*args: Any, **kwargs: Any) -> None:
+    call = _current_call.get()
+    if call is not None:
+        call.attempts += 1
+
+
+async def _read_stream_usage(stream: Any, call: _TrackedCall) -> AsyncIterator[Any]:
+    try:
+        async for event in stream:
+            if event.type == "message_start":
+                _merge_stream_usage(call, event.message.usage)
+            elif event.type == "message_delta":
+                _merge_stream_usage(call, event.usage)
+            yield event
+    finally:
+        await stream.close()
+
+
+def _merge_stream_usage(call: _TrackedCall, usage: Any) -> None:
+    # message_delta trae output_tokens acumulado; el resto llega en message_start
+    current = call.stream_usage or LLMUsage()
+    call.stream_usage = LLMUsage(
+        input_tokens=getattr(usage, "input_tokens", None) or current.input_tokens,
+        output_tokens=getattr(usage, "output_tokens", None) or current.output_tokens,
+        cache_read_tokens=getattr(usage, "cache_read_input_tokens", None) or current.cache_read_tokens,
+        cache_write_tokens=getattr(usage, "cache_creation_input_tokens", None) or current.cache_write_tokens,
+    )
+
+
+def _record(
+    db: Session,
+    call: _TrackedCall,
+    endpoint: str,
+    model: str,
+    user_id: int | None,
+    started: float,
+    outcome: str,
+    error: str | None = None,
+) -> None:
+    latency_ms = int((time.perf_counter() - started) * 1000)
+    usage = extract_usage(call.response) or call.stream_usage or LLMUsage()
+    
+    logger.info(
+        "LLM call %s: outcome=%s latency=%dms input=%d output=%d cache_read=%d cache_write=%d",
+        endpoint,
+        outcome,
+        latency_ms,
+        usage.input_tokens,
+        usage.output_tokens,
+        usage.cache_read_tokens,
+        usage.cache_write_tokens,
+    )
+    
+    # La telemetría nunca debe romper la request que la originó
+    try:
+        db.add(LLMCall(
+            endpoint=endpoint,
+            user_id=user_id,
+            model=model,
+            input_tokens=usage.input_tokens,
+            output_tokens=usage.output_tokens,
+            cache_read_tokens=usage.cache_read_tokens,
+            cache_write_tokens=usage.cache_write_tokens,
+            latency_ms=latency_ms,
+            retry_count=max(call.attempts - 1, 0),
+            outcome=outcome,
+            error=error,
+        ))
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.exception("Could not record LLM call telemetry")
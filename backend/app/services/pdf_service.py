@@ -0,0 +1,390 @@
+"""
+Compilación de CVs a PDF con el CLI de Typst.
+
+- Los procesos `typst compile` corren en un pool acotado
+  (`settings.typst_max_workers`); el resto espera en cola (FIFO).
+- Los PDFs se guardan en `settings.pdf_artifact_dir` con el SHA-256 del código
+  Typst como nombre, así un mismo `rendered_content` nunca se compila dos veces
+  (tampoco si llegan dos requests a la vez).
+- Los paquetes `@preview/...` (modern-cv y sus dependencias) y las fuentes se
+  leen de `settings.typst_package_dir` y `settings.typst_font_dir`, para
+  compilar sin red (ver `scripts/vendor_typst_packages.py`).
+- Con `settings.typst_watch_enabled`, los CVs se compilan en un proceso
+  `typst watch` residente por CV (ver `typst_watch_service`), que reutiliza
+  fuentes y layout entre ediciones. El PDF resultante se copia igual al
+  almacenamiento por hash.
+- Las miniaturas (primera página en PNG a `settings.thumbnail_ppi`) se guardan
+  junto a los PDFs, también por hash, y se regeneran en background cada vez
+  que `cv_service` guarda contenido nuevo (ver `schedule_thumbnail`).
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+from collections import deque
+from pathlib import Path
+from typing import Awaitable, Callable, Hashable, Optional, Sequence
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.models import CV
+from app.schemas.metrics_schema import PDFCompilerStatsResponse
+from app.services.concurrency_service import FIFOSlots, percentile
+from app.services.typst_watch_service import TypstSessionManager
+
+
+logger = logging.getLogger(__name__)
+
+# Tiempos de compilación recientes que se usan para los percentiles
+COMPILE_TIMES_WINDOW = 200
+
+
+class TypstCompileError(Exception):
+    """No se pudo compilar; `status_code` es el código HTTP a responder."""
+    
+    def __init__(self, message: str, status_code: int) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class TypstCompiler:
+    def __init__(
+        self,
+        binary: str,
+        max_workers: int,
+        timeout_seconds: float,
+        artifact_dir: Path,
+        package_dir: Optional[Path] = None,
+        font_dir: Optional[Path] = None,
+        watch_sessions: Optional[TypstSessionManager] = None,
+        thumbnail_ppi: int = 36,
+    ) -> None:
+        self.binary = binary
+        self.timeout_seconds = timeout_seconds
+        self.artifact_dir = artifact_dir
+        self.package_dir = package_dir
+        self.font_dir = font_dir
+        self.watch_sessions = watch_sessions
+        self.thumbnail_ppi = thumbnail_ppi
+        
+        self._slots = FIFOSlots(max_workers)
+        self._compiling: dict[str, asyncio.Future] = {}
+        self.compiles = 0
+        self.cache_hits = 0
+        self.errors = 0
+        self._compile_times_ms: deque[int] = deque(maxlen=COMPILE_TIMES_WINDOW)
+    
+    @property
+    def max_workers(self) -> int:
+        return self._slots.limit
+    
+    @property
+    def in_flight(self) -> int:
+        return self._slots.in_flight
+    
+    @property
+    def queue_depth(self) -> int:
+        return self._slots.queue_depth
+    
+    def artifact_path(self, source: str) -> Path:
+        digest = source_hash(source)
+        return self.artifact_dir / digest[:2] / f"{digest}.pdf"
+    
+    def thumbnail_path(self, source: str) -> Path:
+        digest = source_hash(source)
+        return self.artifact_dir / digest[:2] / f"{digest}.{self.thumbnail_ppi}ppi.png"
+    
+    async def compile(self, source: str, session_key: Optional[Hashable] = None) -> Path:
+        """
+        Retorna la ruta del PDF de `source`, compilándolo solo si no existe.
+        
+        Con `session_key` (y sesiones watch activas) la compilación se hace en
+        la sesión residente de esa clave.
+        """
+        path = self.artifact_path(source)
+        return await self._build(path, lambda: self._compile_to(source, path, session_key))
+        
+    async def render_thumbnail(self, source: str) -> Path:
+        """Retorna la ruta del PNG de la primera página de `source`, generándolo solo si no existe."""
+        path = self.thumbnail_path(source)
+        options = ["--format", "png", "--ppi", str(self.thumbnail_ppi), "--pages", "1"]
+        return await self._build(path, lambda: self._compile_to(source, path, options=options))
+    
+    def stats(self) -> PDFCompilerStatsResponse:
+        times = sorted(self._compile_times_ms)
+        return PDFCompilerStatsResponse(
+            in_flight=self.in_flight,
+            max_workers=self.max_workers,
+            queue_depth=self.queue_depth,
+            compiles=self.compiles,
+            cache_hits=self.cache_hits,
+            errors=self.errors,
+            compile_p50_ms=percentile(times, 50),
+            compile_p95_ms=percentile(times, 95),
+            watch_sessions=self.watch_sessions.session_count if self.watch_sessions else 0,
+        )
+    
+    async def _build(self, path: Path, compile_to: Callable[[], Awaitable[None]]) -> Path:
+        if path.exists():
+            self.cache_hits += 1
+            return path
+        
+        # Single-flight: requests simultáneos con el mismo código esperan la misma compilación
+        pending = self._compiling.get(path.name)
+        if pending is not None:
+            try:
+                result = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # Se canceló la compilación que estábamos esperando (se desconectó
+                # quien la pidió): compilar de nuevo
+                return await self._build(path, compile_to)
+            self.cache_hits += 1
+            return result
+        
+        future = asyncio.get_running_loop().create_future()
+        self._compiling[path.name] = future
+        try:
+            await compile_to()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Evita el warning de excepción no consumida si nadie más esperaba
+            future.exception()
+            raise
+        else:
+            future.set_result(path)
+            return path
+        finally:
+            del self._compiling[path.name]
+    
+    async def _compile_to(
+        self,
+        source: str,
+        path: Path,
+        session_key: Optional[Hashable] = None,
+        options: Sequence[str] = (),
+    ) -> None:
+        await self._slots.acquire()
+        try:
+            started = time.perf_counter()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Mover al final para que nadie vea un PDF a medio escribir
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            if self.watch_sessions is not None and session_key is not None:
+                output = await self.watch_sessions.compile(session_key, source, self.timeout_seconds)
+                # La sesión reescribe su PDF en la próxima edición: se copia, no se mueve
+                shutil.copyfile(output, tmp_path)
+                os.replace(tmp_path, path)
+            else:
+                with tempfile.TemporaryDirectory(prefix="typst-") as workdir:
+                    main = Path(workdir) / "main.typ"
+                    main.write_text(source, encoding="utf-8")
+                    output = Path(workdir) / f"main{path.suffix}"
+                    await self._run(self._command(main, output, options))
+                    os.replace(output, tmp_path)
+                    os.replace(tmp_path, path)
+            
+            elapsed_ms = int((time.perf_counter() - started) * 1000)
+            self.compiles += 1
+            self._compile_times_ms.append(elapsed_ms)
+            logger.info("Typst compiled %s in %d ms", path.name, elapsed_ms)
+        except TypstCompileError:
+            self.errors += 1
+            raise
+        finally:
+            self._slots.release()
+    
+    def _command(self, main: Path, output: Path, options: Sequence[str] = ()) -> list[str]:
+        return [
+            self.binary, "compile", "--root", str(main.parent), *self.options(), *options, str(main), str(output),
+        ]
+    
+    def options(self) -> list[str]:
+        """Opciones de paquetes y fuentes, comunes a `typst compile` y `typst watch`."""
+        options = []
+        if self.package_dir and self.package_dir.is_dir():
+            options += ["--package-path", str(self.package_dir)]
+        if self.font_dir and self.font_dir.is_dir():
+            options += ["--font-path", str(self.font_dir)]
+        return options
+    
+    async def _run(self, command: list[str]) -> None:
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except FileNotFoundError:
+            raise TypstCompileError(f"Typst binary not found: {self.binary}", 503)
+        
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(), timeout=self.timeout_seconds)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise TypstCompileError(f"Typst compilation timed out after {self.timeout_seconds}s", 504)
+        except asyncio.CancelledError:
+            # Cancelado (por ejemplo al apagar la aplicación): no dejar el proceso huérfano
+            process.kill()
+            await process.wait()
+            raise
+        
+        if process.returncode != 0:
+            message = stderr.decode("utf-8", errors="replace").strip()
+            raise TypstCompileError(f"Typst compilation failed: {message}", 422)
+
+
+def source_hash(source: str) -> str:
+    return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+
+def thumbnail_version(source: str) -> str:
+    """
+    Versión de la miniatura de `source` para URLs cacheables indefinidamente.
+    Incluye la resolución: cambiar `thumbnail_ppi` invalida las URLs anteriores.
+    """
+    return f"{source_hash(source)[:16]}-{get_compiler().thumbnail_ppi}"
+
+
+def thumbnail_etag(source: str) -> str:
+    return f'"{source_hash(source)}-{get_compiler().thumbnail_ppi}ppi"'
+
+
+def etag(source: str) -> str:
+    """ETag fuerte del PDF de `source`: el mismo código siempre produce el mismo PDF."""
+    return f'"{source_hash(source)}"'
+
+
+def etag_matches(if_none_match: str, current_etag: str) -> bool:
+    """Comparación débil de `If-None-Match` (RFC 9110), que es la que corresponde para GET."""
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(
+        candidate.removeprefix("W/") == current_etag for candidate in candidates
+    )
+
+
+_compiler: Optional[TypstCompiler] = None
+# Loop de la aplicación y miniaturas en curso (ver `schedule_thumbnail`)
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_thumbnail_tasks: set[asyncio.Task] = set()
+
+
+def get_compiler() -> TypstCompiler:
+    """Compilador compartido, creado desde `settings` en el primer uso."""
+    global _compiler
+    if _compiler is None:
+        _compiler = TypstCompiler(
+            binary=settings.typst_binary,
+            max_workers=settings.typst_max_workers,
+            timeout_seconds=settings.typst_timeout_seconds,
+            artifact_dir=Path(settings.pdf_artifact_dir),
+            package_dir=Path(settings.typst_package_dir),
+            font_dir=Path(settings.typst_font_dir),
+            thumbnail_ppi=settings.thumbnail_ppi,
+        )
+        if settings.typst_watch_enabled:
+            _compiler.watch_sessions = TypstSessionManager(
+                binary=settings.typst_binary,
+                options=_compiler.options(),
+                max_sessions=settings.typst_watch_max_sessions,
+                idle_seconds=settings.typst_watch_idle_seconds,
+            )
+    return _compiler
+
+
+def reset_compiler() -> None:
+    """Descarta el compilador compartido (para tests o tras cambiar `settings`)."""
+    global _compiler
+    _compiler = None
+
+
+def start() -> None:
+    """
+    Registra el loop de la aplicación para las miniaturas en background e inicia
+    el cierre periódico de sesiones watch inactivas (si están activas).
+    """
+    global _loop
+    _loop = asyncio.get_running_loop()
+    watch_sessions = get_compiler().watch_sessions
+    if watch_sessions is not None:
+        watch_sessions.start_reaper()
+
+
+async def stop() -> None:
+    """Cancela las miniaturas pendientes y termina los procesos `typst watch` residentes."""
+    global _loop
+    _loop = None
+    for task in list(_thumbnail_tasks):
+        task.cancel()
+    await asyncio.gather(*_thumbnail_tasks, return_exceptions=True)
+    if _compiler is not None and _compiler.watch_sessions is not None:
+        await _compiler.watch_sessions.close()
+
+
+def get_compiler_stats() -> PDFCompilerStatsResponse:
+    return get_compiler().stats()
+
+
+async def compile_cv(db: Session, cv: CV) -> str:
+    """
+    Compila el `rendered_content` del CV y guarda la ruta en `CV.compiled_path`.
+    Si el PDF de ese contenido ya existe en disco no se vuelve a compilar.
+    """
+    if cv.rendered_content is None:
+        raise TypstCompileError(f"CV {cv.id} has no rendered content", 409)
+    path = str(await get_compiler().compile(cv.rendered_content, session_key=cv.id))
+    if cv.compiled_path != path:
+        cv.compiled_path = path
+        db.commit()
+        db.refresh(cv)
+    return path
+
+
+async def render_thumbnail(cv: CV) -> Path:
+    """PNG de la primera página del CV; se genera en el momento si aún no existe."""
+    if cv.rendered_content is None:
+        raise TypstCompileError(f"CV {cv.id} has no rendered content", 409)
+    return await get_compiler().render_thumbnail(cv.rendered_content)
+
+
+def schedule_thumbnail(source: Optional[str]) -> None:
+    """
+    Encola la generación de la miniatura de `source` (tras guardar contenido
+    nuevo de un CV), para que la primera vista del listado no espere a Typst.
+    
+    Se puede llamar desde el loop o desde un thread del threadpool (endpoints
+    `def`). Sin la aplicación corriendo (scripts) no hace nada: la miniatura se
+    genera al pedirla.
+    """
+    if source is None or _loop is None or _loop.is_closed():
+        return
+    try:
+        in_loop = asyncio.get_running_loop() is _loop
+    except RuntimeError:
+        in_loop = False
+    if in_loop:
+        _start_thumbnail_task(source)
+    else:
+        _loop.call_soon_threadsafe(_start_thumbnail_task, source)
+
+
+def _start_thumbnail_task(source: str) -> None:
+    task = asyncio.create_task(_refresh_thumbnail(source))
+    _thumbnail_tasks.add(task)
+    task.add_done_callback(_thumbnail_tasks.discard)
+
+
+async def _refresh_thumbnail(source: str) -> None:
+    try:
+        await get_compiler().render_thumbnail(source)
+    except TypstCompileError as e:
+        logger.warning("Could not render CV thumbnail: %s", e)
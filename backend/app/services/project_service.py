@@ -4,15 +4,20 @@ from sqlalchemy.orm import Session
 
 from app.database.models import Project
 from app.schemas.project_schema import ProjectCreate, ProjectUpdate
+from app.services import job_offering_service
 
 
 def create_project(db: Session, user_id: int, project_data: ProjectCreate) -> Project:
+    if project_data.job_offering_id:
+        _check_job_offering(db, project_data.job_offering_id)
+    
     db_project = Project(
         user_id=user_id,
         name=project_data.name,
         target_role=project_data.target_role,
         cv_style=project_data.cv_style,
         preferences=project_data.preferences,
+        job_offering_id=project_data.job_offering_id,
     )
     
     db.add(db_project)
@@ -38,14 +43,16 @@ def update_project(
     if not project:
         return None
     
-    if project_data.name is not None:
-        project.name = project_data.name
-    if project_data.target_role is not None:
-        project.target_role = project_data.target_role
-    if project_data.cv_style is not None:
-        project.cv_style = project_data.cv_style
-    if project_data.preferences is not None:
-        project.preferences = project_data.preferences
+    # Un null explícito borra el campo (por ejemplo, desvincula la oferta);
+    # el nombre es obligatorio y no se puede borrar
+    update_data = project_data.model_dump(exclude_unset=True)
+    if update_data.get("name", "") is None:
+        del update_data["name"]
+    if update_data.get("job_offering_id"):
+        _check_job_offering(db, update_data["job_offering_id"])
+    
+    for key, value in update_data.items():
+        setattr(project, key, value)
     
     db.commit()
     db.refresh(project)
@@ -61,3 +68,7 @@ def delete_project(db: Session, project_id: int) -> bool:
     db.commit()
     return True
 
+
+def _check_job_offering(db: Session, job_offering_id: str) -> None:
+    if not job_offering_service.get_job_offering(db, job_offering_id):
+        raise ValueError(f"Job offering {job_offering_id} not found")
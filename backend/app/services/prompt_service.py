@@ -0,0 +1,169 @@
+"""
+Ensamblado de prompts para el LLM.
+
+Las instrucciones fijas y el schema de salida van en un bloque de `system`
+marcado con `cache_control`, de modo que Anthropic pueda reutilizar ese prefijo
+entre llamadas (prompt caching). Los datos de cada usuario van siempre después,
+en el mensaje de usuario, para no invalidar el prefijo cacheado.
+"""
+import json
+from functools import lru_cache
+
+from pydantic import BaseModel
+
+from app.types.prompt_types import AssembledPrompt
+
+
+CV_INSTRUCTIONS = "\n".join([
+    "Eres un experto en la creación de CVs profesionales.",
+    "Tu tarea es generar un CV completo y atractivo basado en la información proporcionada.",
+    "",
+    "FORMATO REQUERIDO:",
+    "- Genera experiencias laborales realistas y relevantes (al menos 2)",
+    "- Incluye educación apropiada al perfil (al menos 1)",
+    "- Organiza habilidades por categorías (al menos 3 categorías)",
+    "- Escribe todo en ESPAÑOL",
+    "- El resumen debe ser conciso (2-3 líneas)",
+    "- Las descripciones deben ser claras y orientadas a resultados",
+    "- IMPORTANTE: Usa EXACTAMENTE el nombre del usuario indicado en sus datos, sin modificarlo. Divide en firstname y lastname según corresponda.",
+    "- Si no tienes información específica de experiencia o educación, inventa datos profesionales coherentes",
+    "",
+    "RESPUESTA DEL CHAT:",
+    "- Genera un campo 'chat_response' con una respuesta MUY CONCISA (máximo 2 líneas)",
+    "- Solo menciona LO MÁS IMPORTANTE que se agregó/modificó en el CV",
+    "- Formato ejemplo: 'He agregado experiencia en [empresa] y actualizado las habilidades técnicas.'",
+    "- Si es la primera generación: 'He creado tu CV con [X] experiencias y [Y] habilidades.'",
+    "- Sé específico pero breve. NO des explicaciones largas.",
+])
+
+EXTRACTION_INSTRUCTIONS = "\n".join([
+    "Eres un experto en análisis de perfiles profesionales.",
+    "Tu tarea es extraer información estructurada del texto del usuario.",
+    "Recibirás la información actual del usuario y el texto a analizar.",
+    "",
+    "INSTRUCCIONES:",
+    "1. Extrae SOLO información NUEVA o que actualice/mejore la existente",
+    "2. NO repitas skills que ya están registrados con la misma información",
+    "3. Si encuentras información más completa sobre algo existente, puedes incluirla",
+    "4. Clasifica los skills correctamente:",
+    "   - 'experience': Experiencias laborales, años trabajados, empresas",
+    "   - 'dev-skill': Tecnologías, lenguajes, frameworks, herramientas",
+    "   - 'certificate': Certificaciones, títulos, cursos completados",
+    "   - 'extra': Cualquier otra cosa relevante (idiomas, soft skills, etc.)",
+    "5. Para el perfil, actualiza solo si encuentras información más precisa",
+    "6. Los idiomas que extraigas para skills tipo 'extra' también agrégalos a spoken_languages del perfil",
+    "7. Sé específico en las descripciones de skills (ej: 'Python - 5 años, Django y FastAPI')",
+    "",
+    "IMPORTANTE: Si no encuentras información nueva relevante, devuelve listas vacías.",
+])
+
+_CV_SECTION_BASE = [
+    "Eres un experto en la creación de CVs profesionales.",
+    "Estás generando UNA SECCIÓN de un CV; las demás secciones se generan por separado.",
+    "Genera solo los campos del esquema de respuesta, basándote en la información proporcionada.",
+    "- Escribe todo en ESPAÑOL",
+    "- Si no tienes información específica, inventa datos profesionales coherentes",
+    "",
+]
+
+CV_SECTION_INSTRUCTIONS = {
+    "header": "\n".join(_CV_SECTION_BASE + [
+        "SECCIÓN: datos personales y resumen.",
+        "- IMPORTANTE: Usa EXACTAMENTE el nombre del usuario indicado en sus datos, sin modificarlo. Divide en firstname y lastname según corresponda.",
+        "- El resumen debe ser conciso (2-3 líneas)",
+    ]),
+    "experiences": "\n".join(_CV_SECTION_BASE + [
+        "SECCIÓN: experiencia laboral.",
+        "- Genera experiencias laborales realistas y relevantes (al menos 2)",
+        "- Las descripciones deben ser claras y orientadas a resultados",
+    ]),
+    "education": "\n".join(_CV_SECTION_BASE + [
+        "SECCIÓN: educación.",
+        "- Incluye educación apropiada al perfil (al menos 1)",
+    ]),
+    "skills": "\n".join(_CV_SECTION_BASE + [
+        "SECCIÓN: habilidades.",
+        "- Organiza habilidades por categorías (al menos 3 categorías)",
+    ]),
+}
+
+CV_CHAT_RESPONSE_INSTRUCTIONS = "\n".join([
+    "Eres el asistente de un editor de CVs. Se acaba de generar un CV para el usuario.",
+    "Genera un campo 'chat_response' con una respuesta MUY CONCISA (máximo 2 líneas) en ESPAÑOL.",
+    "- Solo menciona LO MÁS IMPORTANTE que se agregó al CV",
+    "- Formato ejemplo: 'He creado tu CV con [X] experiencias y [Y] habilidades.'",
+])
+
+CV_PATCH_INSTRUCTIONS = "\n".join([
+    "Eres un experto en la edición de CVs profesionales.",
+    "Recibirás el CV actual en JSON y la conversación con el usuario.",
+    "Tu tarea es aplicar SOLO los cambios que pide el usuario, sin reescribir el resto del CV.",
+    "",
+    "FORMATO REQUERIDO:",
+    "- Devuelve una lista de operaciones en 'operations' (estilo JSON-Patch)",
+    "- 'op' puede ser 'replace', 'add' o 'remove'",
+    "- 'path' es un JSON Pointer sobre el CV actual, ej: '/summary', '/experiences/0/description'",
+    "- Para agregar un ítem al final de una lista usa el índice '-', ej: '/skills/-'",
+    "- 'value' es el valor nuevo completo del campo o ítem ('remove' no lleva 'value')",
+    "- Los ítems nuevos deben tener todos sus campos (ej: una experiencia lleva title, company, date y description)",
+    "- Las operaciones se aplican en orden: al eliminar ítems de una lista, elimina primero los de índice mayor",
+    "- No incluyas operaciones sobre campos que no cambian",
+    "- Escribe todo en ESPAÑOL",
+    "",
+    "RESPUESTA DEL CHAT:",
+    "- Genera un campo 'chat_response' con una respuesta MUY CONCISA (máximo 2 líneas)",
+    "- Solo menciona lo que se modificó en el CV",
+])
+
+CONVERSATION_SUMMARY_INSTRUCTIONS = "\n".join([
+    "Eres un asistente que resume conversaciones sobre la edición de un CV.",
+    "Recibirás el resumen acumulado hasta ahora (si existe) y los turnos nuevos que hay que incorporar.",
+    "",
+    "INSTRUCCIONES:",
+    "- Devuelve un único resumen actualizado que reemplace al anterior",
+    "- Conserva todas las instrucciones y preferencias del usuario que sigan vigentes",
+    "- Si una instrucción nueva contradice una anterior, conserva solo la más reciente",
+    "- Omite saludos, agradecimientos y respuestas del asistente que no aporten información",
+    "- Máximo 10 líneas, en ESPAÑOL",
+])
+
+
+def assemble_prompt(
+    instructions: str,
+    response_model: type[BaseModel],
+    user_content: str,
+) -> AssembledPrompt:
+    """Arma el prompt con el prefijo cacheable y el contenido variable del usuario."""
+    return AssembledPrompt(
+        system=_system_blocks(instructions, response_model),
+        messages=[
+            {
+                "role": "user",
+                "content": user_content,
+            }
+        ],
+    )
+
+
+def _system_blocks(instructions: str, response_model: type[BaseModel]) -> list[dict]:
+    """
+    Bloques de system nuevos en cada llamada (quien los reciba puede modificarlos
+    sin afectar a los requests siguientes) sobre un texto cacheado.
+    """
+    return [
+        {
+            "type": "text",
+            "text": _system_text(instructions, response_model),
+            "cache_control": {"type": "ephemeral"},
+        }
+    ]
+
+
+@lru_cache(maxsize=32)
+def _system_text(instructions: str, response_model: type[BaseModel]) -> str:
+    """
+    El prefijo se construye una sola vez por combinación de instrucciones y schema,
+    así el texto enviado es idéntico byte a byte en cada llamada.
+    """
+    schema = json.dumps(response_model.model_json_schema(), ensure_ascii=False, sort_keys=True)
+    return f"{instructions}\n\nESQUEMA DE RESPUESTA (JSON Schema):\n{schema}"
@@ -0,0 +1,204 @@
+"""
+Detección de skills casi duplicados (el LLM suele reescribir el mismo skill:
+"Python - 5 años, Django" vs "Python (5 anos): Django").
+
+Cada skill se representa por sus shingles de caracteres (trigramas) sobre el
+texto normalizado: minúsculas, sin tildes y con la puntuación reducida a un
+espacio, así que acentos, plurales y puntuación cambian pocos shingles. Una
+firma MinHash con LSH por bandas encuentra candidatos sin comparar todos contra
+todos. Los candidatos se confirman con la similitud de Jaccard exacta contra
+`settings.skill_dedupe_threshold`.
+
+Solo se comparan skills del mismo tipo y con los mismos números: "Backend en
+Falabella (2019-2021)" y "(2021-2023)" son dos trabajos distintos. Las
+experiencias laborales usan un umbral más alto
+(`settings.skill_dedupe_experience_threshold`): dos cargos distintos en la misma
+empresa y período comparten buena parte del texto.
+"""
+import hashlib
+import random
+import re
+import unicodedata
+from typing import Hashable, Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.models import SkillType, UserSkills
+from app.schemas.user_skills_schema import UserSkillsCreate
+from app.services import user_skills_service
+
+
+SHINGLE_SIZE = 3
+
+# 16 bandas de 4 filas: pares con Jaccard >= 0.6 son candidatos con prob. > 0.85
+LSH_BANDS = 16
+LSH_ROWS = 4
+NUM_PERMUTATIONS = LSH_BANDS * LSH_ROWS
+
+_WORD_RE = re.compile(r"[^\W_]+")
+_NUMBER_RE = re.compile(r"\d+")
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EED)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+
+
+def shingles(text: str) -> set[str]:
+    """Trigramas de caracteres del texto normalizado ("Python, 5" -> {"pyt", "yth", ..., "n 5"})."""
+    normalized = unicodedata.normalize("NFKD", user_skills_service.normalize_skill_text(text))
+    normalized = "".join(char for char in normalized if not unicodedata.combining(char))
+    normalized = " ".join(_WORD_RE.findall(normalized))
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized}
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def numbers(text: str) -> frozenset[str]:
+    """Números de `text` (años, fechas, cantidades), que deben coincidir en un duplicado."""
+    return frozenset(number.lstrip("0") or "0" for number in _NUMBER_RE.findall(text))
+
+
+def minhash_signature(shingle_set: set[str]) -> tuple[int, ...]:
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for shingle in shingle_set
+    ]
+    return tuple(
+        min((a * value + b) % _MERSENNE_PRIME for value in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def jaccard(a: set[str], b: set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class NearDuplicateIndex:
+    """Índice LSH de skills de un usuario; las claves son arbitrarias (ids, posiciones)."""
+    
+    def __init__(self, threshold: float, experience_threshold: float | None = None) -> None:
+        self.threshold = threshold
+        self.experience_threshold = max(threshold, experience_threshold or 0.0)
+        self._shingles: dict[Hashable, set[str]] = {}
+        self._numbers: dict[Hashable, frozenset[str]] = {}
+        self._buckets: dict[tuple, list[Hashable]] = {}
+    
+    def add(self, key: Hashable, skill_type: SkillType, text: str) -> None:
+        shingle_set = shingles(text)
+        self._shingles[key] = shingle_set
+        self._numbers[key] = numbers(text)
+        for bucket in self._bucket_keys(skill_type, shingle_set):
+            self._buckets.setdefault(bucket, []).append(key)
+    
+    def find(self, skill_type: SkillType, text: str) -> Optional[Hashable]:
+        """Retorna la clave del skill más parecido sobre el umbral, o None."""
+        shingle_set = shingles(text)
+        text_numbers = numbers(text)
+        candidates = {
+            key
+            for bucket in self._bucket_keys(skill_type, shingle_set)
+            for key in self._buckets.get(bucket, ())
+        }
+        best_key = None
+        best_score = self.experience_threshold if skill_type == SkillType.EXPERIENCE else self.threshold
+        for key in candidates:
+            if self._numbers[key] != text_numbers:
+                continue
+            score = jaccard(shingle_set, self._shingles[key])
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+    
+    def _bucket_keys(self, skill_type: SkillType, shingle_set: set[str]) -> Iterable[tuple]:
+        signature = minhash_signature(shingle_set)
+        for band in range(LSH_BANDS):
+            yield (skill_type, band, signature[band * LSH_ROWS:(band + 1) * LSH_ROWS])
+
+
+def filter_near_duplicates(
+    existing: list[UserSkills],
+    candidates: list[UserSkillsCreate],
+    threshold: float | None = None,
+    experience_threshold: float | None = None,
+) -> list[UserSkillsCreate]:
+    """
+    Retorna los `candidates` que no son casi duplicados de un skill existente
+    ni de otro candidato anterior.
+    """
+    index = _build_index(threshold, experience_threshold)
+    for skill in existing:
+        index.add(("existing", skill.id), skill.skill_type, skill.skill_text)
+    
+    kept = []
+    for position, skill in enumerate(candidates):
+        if index.find(skill.skill_type, skill.skill_text) is not None:
+            continue
+        index.add(("new", position), skill.skill_type, skill.skill_text)
+        kept.append(skill)
+    return kept
+
+
+def find_duplicate_groups(
+    skills: list[UserSkills],
+    threshold: float | None = None,
+    experience_threshold: float | None = None,
+) -> list[list[UserSkills]]:
+    """
+    Agrupa los skills casi duplicados entre sí. Dentro de cada grupo el primero
+    es el que se conserva (el de texto más largo, que suele traer más detalle).
+    Los skills ya reemplazados por otro no se consideran.
+    """
+    index = _build_index(threshold, experience_threshold)
+    groups: dict[int, list[UserSkills]] = {}
+    
+    active = [skill for skill in skills if skill.superseded_by_id is None]
+    for skill in sorted(active, key=lambda s: (-len(s.skill_text), s.id)):
+        match = index.find(skill.skill_type, skill.skill_text)
+        if match is None:
+            index.add(skill.id, skill.skill_type, skill.skill_text)
+            groups[skill.id] = [skill]
+        else:
+            groups[match].append(skill)
+    
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def compact_user_skills(
+    db: Session,
+    user_id: int,
+    threshold: float | None = None,
+    experience_threshold: float | None = None,
+    dry_run: bool = False,
+) -> int:
+    """
+    Marca los skills casi duplicados de un usuario como reemplazados por el que
+    se conserva en su grupo (`superseded_by_id`). No se borra nada: los skills
+    reemplazados dejan de listarse y de enviarse al LLM, pero se pueden
+    recuperar limpiando ese campo.
+    
+    Retorna la cantidad de skills reemplazados (o que se reemplazarían con `dry_run`).
+    """
+    skills = user_skills_service.get_user_skills_by_user(db, user_id)
+    replaced = 0
+    for kept, *duplicates in find_duplicate_groups(skills, threshold, experience_threshold):
+        replaced += len(duplicates)
+        if not dry_run:
+            for skill in duplicates:
+                skill.superseded_by_id = kept.id
+    
+    if not dry_run and replaced:
+        db.commit()
+    return replaced
+
+
+def _build_index(threshold: float | None, experience_threshold: float | None) -> NearDuplicateIndex:
+    return NearDuplicateIndex(
+        settings.skill_dedupe_threshold if threshold is None else threshold,
+        settings.skill_dedupe_experience_threshold if experience_threshold is None else experience_threshold,
+    )
@@ -1,11 +1,44 @@
+"""
+Templates de CV y su renderizado con Jinja (delimitadores `<< >>` y `<% %>`
+para no chocar con la sintaxis de Typst).
+
+Los templates compilados se guardan en un LRU en memoria con clave
+`(template.id, hash del contenido)`, así un template editado nunca usa una
+versión compilada vieja. Si `settings.template_bytecode_cache_dir` está
+definido, el bytecode también se guarda en disco y sobrevive reinicios.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
 from typing import Optional
 
+from jinja2 import Environment, FileSystemBytecodeCache
 from jinja2 import Template as JinjaTemplate
 from sqlalchemy.orm import Session
 
+from app.config import settings
 from app.database.models import Template
 
 
+def _create_environment() -> Environment:
+    bytecode_cache = None
+    if settings.template_bytecode_cache_dir:
+        bytecode_cache = FileSystemBytecodeCache(settings.template_bytecode_cache_dir)
+    return Environment(
+        variable_start_string='<<',
+        variable_end_string='>>',
+        block_start_string='<%',
+        block_end_string='%>',
+        bytecode_cache=bytecode_cache,
+    )
+
+
+_environment = _create_environment()
+_compiled: OrderedDict[tuple[Optional[int], str], JinjaTemplate] = OrderedDict()
+_compiled_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0}
+
+
 def get_templates(db: Session) -> list[Template]:
     return db.query(Template).all()
 
@@ -15,13 +48,64 @@ def get_template(db: Session, template_id: int) -> Optional[Template]:
 
 
 def render_template(template: Template, data: dict) -> str:
-    jinja_template = JinjaTemplate(
-        template.template_content,
-        variable_start_string='<<',
-        variable_end_string='>>',
-        block_start_string='<%',
-        block_end_string='%>'
-    )
+    return _get_compiled(template).render(**data)
+
+
+def invalidate_template_cache(template_id: Optional[int] = None) -> None:
+    """
+    Descarta los templates compilados de `template_id` (o todos). No es
+    necesario para la correctitud, porque la clave incluye el hash del
+    contenido; libera las versiones viejas al editar un template.
+    """
+    with _compiled_lock:
+        if template_id is None:
+            _compiled.clear()
+            return
+        for key in [key for key in _compiled if key[0] == template_id]:
+            del _compiled[key]
+
+
+def get_template_cache_stats() -> dict:
+    with _compiled_lock:
+        return {"size": len(_compiled), "max_size": settings.template_cache_size, **_cache_stats}
+
+
+def _get_compiled(template: Template) -> JinjaTemplate:
+    source = template.template_content
+    key = (template.id, hashlib.sha256(source.encode("utf-8")).hexdigest())
+    
+    with _compiled_lock:
+        compiled = _compiled.get(key)
+        if compiled is not None:
+            _compiled.move_to_end(key)
+            _cache_stats["hits"] += 1
+            return compiled
+        _cache_stats["misses"] += 1
+    
+    # Compilar fuera del lock; si dos threads compilan a la vez gana el último
+    compiled = _compile(f"template-{key[0]}-{key[1][:16]}", source)
     
-    return jinja_template.render(**data)
+    with _compiled_lock:
+        _compiled[key] = compiled
+        _compiled.move_to_end(key)
+        while len(_compiled) > settings.template_cache_size:
+            _compiled.popitem(last=False)
+    return compiled
 
+
+def _compile(name: str, source: str) -> JinjaTemplate:
+    """Igual que `BaseLoader.load` de Jinja, pero con el contenido desde la base."""
+    bytecode_cache = _environment.bytecode_cache
+    bucket = None
+    code = None
+    if bytecode_cache is not None:
+        bucket = bytecode_cache.get_bucket(_environment, name, None, source)
+        code = bucket.code
+    
+    if code is None:
+        code = _environment.compile(source, name)
+        if bucket is not None:
+            bucket.code = code
+            bytecode_cache.set_bucket(bucket)
+    
+    return _environment.template_class.from_code(_environment, code, _environment.make_globals(None))
@@ -0,0 +1,206 @@
+"""
+Sesiones residentes de `typst watch` para la edición interactiva de CVs.
+
+Un `typst compile` nuevo por cada regeneración vuelve a cargar fuentes y
+resolver paquetes. Con `settings.typst_watch_enabled`, cada CV que se está
+editando tiene su propio workspace con un proceso `typst watch` vivo. Cada
+compilación solo reescribe `main.typ` y espera a que Typst reporte el
+resultado, reutilizando su cache de fuentes, paquetes y layout.
+
+Las sesiones sin uso por `settings.typst_watch_idle_seconds` se cierran (también
+desde una tarea de fondo). Hay un máximo de `settings.typst_watch_max_sessions`
+procesos; al llegar al máximo se cierra la sesión usada hace más tiempo.
+"""
+import asyncio
+import logging
+import os
+import re
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Hashable, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# Typst escribe los diagnósticos de error justo después de la línea de estado
+ERROR_OUTPUT_GRACE_SECONDS = 0.1
+
+_ANSI_RE = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+
+
+class TypstWatchSession:
+    """Un proceso `typst watch` sobre un workspace propio."""
+    
+    def __init__(self, binary: str, options: list[str]) -> None:
+        self.binary = binary
+        self.options = options
+        self.workspace = Path(tempfile.mkdtemp(prefix="typst-watch-"))
+        self.main = self.workspace / "main.typ"
+        self.output = self.workspace / "main.pdf"
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._statuses: asyncio.Queue[tuple[bool, int]] = asyncio.Queue()
+        self._lines: list[str] = []
+        self._lock = asyncio.Lock()
+        self._compiled_source: Optional[str] = None
+        self.last_used = time.monotonic()
+        self.compiles = 0
+    
+    @property
+    def alive(self) -> bool:
+        return self._process is not None and self._process.returncode is None
+    
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+    
+    async def compile(self, source: str, timeout_seconds: float) -> Path:
+        """Escribe `source` y espera la recompilación. Retorna la ruta del PDF del workspace."""
+        # Import local: pdf_service importa este módulo
+        from app.services.pdf_service import TypstCompileError
+        
+        async with self._lock:
+            self.last_used = time.monotonic()
+            if source == self._compiled_source and self.alive:
+                return self.output
+            
+            while not self._statuses.empty():
+                self._statuses.get_nowait()
+            self._lines.clear()
+            # Escritura atómica para que Typst no lea el archivo a medias
+            tmp_main = self.main.with_suffix(".typ.tmp")
+            tmp_main.write_text(source, encoding="utf-8")
+            os.replace(tmp_main, self.main)
+            
+            if not self.alive:
+                await self._start()
+            
+            try:
+                success, line_index = await asyncio.wait_for(self._statuses.get(), timeout=timeout_seconds)
+            except asyncio.TimeoutError:
+                await self.close()
+                raise TypstCompileError(f"Typst compilation timed out after {timeout_seconds}s", 504)
+            
+            if not success:
+                await asyncio.sleep(ERROR_OUTPUT_GRACE_SECONDS)
+                message = "\n".join(line for line in self._lines[line_index:] if line).strip()
+                raise TypstCompileError(f"Typst compilation failed: {message}", 422)
+            
+            self._compiled_source = source
+            self.compiles += 1
+            self.last_used = time.monotonic()
+            return self.output
+    
+    async def close(self) -> None:
+        if self.alive:
+            self._process.kill()
+            await self._process.wait()
+        if self._reader is not None:
+            self._reader.cancel()
+            await asyncio.gather(self._reader, return_exceptions=True)
+        shutil.rmtree(self.workspace, ignore_errors=True)
+    
+    async def _start(self) -> None:
+        from app.services.pdf_service import TypstCompileError
+        
+        command = [self.binary, "watch", "--root", str(self.workspace), *self.options, str(self.main), str(self.output)]
+        try:
+            self._process = await asyncio.create_subprocess_exec(
+                *command,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except FileNotFoundError:
+            raise TypstCompileError(f"Typst binary not found: {self.binary}", 503)
+        self._reader = asyncio.create_task(self._read_output())
+    
+    async def _read_output(self) -> None:
+        """Lee el stderr de `typst watch` y publica cada línea de estado."""
+        while True:
+            raw = await self._process.stderr.readline()
+            if not raw:
+                # El proceso terminó: la compilación en curso falla sin esperar el timeout
+                self._statuses.put_nowait((False, 0))
+                return
+            line = _ANSI_RE.sub("", raw.decode("utf-8", errors="replace")).strip()
+            self._lines.append(line)
+            lowered = line.lower()
+            if "compiled successfully" in lowered or "compiled with warnings" in lowered:
+                self._statuses.put_nowait((True, len(self._lines)))
+            elif "compiled with errors" in lowered:
+                self._statuses.put_nowait((False, len(self._lines)))
+
+
+class TypstSessionManager:
+    """Sesiones por clave (el id del CV), con tope de procesos y cierre por inactividad."""
+    
+    def __init__(self, binary: str, options: list[str], max_sessions: int, idle_seconds: float) -> None:
+        self.binary = binary
+        self.options = options
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._sessions: OrderedDict[Hashable, TypstWatchSession] = OrderedDict()
+        self._reaper: Optional[asyncio.Task] = None
+    
+    @property
+    def session_count(self) -> int:
+        return len(self._sessions)
+    
+    async def compile(self, key: Hashable, source: str, timeout_seconds: float) -> Path:
+        await self.evict_idle()
+        session = self._sessions.get(key)
+        if session is None:
+            # Se cierra la sesión usada hace más tiempo, salvo las que están compilando
+            while len(self._sessions) >= self.max_sessions:
+                oldest_key = next((k for k, s in self._sessions.items() if not s.busy), None)
+                if oldest_key is None:
+                    break
+                await self._sessions.pop(oldest_key).close()
+            session = TypstWatchSession(self.binary, self.options)
+            self._sessions[key] = session
+        self._sessions.move_to_end(key)
+        
+        try:
+            return await session.compile(source, timeout_seconds)
+        except BaseException:
+            # Una sesión cuyo proceso murió (timeout o error al iniciar) no se reutiliza
+            if not session.alive and self._sessions.get(key) is session:
+                del self._sessions[key]
+                await session.close()
+            raise
+    
+    async def evict_idle(self) -> int:
+        limit = time.monotonic() - self.idle_seconds
+        idle = [
+            key for key, session in self._sessions.items()
+            if session.last_used < limit and not session.busy
+        ]
+        for key in idle:
+            session = self._sessions.pop(key)
+            logger.info("Closing idle typst watch session %s", key)
+            await session.close()
+        return len(idle)
+    
+    def start_reaper(self) -> None:
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap())
+    
+    async def close(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            self._reaper = None
+        while self._sessions:
+            _, session = self._sessions.popitem()
+            await session.close()
+    
+    async def _reap(self) -> None:
+        while True:
+            await asyncio.sleep(max(self.idle_seconds / 4, 1))
+            try:
+                await self.evict_idle()
+            except Exception:
+                logger.exception("Could not evict idle typst watch sessions")
@@ -1,16 +1,43 @@
+import hashlib
+from datetime import datetime
 from typing import Optional
 
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
 from app.database.models import UserSkills, SkillType
 from app.schemas.user_skills_schema import UserSkillsCreate, UserSkillsUpdate, UserSkillsGroupedResponse
 
 
+BACKFILL_CHUNK_SIZE = 500
+
+
+def normalize_skill_text(text: str) -> str:
+    """Texto comparable de un skill: minúsculas y espacios colapsados."""
+    return " ".join(text.casefold().split())
+
+
+def skill_fingerprint(text: str) -> str:
+    return hashlib.sha256(normalize_skill_text(text).encode("utf-8")).hexdigest()
+
+
 def create_user_skills(db: Session, user_id: int, skills_data: UserSkillsCreate) -> UserSkills:
+    fingerprint = skill_fingerprint(skills_data.skill_text)
+    existing = _get_by_fingerprint(db, user_id, skills_data.skill_type, fingerprint)
+    if existing:
+        if existing.superseded_by_id is not None:
+            # Volver a agregarlo explícitamente lo recupera
+            existing.superseded_by_id = None
+            db.commit()
+            db.refresh(existing)
+        return existing
+    
     db_skills = UserSkills(
         user_id=user_id,
         skill_text=skills_data.skill_text,
         skill_type=skills_data.skill_type,
+        fingerprint=fingerprint,
         raw_input=skills_data.raw_input,
         source=skills_data.source,
     )
@@ -21,12 +48,53 @@ def create_user_skills(db: Session, user_id: int, skills_data: UserSkillsCreate)
     return db_skills
 
 
+def bulk_create_user_skills(db: Session, user_id: int, skills_data: list[UserSkillsCreate]) -> int:
+    """
+    Inserta varios skills en un solo INSERT ... ON CONFLICT DO NOTHING y un
+    solo commit. Los que ya existen (mismo tipo y texto normalizado) se omiten.
+    
+    Retorna la cantidad de skills insertados.
+    """
+    if not skills_data:
+        return 0
+    
+    now = datetime.utcnow()
+    rows = {}
+    for skill in skills_data:
+        fingerprint = skill_fingerprint(skill.skill_text)
+        rows.setdefault((skill.skill_type, fingerprint), {
+            "user_id": user_id,
+            "skill_text": skill.skill_text,
+            "skill_type": skill.skill_type,
+            "fingerprint": fingerprint,
+            "raw_input": skill.raw_input,
+            "source": skill.source,
+            "created_at": now,
+            "updated_at": now,
+        })
+    
+    statement = (
+        insert(UserSkills)
+        .values(list(rows.values()))
+        .on_conflict_do_nothing(index_elements=["user_id", "skill_type", "fingerprint"])
+        .returning(UserSkills.id)
+    )
+    inserted = len(db.execute(statement).all())
+    db.commit()
+    return inserted
+
+
 def get_user_skills(db: Session, skills_id: int) -> Optional[UserSkills]:
     return db.query(UserSkills).filter(UserSkills.id == skills_id).first()
 
 
 def get_user_skills_by_user(db: Session, user_id: int) -> list[UserSkills]:
-    return db.query(UserSkills).filter(UserSkills.user_id == user_id).all()
+    """Skills vigentes del usuario (sin los reemplazados por un casi duplicado)."""
+    return (
+        db.query(UserSkills)
+        .filter(UserSkills.user_id == user_id, UserSkills.superseded_by_id.is_(None))
+        .all()
+    )
 
 
 def get_user_skills_by_user_grouped(db: Session, user_id: int) -> UserSkillsGroupedResponse:
@@ -57,8 +125,15 @@ def update_user_skills(
     if not skills:
         return None
     
+    skill_type = skills_data.skill_type or skills.skill_type
+    fingerprint = skill_fingerprint(skills_data.skill_text or skills.skill_text)
+    duplicate = _get_by_fingerprint(db, skills.user_id, skill_type, fingerprint)
+    if duplicate and duplicate.id != skills.id:
+        raise ValueError("The user already has this skill")
+    
     if skills_data.skill_text is not None:
         skills.skill_text = skills_data.skill_text
+        skills.fingerprint = fingerprint
     if skills_data.skill_type is not None:
         skills.skill_type = skills_data.skill_type
     if skills_data.raw_input is not None:
@@ -80,3 +155,85 @@ def delete_user_skills(db: Session, skills_id: int) -> bool:
     db.commit()
     return True
 
+
+def backfill_fingerprints(db: Session, chunk_size: int = BACKFILL_CHUNK_SIZE) -> int:
+    """
+    Calcula `fingerprint` de los skills guardados antes de que existiera la
+    columna, por bloques de `chunk_size` filas con un commit por bloque.
+    
+    Retorna la cantidad de skills actualizados.
+    """
+    updated = 0
+    
+    while True:
+        chunk = (
+            db.query(UserSkills)
+            .filter(UserSkills.fingerprint.is_(None))
+            .order_by(UserSkills.id)
+            .limit(chunk_size)
+            .all()
+        )
+        if not chunk:
+            return updated
+        
+        for skills in chunk:
+            skills.fingerprint = skill_fingerprint(skills.skill_text)
+        db.commit()
+        # Soltar las filas ya procesadas para que la memoria no crezca con la tabla
+        db.expunge_all()
+        updated += len(chunk)
+
+
+def collapse_duplicate_fingerprints(db: Session) -> int:
+    """
+    Deja un solo skill (el más antiguo) por usuario, tipo y `fingerprint`, para
+    poder crear el índice único sobre una base que ya tenía repetidos. Los
+    borrados tienen el mismo texto normalizado que el que queda, así que no se
+    pierde información; lo que apuntaba a ellos pasa a apuntar al que queda.
+    
+    Retorna la cantidad de skills borrados.
+    """
+    groups = (
+        db.query(UserSkills.user_id, UserSkills.skill_type, UserSkills.fingerprint)
+        .group_by(UserSkills.user_id, UserSkills.skill_type, UserSkills.fingerprint)
+        .having(func.count(UserSkills.id) > 1)
+        .all()
+    )
+    
+    removed = 0
+    for user_id, skill_type, fingerprint in groups:
+        kept, *duplicates = (
+            db.query(UserSkills)
+            .filter(
+                UserSkills.user_id == user_id,
+                UserSkills.skill_type == skill_type,
+                UserSkills.fingerprint == fingerprint,
+            )
+            .order_by(UserSkills.id)
+            .all()
+        )
+        duplicate_ids = [skills.id for skills in duplicates]
+        
+        # Si alguna copia estaba vigente, la que queda también lo está
+        if any(skills.superseded_by_id is None for skills in duplicates):
+            kept.superseded_by_id = None
+        for skills in db.query(UserSkills).filter(UserSkills.superseded_by_id.in_(duplicate_ids)):
+            skills.superseded_by_id = None if skills.id == kept.id else kept.id
+        db.flush()
+        
+        for skills in duplicates:
+            db.delete(skills)
+        removed += len(duplicates)
+    
+    db.commit()
+    return removed
+
+
+def _get_by_fingerprint(
+    db: Session, user_id: int, skill_type: SkillType, fingerprint: str
+) -> Optional[UserSkills]:
+    return db.query(UserSkills).filter(
+        UserSkills.user_id == user_id,
+        UserSkills.skill_type == skill_type,
+        UserSkills.fingerprint == fingerprint,
+    ).first()
@@ -0,0 +1,6 @@
+from pydantic import BaseModel, Field
+
+
+class ConversationSummary(BaseModel):
+    """Resumen acumulado de los turnos antiguos del chat de un CV"""
+    summary: str = Field(..., description="Resumen actualizado de la conversación")
@@ -1,3 +1,5 @@
+from typing import Any, Literal
+
 from pydantic import BaseModel
 
 
@@ -40,3 +42,43 @@ class GeneratedCVContentSimple(GeneratedCVContent):
     skills: list[Skill]
     chat_response: str
 
+
+class CVHeaderSection(BaseModel):
+    """Datos personales y resumen (generación por secciones)"""
+    firstname: str
+    lastname: str
+    email: str
+    phone: str
+    github: str | None = None
+    linkedin: str | None = None
+    address: str
+    summary: str
+
+
+class CVExperiencesSection(BaseModel):
+    experiences: list[Experience]
+
+
+class CVEducationSection(BaseModel):
+    education: list[Education]
+
+
+class CVSkillsSection(BaseModel):
+    skills: list[Skill]
+
+
+class CVChatResponse(BaseModel):
+    chat_response: str
+
+
+class CVPatchOperation(BaseModel):
+    """Operación estilo JSON-Patch (RFC 6902) sobre el contenido del CV"""
+    op: Literal["add", "remove", "replace"]
+    path: str  # JSON Pointer, ej: "/summary", "/experiences/0/description", "/skills/-"
+    value: Any = None
+
+
+class GeneratedCVPatch(BaseModel):
+    """Cambios sobre el CV actual en vez de reescribirlo completo"""
+    operations: list[CVPatchOperation]
+    chat_response: str
@@ -1,6 +1,51 @@
-from pydantic import BaseModel
+import enum
+
+from pydantic import BaseModel, ConfigDict
+
+from app.database.models import CV, Project, Template, User, UserSkills
 
 
 class CVServiceData(BaseModel):
     """Types para lógica de negocio de CV service (si se necesitan)"""
     pass
+
+
+class CVRegenerateMode(str, enum.Enum):
+    FULL = "full"    # El LLM reescribe el CV completo
+    PATCH = "patch"  # El LLM devuelve solo operaciones sobre el contenido actual
+
+
+class CVGenerationStrategy(str, enum.Enum):
+    SINGLE = "single"      # Una sola llamada genera el CV completo
+    PARALLEL = "parallel"  # Una llamada por sección, en paralelo
+
+
+class CVGenerationContext(BaseModel):
+    """Todo lo que se necesita para generar (o regenerar) el contenido de un CV"""
+    template: Template | None
+    project: Project
+    user: User
+    user_skills: list[UserSkills]
+    base_cv: CV | None = None
+    company_info: dict | None = None
+    conversation_history: list[dict]
+    # Turnos que van textuales en el prompt (si el historial fue compactado) y
+    # resumen de los anteriores
+    prompt_history: list[dict] | None = None
+    conversation_summary: str | None = None
+    
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+    
+    def llm_kwargs(self) -> dict:
+        """Argumentos para `llm_service.generate_cv_content` / `stream_cv_content`"""
+        return {
+            "user": self.user,
+            "user_skills": self.user_skills,
+            "project": self.project,
+            "base_cv": self.base_cv,
+            "company_info": self.company_info,
+            "conversation_history": (
+                self.prompt_history if self.prompt_history is not None else self.conversation_history
+            ),
+            "conversation_summary": self.conversation_summary,
+        }
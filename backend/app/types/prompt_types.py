@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+
+
+class AssembledPrompt(BaseModel):
+    """
+    Prompt separado en un prefijo estable (bloques de system, cacheables por el
+    proveedor) y un sufijo variable con los datos del usuario (messages).
+    """
+    system: list[dict]
+    messages: list[dict]
+
+
+class LLMUsage(BaseModel):
+    """Tokens consumidos por una llamada al LLM"""
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
@@ -0,0 +1,32 @@
+"""
+Script para normalizar las descripciones de ofertas ya guardadas.
+
+Calcula `description_text`, `description_snippet` y `description_tokens` por
+bloques, haciendo commit por bloque, para las ofertas que aún no los tienen.
+
+Uso:
+    python -m scripts.backfill_job_descriptions [--chunk-size 500] [--recompute]
+"""
+import argparse
+
+from app.database.setup import SessionLocal
+from app.services.job_offering_service import BACKFILL_CHUNK_SIZE, backfill_descriptions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Normaliza las descripciones de ofertas existentes")
+    parser.add_argument("--chunk-size", type=int, default=BACKFILL_CHUNK_SIZE, help="Ofertas por commit")
+    parser.add_argument("--recompute", action="store_true", help="Recalcular también las ya normalizadas")
+    args = parser.parse_args()
+    
+    db = SessionLocal()
+    try:
+        print("🧹 Normalizando descripciones de ofertas...")
+        updated = backfill_descriptions(db, chunk_size=args.chunk_size, recompute=args.recompute)
+        print(f"✅ {updated} oferta(s) actualizadas.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Script para actualizar la tabla `user_skills` de una base creada antes de las
+columnas `fingerprint` y `superseded_by_id`.
+
+`init_db` (create_all) no modifica tablas existentes, así que este script:
+
+1. Agrega las columnas que falten (`fingerprint` primero como nullable).
+2. Calcula `fingerprint` de los skills existentes, por bloques.
+3. Deja un solo skill por usuario, tipo y `fingerprint` (borra las copias
+   exactas, ver `user_skills_service.collapse_duplicate_fingerprints`).
+4. Crea el índice único `uq_user_skills_fingerprint` y, en PostgreSQL, marca
+   `fingerprint` como NOT NULL.
+
+Se puede correr más de una vez: cada paso se salta si ya está hecho.
+
+Uso:
+    python -m scripts.backfill_skill_fingerprints [--chunk-size 500]
+"""
+import argparse
+
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+
+from app.database.setup import SessionLocal
+from app.services.user_skills_service import (
+    BACKFILL_CHUNK_SIZE,
+    backfill_fingerprints,
+    collapse_duplicate_fingerprints,
+)
+
+
+CONSTRAINT_NAME = "uq_user_skills_fingerprint"
+
+
+def upgrade_user_skills(db: Session, chunk_size: int = BACKFILL_CHUNK_SIZE) -> tuple[int, int]:
+    """
+    Deja `user_skills` con el esquema actual. Retorna (skills actualizados,
+    skills duplicados borrados).
+    """
+    connection = db.connection()
+    columns = {column["name"] for column in inspect(connection).get_columns("user_skills")}
+    if "fingerprint" not in columns:
+        connection.execute(text("ALTER TABLE user_skills ADD COLUMN fingerprint VARCHAR(64)"))
+    if "superseded_by_id" not in columns:
+        connection.execute(text(
+            "ALTER TABLE user_skills ADD COLUMN superseded_by_id INTEGER "
+            "REFERENCES user_skills(id) ON DELETE SET NULL"
+        ))
+    db.commit()
+    
+    updated = backfill_fingerprints(db, chunk_size=chunk_size)
+    removed = collapse_duplicate_fingerprints(db)
+    
+    connection = db.connection()
+    inspector = inspect(connection)
+    names = {constraint["name"] for constraint in inspector.get_unique_constraints("user_skills")}
+    names |= {index["name"] for index in inspector.get_indexes("user_skills")}
+    postgres = connection.dialect.name == "postgresql"
+    if CONSTRAINT_NAME not in names:
+        if postgres:
+            connection.execute(text(
+                f"ALTER TABLE user_skills ADD CONSTRAINT {CONSTRAINT_NAME} "
+                "UNIQUE (user_id, skill_type, fingerprint)"
+            ))
+        else:
+            # SQLite no permite agregar constraints a una tabla existente
+            connection.execute(text(
+                f"CREATE UNIQUE INDEX {CONSTRAINT_NAME} ON user_skills (user_id, skill_type, fingerprint)"
+            ))
+    if postgres:
+        connection.execute(text("ALTER TABLE user_skills ALTER COLUMN fingerprint SET NOT NULL"))
+    db.commit()
+    
+    return updated, removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Actualiza user_skills al esquema con fingerprint")
+    parser.add_argument("--chunk-size", type=int, default=BACKFILL_CHUNK_SIZE, help="Skills por commit")
+    args = parser.parse_args()
+    
+    db = SessionLocal()
+    try:
+        print("🔑 Calculando fingerprints de skills...")
+        updated, removed = upgrade_user_skills(db, chunk_size=args.chunk_size)
+        print(f"✅ {updated} skill(s) actualizados, {removed} duplicado(s) exactos borrados.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark del renderizado de templates de CV.
+
+Compara compilar el template en cada render (como antes del cache) contra
+`template_service.render_template`, que reutiliza el template compilado.
+No necesita base de datos: lee los `.typ` de `templates/` y usa datos del
+proveedor fake del LLM.
+
+Uso:
+    python -m scripts.benchmark_render [--iterations 500]
+"""
+import argparse
+import time
+from pathlib import Path
+
+from jinja2 import Template as JinjaTemplate
+
+from app.database.models import Template
+from app.services import llm_provider_service, template_service
+from app.types.cv_content_types import GeneratedCVContentSimple
+
+
+def _uncached_render(template: Template, data: dict) -> str:
+    return JinjaTemplate(
+        template.template_content,
+        variable_start_string='<<',
+        variable_end_string='>>',
+        block_start_string='<%',
+        block_end_string='%>'
+    ).render(**data)
+
+
+def _measure(render, template: Template, data: dict, iterations: int) -> float:
+    """Retorna el tiempo promedio por render en milisegundos."""
+    started = time.perf_counter()
+    for _ in range(iterations):
+        render(template, data)
+    return (time.perf_counter() - started) * 1000 / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de render de templates")
+    parser.add_argument("--iterations", type=int, default=500, help="Renders por template y variante")
+    args = parser.parse_args()
+    
+    data = llm_provider_service.fake_response(GeneratedCVContentSimple, []).model_dump()
+    templates_dir = Path(__file__).parent.parent / "templates"
+    
+    print(f"⏱️  {args.iterations} renders por variante\n")
+    for index, typ_file in enumerate(sorted(templates_dir.glob("*.typ")), start=1):
+        template = Template(id=index, template_content=typ_file.read_text(encoding="utf-8"))
+        assert _uncached_render(template, data) == template_service.render_template(template, data)
+        
+        uncached_ms = _measure(_uncached_render, template, data, args.iterations)
+        cached_ms = _measure(template_service.render_template, template, data, args.iterations)
+        print(f"{typ_file.name}:")
+        print(f"   - Compilando cada vez: {uncached_ms:.3f} ms/render")
+        print(f"   - Con cache:           {cached_ms:.3f} ms/render ({uncached_ms / cached_ms:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
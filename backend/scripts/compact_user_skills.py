@@ -0,0 +1,57 @@
+"""
+Script para compactar los skills casi duplicados de los usuarios.
+
+Por cada grupo de skills del mismo tipo con similitud sobre el umbral conserva
+el de texto más largo y marca el resto como reemplazados por ese (no borra
+filas; ver `skill_dedupe_service`).
+
+Uso:
+    python -m scripts.compact_user_skills [--user-id 1] [--threshold 0.7] [--experience-threshold 0.85] [--dry-run]
+"""
+import argparse
+
+from app.database.setup import SessionLocal
+from app.database.models import User
+from app.services import skill_dedupe_service
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compacta skills casi duplicados")
+    parser.add_argument("--user-id", type=int, help="Solo este usuario (por defecto, todos)")
+    parser.add_argument("--threshold", type=float, help="Similitud mínima (por defecto SKILL_DEDUPE_THRESHOLD)")
+    parser.add_argument(
+        "--experience-threshold",
+        type=float,
+        help="Similitud mínima para experiencias (por defecto SKILL_DEDUPE_EXPERIENCE_THRESHOLD)",
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Solo contar, sin modificar")
+    args = parser.parse_args()
+    
+    db = SessionLocal()
+    try:
+        if args.user_id:
+            user_ids = [args.user_id]
+        else:
+            user_ids = [user_id for (user_id,) in db.query(User.id).order_by(User.id).all()]
+        
+        total = 0
+        for user_id in user_ids:
+            replaced = skill_dedupe_service.compact_user_skills(
+                db,
+                user_id,
+                threshold=args.threshold,
+                experience_threshold=args.experience_threshold,
+                dry_run=args.dry_run,
+            )
+            if replaced:
+                print(f"  - Usuario {user_id}: {replaced} skill(s) duplicados")
+            total += replaced
+        
+        action = "se reemplazarían" if args.dry_run else "reemplazados"
+        print(f"✅ {total} skill(s) {action} en {len(user_ids)} usuario(s).")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
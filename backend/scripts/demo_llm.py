@@ -1,7 +1,15 @@
 """
 Script para probar el LLM service manualmente usando requests.
 Usa la API directamente como lo haría el frontend.
+
+Uso:
+    python -m scripts.demo_llm [--email demo@example.com]
+
+El email por defecto lleva un timestamp y forma parte del prompt, así que con
+`LLM_CASSETTE_MODE=replay` hay que pasar el mismo `--email` con que se grabó
+(sobre una base de datos limpia).
 """
+import argparse
 import requests
 from pathlib import Path
 from datetime import datetime
@@ -10,13 +18,13 @@ from datetime import datetime
 BASE_URL = "http://localhost:8000/api/v1"
 
 
-def test_llm():
+def test_llm(email: str):
     try:
         print("👤 Creando usuario de prueba...")
         user_response = requests.post(
             f"{BASE_URL}/users",
             json={
-                "email": f"llm_test_{int(datetime.now().timestamp())}@example.com",
+                "email": email,
                 "full_name": "María González Test",
                 "password": "testpass123",
             },
@@ -142,10 +150,18 @@ def test_llm():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba el LLM service vía la API")
+    parser.add_argument(
+        "--email",
+        default=f"llm_test_{int(datetime.now().timestamp())}@example.com",
+        help="Email del usuario de prueba (fijo para reproducir un cassette)",
+    )
+    args = parser.parse_args()
+    
     print("="*60)
     print("🧪 TEST DEL LLM SERVICE")
     print("="*60)
-    test_llm()
+    test_llm(args.email)
     print("\n" + "="*60)
     print("✨ Test completado")
     print("="*60)
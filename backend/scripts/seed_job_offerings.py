@@ -9,6 +9,7 @@ from sqlalchemy.exc import IntegrityError
 
 from app.database.setup import SessionLocal
 from app.database.models import JobOffering
+from app.services.job_offering_service import normalize_description
 
 
 def seed_job_offerings():
@@ -75,6 +76,8 @@ def seed_job_offerings():
                     api_url=job_data.get("api_url"),
                     extra_data=job_data.get("extra_data")
                 )
+                # Texto plano, snippet y tokens se calculan una sola vez al ingresar
+                normalize_description(job_offering)
                 
                 db.add(job_offering)
                 added_count += 1
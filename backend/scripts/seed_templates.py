@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session
 
 from app.database.models import Template
 from app.database.setup import SessionLocal
+from app.services.template_service import invalidate_template_cache
 
 
 def seed_templates(db: Session):
@@ -34,6 +35,7 @@ def seed_templates(db: Session):
             existing.description = template_info["description"]
             existing.template_type = template_info["template_type"]
             existing.style = template_info["style"]
+            invalidate_template_cache(existing.id)
             print(f"Updated template: {template_info['name']}")
         else:
             new_template = Template(
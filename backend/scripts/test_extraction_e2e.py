@@ -6,9 +6,14 @@ Requiere:
 - Base de datos limpia o al menos sin conflictos
 
 Uso:
-    uv run python -m scripts.test_extraction_e2e
+    uv run python -m scripts.test_extraction_e2e [--email e2e@example.com]
+
+El email por defecto lleva un timestamp y forma parte de los prompts; para
+reproducir un cassette (`LLM_CASSETTE_MODE=replay`) hay que pasar el mismo
+`--email` con que se grabó.
 """
 
+import argparse
 import requests
 import json
 from datetime import datetime
@@ -33,12 +38,20 @@ def print_response(response: requests.Response):
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Test E2E de extracción de perfil")
+    parser.add_argument(
+        "--email",
+        default=f"test_extraction_{datetime.now().timestamp()}@example.com",
+        help="Email del usuario de prueba (fijo para reproducir un cassette)",
+    )
+    args = parser.parse_args()
+    
     print_section("INICIO DE TEST E2E - EXTRACCIÓN DE PERFIL")
     
     # 1. Crear usuario
     print_section("1. Crear Usuario")
     user_data = {
-        "email": f"test_extraction_{datetime.now().timestamp()}@example.com",
+        "email": args.email,
         "password": "testpass123",
         "full_name": "Test User Extraction"
     }
@@ -0,0 +1,65 @@
+"""
+Descarga los paquetes de Typst que usan los templates (por ejemplo
+`@preview/modern-cv`) y sus dependencias a `settings.typst_package_dir`, para
+que la compilación a PDF funcione sin red.
+
+Busca los `#import "@preview/nombre:versión"` en `templates/*.typ` y, de forma
+recursiva, en los archivos de cada paquete descargado.
+
+Uso:
+    python -m scripts.vendor_typst_packages
+"""
+import io
+import re
+import tarfile
+import urllib.request
+from pathlib import Path
+
+from app.config import settings
+
+
+PACKAGES_URL = "https://packages.typst.org/{namespace}/{name}-{version}.tar.gz"
+IMPORT_RE = re.compile(r'"@(?P<namespace>[\w-]+)/(?P<name>[\w-]+):(?P<version>[\d.]+)"')
+
+
+def find_imports(directory: Path) -> set[tuple[str, str, str]]:
+    imports = set()
+    for typ_file in directory.rglob("*.typ"):
+        for match in IMPORT_RE.finditer(typ_file.read_text(encoding="utf-8")):
+            imports.add((match["namespace"], match["name"], match["version"]))
+    return imports
+
+
+def vendor_package(package_dir: Path, namespace: str, name: str, version: str) -> Path:
+    target = package_dir / namespace / name / version
+    if target.exists():
+        print(f"   ✔ @{namespace}/{name}:{version} ya está")
+        return target
+    
+    url = PACKAGES_URL.format(namespace=namespace, name=name, version=version)
+    print(f"   ⬇️  @{namespace}/{name}:{version}")
+    with urllib.request.urlopen(url, timeout=60) as response:
+        archive = tarfile.open(fileobj=io.BytesIO(response.read()), mode="r:gz")
+    target.mkdir(parents=True)
+    archive.extractall(target, filter="data")
+    return target
+
+
+def main():
+    package_dir = Path(settings.typst_package_dir)
+    templates_dir = Path(__file__).parent.parent / "templates"
+    
+    print(f"📦 Vendoreando paquetes de Typst en {package_dir}...")
+    pending = find_imports(templates_dir)
+    done = set()
+    while pending:
+        package = pending.pop()
+        done.add(package)
+        target = vendor_package(package_dir, *package)
+        pending |= find_imports(target) - done
+    
+    print(f"✅ {len(done)} paquete(s) disponibles sin red.")
+
+
+if __name__ == "__main__":
+    main()
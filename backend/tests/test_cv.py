@@ -1,9 +1,27 @@
-from unittest.mock import patch
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
 
 import pytest
 from fastapi.testclient import TestClient
 
-from app.types.cv_content_types import GeneratedCVContentSimple, Experience, Education, Skill
+from app.config import settings
+from app.database.models import JobOffering
+from app.services import cv_patch_service, cv_service
+from app.types.conversation_types import ConversationSummary
+from app.types.cv_content_types import (
+    CVChatResponse,
+    CVEducationSection,
+    CVExperiencesSection,
+    CVHeaderSection,
+    CVPatchOperation,
+    CVSkillsSection,
+    GeneratedCVContentSimple,
+    GeneratedCVPatch,
+    Experience,
+    Education,
+    Skill,
+)
 
 
 @pytest.fixture
@@ -45,9 +63,40 @@ def mock_llm_response():
             Skill(category="Frameworks", skill_list="React, FastAPI, Django"),
             Skill(category="Bases de Datos", skill_list="PostgreSQL, MongoDB"),
         ],
+        chat_response="He creado tu CV con 2 experiencias y 3 habilidades.",
     )
 
 
+def _partials(response: GeneratedCVContentSimple):
+    """Simula el stream parcial de instructor: cada campo aparece en orden y las listas crecen ítem por ítem"""
+    fields = list(GeneratedCVContentSimple.model_fields)
+    data = {name: None for name in fields}
+    for name in fields:
+        value = getattr(response, name)
+        if isinstance(value, list):
+            for i in range(len(value)):
+                data[name] = value[:i + 1]
+                yield GeneratedCVContentSimple.model_construct(**data)
+        else:
+            data[name] = value
+            yield GeneratedCVContentSimple.model_construct(**data)
+
+
+def _mock_create_partial(response: GeneratedCVContentSimple):
+    async def create_partial(**kwargs):
+        for partial in _partials(response):
+            yield partial
+    return create_partial
+
+
+def _parse_sse(body: str) -> list[tuple[str, object]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
 def test_create_cv(client: TestClient, mock_llm_response):
     user_response = client.post(
         "/api/v1/users",
@@ -86,7 +135,7 @@ def test_create_cv(client: TestClient, mock_llm_response):
     assert len(templates) > 0
     template_id = templates[0]["id"]
     
-    with patch("app.services.llm_service.client.chat.completions.create") as mock_create:
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
         mock_create.return_value = mock_llm_response
         
         cv_response = client.post(
@@ -114,9 +163,11 @@ def test_create_cv(client: TestClient, mock_llm_response):
     assert cv_data["rendered_content"] is not None
     assert "Juan" in cv_data["rendered_content"]
     assert "Pérez" in cv_data["rendered_content"]
-    assert len(cv_data["conversation_history"]) == 1
+    assert len(cv_data["conversation_history"]) == 2
     assert cv_data["conversation_history"][0]["role"] == "user"
     assert "content" in cv_data["conversation_history"][0]
+    assert cv_data["conversation_history"][1]["role"] == "assistant"
+    assert cv_data["conversation_history"][1]["content"] == mock_llm_response.chat_response
     mock_create.assert_called_once()
 
 
@@ -144,7 +195,7 @@ def test_create_cv_with_base_cv(client: TestClient, mock_llm_response):
     templates = response.json()
     template_id = templates[0]["id"]
     
-    with patch("app.services.llm_service.client.chat.completions.create") as mock_create:
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
         mock_create.return_value = mock_llm_response
         
         base_cv_response = client.post(
@@ -199,7 +250,7 @@ def test_get_cv(client: TestClient, mock_llm_response):
     templates = response.json()
     template_id = templates[0]["id"]
     
-    with patch("app.services.llm_service.client.chat.completions.create") as mock_create:
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
         mock_create.return_value = mock_llm_response
         
         cv_response = client.post(
@@ -244,7 +295,7 @@ def test_get_project_cvs(client: TestClient, mock_llm_response):
     templates = response.json()
     template_id = templates[0]["id"]
     
-    with patch("app.services.llm_service.client.chat.completions.create") as mock_create:
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
         mock_create.return_value = mock_llm_response
         
         for i in range(3):
@@ -296,7 +347,7 @@ def test_update_cv(client: TestClient, mock_llm_response):
     templates = response.json()
     template_id = templates[0]["id"]
     
-    with patch("app.services.llm_service.client.chat.completions.create") as mock_create:
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
         mock_create.return_value = mock_llm_response
         
         cv_response = client.post(
@@ -360,7 +411,7 @@ def test_delete_cv(client: TestClient, mock_llm_response):
     templates = response.json()
     template_id = templates[0]["id"]
     
-    with patch("app.services.llm_service.client.chat.completions.create") as mock_create:
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
         mock_create.return_value = mock_llm_response
         
         cv_response = client.post(
@@ -401,7 +452,7 @@ def test_regenerate_cv(client: TestClient, mock_llm_response):
     templates = response.json()
     template_id = templates[0]["id"]
     
-    with patch("app.services.llm_service.client.chat.completions.create") as mock_create:
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
         mock_create.return_value = mock_llm_response
         
         cv_response = client.post(
@@ -427,11 +478,12 @@ def test_regenerate_cv(client: TestClient, mock_llm_response):
     
     assert regen_response.status_code == 200
     regen_cv = regen_response.json()
-    assert len(regen_cv["conversation_history"]) >= 2
+    assert len(regen_cv["conversation_history"]) == 4
     assert regen_cv["conversation_history"][0]["role"] == "user"
     assert "content" in regen_cv["conversation_history"][0]
-    assert regen_cv["conversation_history"][-1]["role"] == "user"
-    assert "content" in regen_cv["conversation_history"][-1]
+    assert regen_cv["conversation_history"][-2]["role"] == "user"
+    assert regen_cv["conversation_history"][-2]["content"] == "Hazlo más enfocado en diseño de interfaces"
+    assert regen_cv["conversation_history"][-1]["role"] == "assistant"
 
 
 def test_create_cv_template_not_found(client: TestClient):
@@ -540,3 +592,584 @@ def test_regenerate_cv_not_found(client: TestClient):
         json={"messages": [{"role": "user", "content": "Test"}]},
     )
     assert response.status_code == 404
+
+
+def test_create_cv_stream(client: TestClient, mock_llm_response):
+    user_response = client.post(
+        "/api/v1/users",
+        json={
+            "email": "stream1@example.com",
+            "full_name": "Stream User",
+            "password": "testpass123",
+        },
+    )
+    user_id = user_response.json()["id"]
+    
+    project_response = client.post(
+        f"/api/v1/projects?user_id={user_id}",
+        json={"name": "Proyecto Stream", "target_role": "Backend Developer"},
+    )
+    project_id = project_response.json()["id"]
+    
+    template_id = client.get("/api/v1/templates").json()[0]["id"]
+    
+    with patch(
+        "app.services.llm_service.client.chat.completions.create_partial",
+        side_effect=_mock_create_partial(mock_llm_response),
+    ):
+        response = client.post(
+            f"/api/v1/projects/{project_id}/cvs/stream",
+            json={
+                "project_id": project_id,
+                "template_id": template_id,
+                "messages": [{"role": "user", "content": "Genera un CV backend"}],
+            },
+        )
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    
+    events = _parse_sse(response.text)
+    names = [name for name, _ in events]
+    assert names == [
+        "summary",
+        "experience",
+        "experience",
+        "education",
+        "skills",
+        "chat_response",
+        "cv",
+    ]
+    assert events[0][1] == mock_llm_response.summary
+    assert events[1][1]["index"] == 0
+    assert events[1][1]["company"] == "Tech Corp"
+    assert events[2][1]["index"] == 1
+    assert events[2][1]["company"] == "Startup XYZ"
+    assert len(events[4][1]) == 3
+    assert events[5][1] == mock_llm_response.chat_response
+    
+    cv_data = events[-1][1]
+    assert cv_data["project_id"] == project_id
+    assert "chat_response" not in cv_data["content"]
+    assert "Juan" in cv_data["rendered_content"]
+    assert cv_data["conversation_history"][-1]["role"] == "assistant"
+    
+    stored = client.get(f"/api/v1/cvs/{cv_data['id']}").json()
+    assert stored["content"] == cv_data["content"]
+
+
+def test_regenerate_cv_stream(client: TestClient, mock_llm_response):
+    user_response = client.post(
+        "/api/v1/users",
+        json={
+            "email": "stream2@example.com",
+            "full_name": "Stream User 2",
+            "password": "testpass123",
+        },
+    )
+    user_id = user_response.json()["id"]
+    
+    project_response = client.post(
+        f"/api/v1/projects?user_id={user_id}",
+        json={"name": "Proyecto Stream 2", "target_role": "Frontend Developer"},
+    )
+    project_id = project_response.json()["id"]
+    
+    template_id = client.get("/api/v1/templates").json()[0]["id"]
+    
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.return_value = mock_llm_response
+        cv_id = client.post(
+            f"/api/v1/projects/{project_id}/cvs",
+            json={"project_id": project_id, "template_id": template_id},
+        ).json()["id"]
+    
+    with patch(
+        "app.services.llm_service.client.chat.completions.create_partial",
+        side_effect=_mock_create_partial(mock_llm_response),
+    ):
+        response = client.post(
+            f"/api/v1/cvs/{cv_id}/regenerate/stream",
+            json={"messages": [{"role": "user", "content": "Más foco en React"}]},
+        )
+    
+    assert response.status_code == 200
+    events = _parse_sse(response.text)
+    assert events[-1][0] == "cv"
+    
+    history = events[-1][1]["conversation_history"]
+    assert len(history) == 4
+    assert history[-2]["content"] == "Más foco en React"
+    assert history[-1]["role"] == "assistant"
+
+
+def test_create_cv_stream_error_event(client: TestClient):
+    user_response = client.post(
+        "/api/v1/users",
+        json={
+            "email": "stream3@example.com",
+            "full_name": "Stream User 3",
+            "password": "testpass123",
+        },
+    )
+    user_id = user_response.json()["id"]
+    
+    project_response = client.post(
+        f"/api/v1/projects?user_id={user_id}",
+        json={"name": "Proyecto Stream 3"},
+    )
+    project_id = project_response.json()["id"]
+    
+    template_id = client.get("/api/v1/templates").json()[0]["id"]
+    
+    async def failing_partial(**kwargs):
+        raise RuntimeError("provider down")
+        yield
+    
+    with patch(
+        "app.services.llm_service.client.chat.completions.create_partial",
+        side_effect=failing_partial,
+    ):
+        response = client.post(
+            f"/api/v1/projects/{project_id}/cvs/stream",
+            json={"project_id": project_id, "template_id": template_id},
+        )
+    
+    assert response.status_code == 200
+    assert _parse_sse(response.text) == [("error", {"detail": "provider down"})]
+    assert client.get(f"/api/v1/projects/{project_id}/cvs").json() == []
+
+
+def test_create_cv_stream_template_not_found(client: TestClient):
+    user_response = client.post(
+        "/api/v1/users",
+        json={
+            "email": "stream4@example.com",
+            "full_name": "Stream User 4",
+            "password": "testpass123",
+        },
+    )
+    user_id = user_response.json()["id"]
+    
+    project_response = client.post(
+        f"/api/v1/projects?user_id={user_id}",
+        json={"name": "Proyecto Stream 4"},
+    )
+    project_id = project_response.json()["id"]
+    
+    response = client.post(
+        f"/api/v1/projects/{project_id}/cvs/stream",
+        json={"project_id": project_id, "template_id": 99999},
+    )
+    assert response.status_code == 404
+
+
+def test_regenerate_cv_stream_not_found(client: TestClient):
+    response = client.post(
+        "/api/v1/cvs/99999/regenerate/stream",
+        json={"messages": [{"role": "user", "content": "Test"}]},
+    )
+    assert response.status_code == 404
+
+
+def test_create_cv_prompt_has_cacheable_prefix(client: TestClient, mock_llm_response):
+    user_response = client.post(
+        "/api/v1/users",
+        json={
+            "email": "prompt1@example.com",
+            "full_name": "Prompt User",
+            "password": "testpass123",
+        },
+    )
+    user_id = user_response.json()["id"]
+    
+    project_response = client.post(
+        f"/api/v1/projects?user_id={user_id}",
+        json={"name": "Proyecto Prompt", "target_role": "Backend Developer"},
+    )
+    project_id = project_response.json()["id"]
+    
+    template_id = client.get("/api/v1/templates").json()[0]["id"]
+    
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.return_value = mock_llm_response
+        client.post(
+            f"/api/v1/projects/{project_id}/cvs",
+            json={"project_id": project_id, "template_id": template_id},
+        )
+    
+    kwargs = mock_create.call_args.kwargs
+    system_text = kwargs["system"][0]["text"]
+    assert kwargs["system"][0]["cache_control"] == {"type": "ephemeral"}
+    assert "FORMATO REQUERIDO:" in system_text
+    assert "RESPUESTA DEL CHAT:" in system_text
+    assert "Prompt User" not in system_text
+    
+    user_message = kwargs["messages"][0]["content"]
+    assert "Prompt User" in user_message
+    assert "FORMATO REQUERIDO:" not in user_message
+
+
+def test_regenerate_cv_compacts_old_turns(client: TestClient, mock_llm_response, monkeypatch):
+    monkeypatch.setattr(settings, "conversation_keep_turns", 2)
+    
+    user_response = client.post(
+        "/api/v1/users",
+        json={
+            "email": "compact1@example.com",
+            "full_name": "Compact User",
+            "password": "testpass123",
+        },
+    )
+    user_id = user_response.json()["id"]
+    
+    project_response = client.post(
+        f"/api/v1/projects?user_id={user_id}",
+        json={"name": "Proyecto Compact", "target_role": "Backend Developer"},
+    )
+    project_id = project_response.json()["id"]
+    
+    template_id = client.get("/api/v1/templates").json()[0]["id"]
+    
+    summaries = iter(["Resumen 1: quiere foco backend", "Resumen 2: foco backend y Go"])
+    
+    async def fake_create(**kwargs):
+        if kwargs["response_model"] is ConversationSummary:
+            return ConversationSummary(summary=next(summaries))
+        return mock_llm_response
+    
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.side_effect = fake_create
+    
+        cv_id = client.post(
+            f"/api/v1/projects/{project_id}/cvs",
+            json={
+                "project_id": project_id,
+                "template_id": template_id,
+                "messages": [{"role": "user", "content": "Turno inicial con foco backend"}],
+            },
+        ).json()["id"]
+    
+        first = client.post(
+            f"/api/v1/cvs/{cv_id}/regenerate",
+            json={"messages": [{"role": "user", "content": "Agrega Go"}]},
+        )
+        second = client.post(
+            f"/api/v1/cvs/{cv_id}/regenerate",
+            json={"messages": [{"role": "user", "content": "Acorta el resumen"}]},
+        )
+    
+    assert first.status_code == 200
+    assert first.json()["conversation_summary"] == "Resumen 1: quiere foco backend"
+    assert second.json()["conversation_summary"] == "Resumen 2: foco backend y Go"
+    # El historial completo se conserva aunque el prompt solo lleve lo reciente
+    assert len(second.json()["conversation_history"]) == 6
+    
+    calls = [call.kwargs for call in mock_create.call_args_list]
+    assert [call["response_model"] for call in calls] == [
+        GeneratedCVContentSimple,
+        ConversationSummary,
+        GeneratedCVContentSimple,
+        ConversationSummary,
+        GeneratedCVContentSimple,
+    ]
+    
+    # El segundo resumen solo recibe los turnos que no estaban resumidos
+    second_summary_prompt = calls[3]["messages"][0]["content"]
+    assert "Resumen 1: quiere foco backend" in second_summary_prompt
+    assert "Turno inicial con foco backend" not in second_summary_prompt
+    
+    last_prompt = calls[4]["messages"][0]["content"]
+    assert "Resumen 2: foco backend y Go" in last_prompt
+    assert "Acorta el resumen" in last_prompt
+    assert "Turno inicial con foco backend" not in last_prompt
+
+
+def _create_cv_for_patch(client: TestClient, mock_llm_response, email: str) -> int:
+    user_id = client.post(
+        "/api/v1/users",
+        json={"email": email, "full_name": "Patch User", "password": "testpass123"},
+    ).json()["id"]
+    project_id = client.post(
+        f"/api/v1/projects?user_id={user_id}",
+        json={"name": "Proyecto Patch", "target_role": "Software Engineer"},
+    ).json()["id"]
+    template_id = client.get("/api/v1/templates").json()[0]["id"]
+    
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.return_value = mock_llm_response
+        return client.post(
+            f"/api/v1/projects/{project_id}/cvs",
+            json={"project_id": project_id, "template_id": template_id},
+        ).json()["id"]
+
+
+def test_regenerate_cv_patch_mode(client: TestClient, mock_llm_response):
+    cv_id = _create_cv_for_patch(client, mock_llm_response, "patch1@example.com")
+    
+    patch_response = GeneratedCVPatch(
+        operations=[
+            CVPatchOperation(op="replace", path="/summary", value="Ingeniero backend."),
+            CVPatchOperation(
+                op="add",
+                path="/skills/-",
+                value={"category": "Cloud", "skill_list": "AWS, GCP"},
+            ),
+        ],
+        chat_response="He acortado tu resumen y agregado habilidades cloud.",
+    )
+    
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.return_value = patch_response
+    
+        response = client.post(
+            f"/api/v1/cvs/{cv_id}/regenerate",
+            json={
+                "messages": [{"role": "user", "content": "Acorta mi resumen"}],
+                "mode": "patch",
+            },
+        )
+    
+        mock_create.assert_called_once()
+        call_kwargs = mock_create.call_args.kwargs
+        assert call_kwargs["response_model"] is GeneratedCVPatch
+        assert '"summary"' in call_kwargs["messages"][0]["content"]
+    
+    assert response.status_code == 200
+    content = response.json()["content"]
+    assert content["summary"] == "Ingeniero backend."
+    assert content["skills"][-1] == {"category": "Cloud", "skill_list": "AWS, GCP"}
+    assert len(content["skills"]) == len(mock_llm_response.skills) + 1
+    assert content["experiences"] == [e.model_dump() for e in mock_llm_response.experiences]
+    assert "chat_response" not in content
+    assert "Ingeniero backend." in response.json()["rendered_content"]
+    assert response.json()["conversation_history"][-1]["content"] == patch_response.chat_response
+
+
+def test_regenerate_cv_invalid_patch_falls_back_to_full(client: TestClient, mock_llm_response):
+    cv_id = _create_cv_for_patch(client, mock_llm_response, "patch2@example.com")
+    
+    invalid_patch = GeneratedCVPatch(
+        operations=[CVPatchOperation(op="replace", path="/experiences/42/title", value="CTO")],
+        chat_response="Listo.",
+    )
+    full_response = mock_llm_response.model_copy(update={"summary": "Resumen completo nuevo."})
+    
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.side_effect = [invalid_patch, full_response]
+    
+        response = client.post(
+            f"/api/v1/cvs/{cv_id}/regenerate",
+            json={
+                "messages": [{"role": "user", "content": "Cambia mi cargo"}],
+                "mode": "patch",
+            },
+        )
+    
+        assert mock_create.call_count == 2
+        assert mock_create.call_args.kwargs["response_model"] is GeneratedCVContentSimple
+    
+    assert response.status_code == 200
+    assert response.json()["content"]["summary"] == "Resumen completo nuevo."
+
+
+def test_apply_cv_patch_operations(mock_llm_response):
+    content = mock_llm_response.model_dump()
+    content.pop("chat_response")
+    
+    result = cv_patch_service.apply_cv_patch(
+        content,
+        GeneratedCVPatch(
+            operations=[
+                CVPatchOperation(op="remove", path="/github"),
+                CVPatchOperation(op="replace", path="/experiences/0/company", value="Nueva Co"),
+                CVPatchOperation(op="add", path="/education/0", value={
+                    "degree": "MBA", "institution": "UC", "date": "2024", "description": "Negocios",
+                }),
+            ],
+            chat_response="Hecho.",
+        ),
+    )
+    
+    assert result.github is None
+    assert result.experiences[0].company == "Nueva Co"
+    assert result.education[0].degree == "MBA"
+    assert content["experiences"][0]["company"] != "Nueva Co"
+    
+    for invalid in (
+        CVPatchOperation(op="replace", path="/missing", value="x"),
+        CVPatchOperation(op="replace", path="summary", value="x"),
+        CVPatchOperation(op="remove", path="/firstname"),
+        CVPatchOperation(op="replace", path="/chat_response", value="x"),
+    ):
+        with pytest.raises(ValueError):
+            cv_patch_service.apply_cv_patch(content, GeneratedCVPatch(operations=[invalid], chat_response="x"))
+
+
+def test_create_cv_parallel_strategy(client: TestClient, mock_llm_response):
+    user_id = client.post(
+        "/api/v1/users",
+        json={"email": "parallel@example.com", "full_name": "Juan Pérez", "password": "testpass123"},
+    ).json()["id"]
+    project_id = client.post(
+        f"/api/v1/projects?user_id={user_id}",
+        json={"name": "Proyecto Paralelo", "target_role": "Backend Developer"},
+    ).json()["id"]
+    template_id = client.get("/api/v1/templates").json()[0]["id"]
+    
+    content = mock_llm_response.model_dump()
+    sections = {
+        CVHeaderSection: CVHeaderSection.model_validate(content),
+        CVExperiencesSection: CVExperiencesSection.model_validate(content),
+        CVEducationSection: CVEducationSection.model_validate(content),
+        CVSkillsSection: CVSkillsSection.model_validate(content),
+        CVChatResponse: CVChatResponse(chat_response="CV creado por secciones."),
+    }
+    in_flight = 0
+    max_in_flight = 0
+    
+    async def fake_create(**kwargs):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return sections[kwargs["response_model"]]
+    
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.side_effect = fake_create
+    
+        response = client.post(
+            f"/api/v1/projects/{project_id}/cvs",
+            json={"project_id": project_id, "template_id": template_id, "strategy": "parallel"},
+        )
+    
+        assert mock_create.call_count == 5
+        assert mock_create.call_args.kwargs["response_model"] is CVChatResponse
+    
+    assert max_in_flight == 4
+    assert response.status_code == 201
+    cv = response.json()
+    expected = mock_llm_response.model_dump()
+    expected.pop("chat_response")
+    assert cv["content"] == expected
+    assert cv["conversation_history"][-1]["content"] == "CV creado por secciones."
+
+
+def test_concurrent_identical_regenerations_share_one_generation(client: TestClient, pg, mock_llm_response):
+    cv_id = _create_cv_for_patch(client, mock_llm_response, "singleflight1@example.com")
+    
+    async def slow_create(**kwargs):
+        await asyncio.sleep(0.05)
+        return mock_llm_response
+    
+    async def double_submit():
+        messages = [{"role": "user", "content": "Hazlo más corto", "timestamp": "t1"}]
+        retried = [{"role": "user", "content": "Hazlo más corto", "timestamp": "t2"}]
+        return await asyncio.gather(
+            cv_service.regenerate_cv(pg, cv_id, messages),
+            cv_service.regenerate_cv(pg, cv_id, retried),
+        )
+    
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.side_effect = slow_create
+        first, second = asyncio.run(double_submit())
+    
+        mock_create.assert_called_once()
+    
+    assert first.id == second.id == cv_id
+    history = client.get(f"/api/v1/cvs/{cv_id}").json()["conversation_history"]
+    assert [msg["content"] for msg in history].count("Hazlo más corto") == 1
+
+
+def test_concurrent_different_regenerations_are_serialized(client: TestClient, pg, mock_llm_response):
+    cv_id = _create_cv_for_patch(client, mock_llm_response, "singleflight2@example.com")
+    in_flight = 0
+    max_in_flight = 0
+    
+    async def slow_create(**kwargs):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.02)
+        in_flight -= 1
+        return mock_llm_response
+    
+    async def two_edits():
+        return await asyncio.gather(
+            cv_service.regenerate_cv(pg, cv_id, [{"role": "user", "content": "Primero"}]),
+            cv_service.regenerate_cv(pg, cv_id, [{"role": "user", "content": "Segundo"}]),
+        )
+    
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.side_effect = slow_create
+        asyncio.run(two_edits())
+    
+        assert mock_create.call_count == 2
+        # La segunda regeneración ve el resultado de la primera
+        assert "Primero" in mock_create.call_args.kwargs["messages"][0]["content"]
+    
+    assert max_in_flight == 1
+    history = client.get(f"/api/v1/cvs/{cv_id}").json()["conversation_history"]
+    user_messages = [msg["content"] for msg in history if msg["role"] == "user"]
+    assert user_messages[-2:] == ["Primero", "Segundo"]
+
+
+def test_create_cv_uses_project_job_offering(client: TestClient, pg, mock_llm_response):
+    pg.add(JobOffering(
+        id="offer-cv-1",
+        keyword="python-backend",
+        company_name="Acme",
+        role_name="Backend Engineer",
+        description="<p>Buscamos <strong>Python</strong> &amp; FastAPI</p><ul><li>Remoto</li></ul>",
+    ))
+    pg.commit()
+    
+    user_id = client.post(
+        "/api/v1/users",
+        json={"email": "offer1@example.com", "full_name": "Offer User", "password": "testpass123"},
+    ).json()["id"]
+    project = client.post(
+        f"/api/v1/projects?user_id={user_id}",
+        json={"name": "Postulación Acme", "job_offering_id": "offer-cv-1"},
+    ).json()
+    assert project["job_offering_id"] == "offer-cv-1"
+    template_id = client.get("/api/v1/templates").json()[0]["id"]
+    
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.return_value = mock_llm_response
+        response = client.post(
+            f"/api/v1/projects/{project['id']}/cvs",
+            json={"project_id": project["id"], "template_id": template_id},
+        )
+    
+    assert response.status_code == 201
+    assert response.json()["job_offering_id"] == "offer-cv-1"
+    
+    user_message = mock_create.call_args.kwargs["messages"][0]["content"]
+    assert "Empresa: Acme" in user_message
+    assert "Cargo: Backend Engineer" in user_message
+    assert "Buscamos Python & FastAPI" in user_message
+    assert "<p>" not in user_message
+    
+    # Las filas antiguas quedan con la descripción limpia guardada
+    assert pg.get(JobOffering, "offer-cv-1").description_text.startswith("Buscamos Python & FastAPI")
+
+
+def test_create_cv_job_offering_not_found(client: TestClient):
+    user_id = client.post(
+        "/api/v1/users",
+        json={"email": "offer2@example.com", "full_name": "Offer User", "password": "testpass123"},
+    ).json()["id"]
+    project_id = client.post(
+        f"/api/v1/projects?user_id={user_id}",
+        json={"name": "Postulación"},
+    ).json()["id"]
+    template_id = client.get("/api/v1/templates").json()[0]["id"]
+    
+    response = client.post(
+        f"/api/v1/projects/{project_id}/cvs",
+        json={"project_id": project_id, "template_id": template_id, "job_offering_id": "missing"},
+    )
+    
+    assert response.status_code == 404
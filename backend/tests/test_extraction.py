@@ -0,0 +1,226 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import status
+
+from app.config import settings
+from app.database.models import SkillType, UserSkills
+from app.services import extraction_service
+from app.types.extraction_types import ExtractedProfileData, ExtractedProfile, ExtractedSkill
+
+
+@pytest.fixture
+def mock_extraction_response():
+    return ExtractedProfileData(
+        profile=ExtractedProfile(
+            current_role="Backend Engineer",
+            years_of_experience=5,
+            spoken_languages=["Español", "Inglés"],
+        ),
+        skills=[
+            ExtractedSkill(skill_text="Python - 5 años, Django y FastAPI", skill_type="dev-skill"),
+            ExtractedSkill(skill_text="3 años en Google como Software Engineer", skill_type="experience"),
+        ],
+    )
+
+
+def _create_user(client, email: str = "extract@example.com") -> int:
+    response = client.post("/api/v1/users", json={
+        "email": email,
+        "password": "password",
+        "full_name": "Extract User"
+    })
+    return response.json()["id"]
+
+
+def test_extract_profile(client, mock_extraction_response):
+    user_id = _create_user(client)
+    
+    with patch("app.services.extraction_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.return_value = mock_extraction_response
+        
+        response = client.post(
+            f"/api/v1/users/{user_id}/extract-profile",
+            json={"text": "Soy backend engineer con 5 años de experiencia en Python."},
+        )
+        mock_create.assert_called_once()
+    
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["profile_created"] is True
+    assert data["skills_added"] == 2
+    
+    skills = client.get(f"/api/v1/users/{user_id}/skills").json()
+    assert [skill["skill_text"] for skill in skills["dev_skills"]] == ["Python - 5 años, Django y FastAPI"]
+    assert [skill["skill_text"] for skill in skills["experience"]] == ["3 años en Google como Software Engineer"]
+    
+    profile = client.get(f"/api/v1/users/{user_id}/profile").json()
+    assert profile["current_role"] == "Backend Engineer"
+
+
+def test_extract_profile_prompt_has_cacheable_prefix(client, mock_extraction_response):
+    user_id = _create_user(client)
+    text = "Soy backend engineer con 5 años de experiencia en Python."
+    
+    with patch("app.services.extraction_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.return_value = mock_extraction_response
+        client.post(f"/api/v1/users/{user_id}/extract-profile", json={"text": text})
+    
+    kwargs = mock_create.call_args.kwargs
+    assert len(kwargs["system"]) == 1
+    assert kwargs["system"][0]["cache_control"] == {"type": "ephemeral"}
+    assert "INSTRUCCIONES:" in kwargs["system"][0]["text"]
+    assert "ESQUEMA DE RESPUESTA" in kwargs["system"][0]["text"]
+    
+    user_message = kwargs["messages"][0]["content"]
+    assert text in user_message
+    assert "INSTRUCCIONES:" not in user_message
+
+
+def test_extract_profile_logs_prompt_cache_usage(client, mock_extraction_response, caplog):
+    user_id = _create_user(client)
+    mock_extraction_response._raw_response = SimpleNamespace(
+        usage=SimpleNamespace(
+            input_tokens=120,
+            output_tokens=80,
+            cache_read_input_tokens=900,
+            cache_creation_input_tokens=0,
+        )
+    )
+    
+    with patch("app.services.extraction_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.return_value = mock_extraction_response
+        with caplog.at_level("INFO", logger="app.services.llm_telemetry_service"):
+            client.post(f"/api/v1/users/{user_id}/extract-profile", json={"text": "Python"})
+    
+    assert "input=120 output=80 cache_read=900 cache_write=0" in caplog.text
+
+
+def test_extract_profile_user_not_found(client):
+    response = client.post("/api/v1/users/99999/extract-profile", json={"text": "Python"})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+def test_split_into_chunks_keeps_sections_together():
+    experience = "EXPERIENCIA\n" + "\n".join(f"Trabajé en la empresa {i} como desarrollador." for i in range(10))
+    education = "EDUCACIÓN\nIngeniería Civil en Computación, Universidad de Chile."
+    text = f"{experience}\n\n{education}\n\n" + "palabra " * 200
+    
+    chunks = extraction_service.split_into_chunks(text, max_chars=500)
+    
+    assert chunks[0] == experience
+    assert chunks[1].startswith(education)
+    assert all(len(chunk) <= 500 for chunk in chunks)
+    assert " ".join(" ".join(chunks).split()) == " ".join(text.split())
+    assert extraction_service.split_into_chunks("Python", max_chars=500) == ["Python"]
+
+
+def test_merge_extracted_data_deduplicates():
+    merged = extraction_service.merge_extracted_data([
+        ExtractedProfileData(
+            profile=ExtractedProfile(current_role="Backend Engineer", years_of_experience=3, spoken_languages=["Español"]),
+            skills=[ExtractedSkill(skill_text="Python", skill_type="dev-skill")],
+        ),
+        ExtractedProfileData(skills=[]),
+        ExtractedProfileData(
+            profile=ExtractedProfile(current_role="Dev", years_of_experience=5, spoken_languages=["español", "Inglés"]),
+            skills=[
+                ExtractedSkill(skill_text="  python ", skill_type="dev-skill"),
+                ExtractedSkill(skill_text="Python", skill_type="extra"),
+            ],
+        ),
+    ])
+    
+    assert merged.profile.current_role == "Backend Engineer"
+    assert merged.profile.years_of_experience == 5
+    assert merged.profile.spoken_languages == ["Español", "Inglés"]
+    assert [(s.skill_type, s.skill_text) for s in merged.skills] == [("dev-skill", "Python"), ("extra", "Python")]
+
+
+def test_extract_profile_long_text_runs_chunks_concurrently(client, monkeypatch):
+    monkeypatch.setattr(settings, "extraction_chunk_chars", 200)
+    monkeypatch.setattr(settings, "extraction_max_concurrency", 2)
+    user_id = _create_user(client)
+    text = "\n\n".join(f"Proyecto {i}: " + "detalle " * 20 for i in range(6))
+    in_flight = 0
+    max_in_flight = 0
+    
+    async def slow_create(**kwargs):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return ExtractedProfileData(skills=[ExtractedSkill(skill_text="Python", skill_type="dev-skill")])
+    
+    with patch("app.services.extraction_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.side_effect = slow_create
+        response = client.post(f"/api/v1/users/{user_id}/extract-profile", json={"text": text})
+        
+        assert mock_create.call_count == 6
+    
+    assert max_in_flight == 2
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["skills_added"] == 1
+
+
+def test_extract_profile_skips_existing_skills(client, mock_extraction_response):
+    user_id = _create_user(client)
+    client.post(f"/api/v1/users/{user_id}/skills", json={
+        "skill_text": "python - 5 años,  Django y FastAPI",
+        "skill_type": "dev-skill",
+    })
+    mock_extraction_response.skills.append(
+        ExtractedSkill(skill_text="3 años en Google como Software Engineer", skill_type="experience")
+    )
+    
+    with patch("app.services.extraction_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.return_value = mock_extraction_response
+        response = client.post(f"/api/v1/users/{user_id}/extract-profile", json={"text": "Python"})
+    
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["skills_added"] == 1
+    
+    skills = client.get(f"/api/v1/users/{user_id}/skills").json()
+    assert len(skills["dev_skills"]) == 1
+    assert len(skills["experience"]) == 1
+
+
+def test_rank_skills_prefers_overlapping_skills():
+    skills = [
+        UserSkills(skill_text="Inglés avanzado", skill_type=SkillType.EXTRA),
+        UserSkills(skill_text="Docker y Kubernetes", skill_type=SkillType.DEV_SKILL),
+        UserSkills(skill_text="Python - 5 años con Django", skill_type=SkillType.DEV_SKILL),
+        UserSkills(skill_text="Certificación AWS", skill_type=SkillType.CERTIFICATE),
+    ]
+    
+    ranked = extraction_service.rank_skills(skills, "Trabajé 5 años con Python y Django; también uso Docker.")
+    
+    assert [skill.skill_text for skill in ranked] == [
+        "Python - 5 años con Django",
+        "Docker y Kubernetes",
+        "Inglés avanzado",
+        "Certificación AWS",
+    ]
+
+
+def test_extraction_prompt_lists_relevant_skills_within_budget(monkeypatch):
+    monkeypatch.setattr(settings, "extraction_context_skills", 3)
+    skills = [
+        UserSkills(skill_text=f"Habilidad genérica número {i}", skill_type=SkillType.EXTRA)
+        for i in range(20)
+    ]
+    skills.append(UserSkills(skill_text="Kubernetes en producción", skill_type=SkillType.DEV_SKILL))
+    
+    prompt = extraction_service.build_extraction_prompt(None, skills, "Administro clusters de Kubernetes")
+    user_message = prompt.messages[0]["content"]
+    
+    assert "[dev-skill] Kubernetes en producción" in user_message
+    assert user_message.count("  - [") == 3
+    assert "... y 18 más" in user_message
+    
+    monkeypatch.setattr(settings, "extraction_context_token_budget", 15)
+    prompt = extraction_service.build_extraction_prompt(None, skills, "Administro clusters de Kubernetes")
+    assert prompt.messages[0]["content"].count("  - [") == 1
@@ -0,0 +1,221 @@
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.database.models import GenerationJob, GenerationJobStatus, GenerationJobType
+from app.services import generation_job_service
+from app.types.cv_content_types import GeneratedCVContentSimple, Experience, Education, Skill
+
+
+@pytest.fixture(autouse=True)
+def no_workers(monkeypatch):
+    """Los jobs se procesan explícitamente en cada test"""
+    monkeypatch.setattr(settings, "generation_workers", 0)
+
+
+@pytest.fixture
+def mock_llm_response():
+    return GeneratedCVContentSimple(
+        firstname="Juan",
+        lastname="Pérez",
+        email="juan.perez@example.com",
+        phone="+56912345678",
+        address="Santiago, Chile",
+        summary="Desarrollador Backend con 5 años de experiencia.",
+        experiences=[
+            Experience(
+                title="Senior Developer",
+                company="Tech Corp",
+                date="2020 - Presente",
+                description="Desarrollo de APIs con FastAPI."
+            ),
+        ],
+        education=[
+            Education(
+                degree="Ingeniería Civil en Computación",
+                institution="Universidad de Chile",
+                date="2014 - 2018",
+                description="Especialización en software."
+            ),
+        ],
+        skills=[
+            Skill(category="Lenguajes", skill_list="Python, Go"),
+        ],
+        chat_response="He creado tu CV con 1 experiencia y 1 habilidad.",
+    )
+
+
+def _create_project(client: TestClient, email: str) -> tuple[int, int]:
+    user_response = client.post(
+        "/api/v1/users",
+        json={"email": email, "full_name": "Job User", "password": "testpass123"},
+    )
+    user_id = user_response.json()["id"]
+    
+    project_response = client.post(
+        f"/api/v1/projects?user_id={user_id}",
+        json={"name": "Proyecto Jobs", "target_role": "Backend Developer"},
+    )
+    project_id = project_response.json()["id"]
+    
+    template_id = client.get("/api/v1/templates").json()[0]["id"]
+    return project_id, template_id
+
+
+def test_enqueue_create_cv(client: TestClient, pg, mock_llm_response):
+    project_id, template_id = _create_project(client, "job1@example.com")
+    
+    response = client.post(
+        f"/api/v1/projects/{project_id}/cvs/jobs",
+        json={
+            "project_id": project_id,
+            "template_id": template_id,
+            "messages": [{"role": "user", "content": "Genera un CV backend"}],
+        },
+    )
+    
+    assert response.status_code == 202
+    job = response.json()
+    assert job["job_type"] == "create-cv"
+    assert job["status"] == "pending"
+    assert job["cv_id"] is None
+    assert response.headers["location"] == f"/api/v1/generation-jobs/{job['id']}"
+    
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.return_value = mock_llm_response
+        asyncio.run(generation_job_service.process_job(pg, job["id"]))
+        mock_create.assert_called_once()
+    
+    status_response = client.get(f"/api/v1/generation-jobs/{job['id']}")
+    assert status_response.status_code == 200
+    finished = status_response.json()
+    assert finished["status"] == "succeeded"
+    assert finished["error"] is None
+    assert finished["started_at"] is not None
+    assert finished["finished_at"] is not None
+    
+    cv_response = client.get(f"/api/v1/cvs/{finished['cv_id']}")
+    assert cv_response.status_code == 200
+    assert cv_response.json()["project_id"] == project_id
+    assert cv_response.json()["content"]["firstname"] == "Juan"
+
+
+def test_enqueue_regenerate_cv(client: TestClient, pg, mock_llm_response):
+    project_id, template_id = _create_project(client, "job2@example.com")
+    
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.return_value = mock_llm_response
+        
+        cv_id = client.post(
+            f"/api/v1/projects/{project_id}/cvs",
+            json={"project_id": project_id, "template_id": template_id},
+        ).json()["id"]
+        
+        response = client.post(
+            f"/api/v1/cvs/{cv_id}/regenerate/jobs",
+            json={"messages": [{"role": "user", "content": "Agrega más detalle"}]},
+        )
+        assert response.status_code == 202
+        job = response.json()
+        assert job["job_type"] == "regenerate-cv"
+        assert job["cv_id"] == cv_id
+        
+        asyncio.run(generation_job_service.process_job(pg, job["id"]))
+        assert mock_create.call_count == 2
+    
+    finished = client.get(f"/api/v1/generation-jobs/{job['id']}").json()
+    assert finished["status"] == "succeeded"
+    
+    history = client.get(f"/api/v1/cvs/{cv_id}").json()["conversation_history"]
+    assert len(history) == 4
+    assert history[-2]["content"] == "Agrega más detalle"
+
+
+def test_process_job_records_failure(client: TestClient, pg):
+    project_id, template_id = _create_project(client, "job3@example.com")
+    
+    job_id = client.post(
+        f"/api/v1/projects/{project_id}/cvs/jobs",
+        json={"project_id": project_id, "template_id": template_id},
+    ).json()["id"]
+    
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.side_effect = RuntimeError("provider down")
+        asyncio.run(generation_job_service.process_job(pg, job_id))
+    
+    finished = client.get(f"/api/v1/generation-jobs/{job_id}").json()
+    assert finished["status"] == "failed"
+    assert finished["error"] == "provider down"
+    assert finished["cv_id"] is None
+
+
+def test_process_job_only_runs_once(client: TestClient, pg, mock_llm_response):
+    project_id, template_id = _create_project(client, "job4@example.com")
+    
+    job_id = client.post(
+        f"/api/v1/projects/{project_id}/cvs/jobs",
+        json={"project_id": project_id, "template_id": template_id},
+    ).json()["id"]
+    
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.return_value = mock_llm_response
+        assert asyncio.run(generation_job_service.process_job(pg, job_id)) is not None
+        assert asyncio.run(generation_job_service.process_job(pg, job_id)) is None
+        mock_create.assert_called_once()
+
+
+def test_recover_only_requeues_stale_running_jobs(pg):
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=settings.generation_job_lease_seconds + 60)
+    jobs = [
+        GenerationJob(job_type=GenerationJobType.CREATE_CV, payload={}),
+        # Otro proceso lo está generando ahora mismo: no se toca
+        GenerationJob(job_type=GenerationJobType.CREATE_CV, payload={}, status=GenerationJobStatus.RUNNING, started_at=now),
+        # Su proceso se cayó hace rato: vuelve a la cola
+        GenerationJob(job_type=GenerationJobType.CREATE_CV, payload={}, status=GenerationJobStatus.RUNNING, started_at=stale),
+    ]
+    pg.add_all(jobs)
+    pg.commit()
+    pending, running, abandoned = [job.id for job in jobs]
+    
+    assert generation_job_service._recover_pending_jobs(lambda: pg) == [pending, abandoned]
+    
+    assert pg.get(GenerationJob, running).status == GenerationJobStatus.RUNNING
+    assert pg.get(GenerationJob, abandoned).status == GenerationJobStatus.PENDING
+
+
+def test_enqueue_create_cv_template_not_found(client: TestClient):
+    project_id, _ = _create_project(client, "job5@example.com")
+    
+    response = client.post(
+        f"/api/v1/projects/{project_id}/cvs/jobs",
+        json={"project_id": project_id, "template_id": 99999},
+    )
+    assert response.status_code == 404
+
+
+def test_enqueue_create_cv_project_id_mismatch(client: TestClient):
+    project_id, template_id = _create_project(client, "job6@example.com")
+    
+    response = client.post(
+        f"/api/v1/projects/{project_id}/cvs/jobs",
+        json={"project_id": project_id + 1, "template_id": template_id},
+    )
+    assert response.status_code == 400
+
+
+def test_enqueue_regenerate_cv_not_found(client: TestClient):
+    response = client.post(
+        "/api/v1/cvs/99999/regenerate/jobs",
+        json={"messages": [{"role": "user", "content": "Test"}]},
+    )
+    assert response.status_code == 404
+
+
+def test_get_generation_job_not_found(client: TestClient):
+    response = client.get("/api/v1/generation-jobs/99999")
+    assert response.status_code == 404
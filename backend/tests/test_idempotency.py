@@ -0,0 +1,191 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database.models import IdempotencyKey, IdempotencyKeyStatus
+from app.services import idempotency_service
+from app.types.cv_content_types import GeneratedCVContentSimple, Experience, Skill
+from app.types.extraction_types import ExtractedProfileData, ExtractedSkill
+
+
+@pytest.fixture
+def mock_llm_response():
+    return GeneratedCVContentSimple(
+        firstname="Laura",
+        lastname="Soto",
+        email="laura@example.com",
+        phone="+56922222222",
+        address="Valparaíso, Chile",
+        summary="Desarrolladora frontend.",
+        experiences=[
+            Experience(title="Frontend Dev", company="Web Co", date="2020 - Presente", description="React."),
+        ],
+        education=[],
+        skills=[Skill(category="Frontend", skill_list="React, TypeScript")],
+        chat_response="He creado tu CV.",
+    )
+
+
+def _create_project(client: TestClient, email: str) -> tuple[int, int, int]:
+    user_id = client.post(
+        "/api/v1/users",
+        json={"email": email, "full_name": "Idem User", "password": "testpass123"},
+    ).json()["id"]
+    project_id = client.post(
+        f"/api/v1/projects?user_id={user_id}",
+        json={"name": "Proyecto Idempotente", "target_role": "Frontend"},
+    ).json()["id"]
+    template_id = client.get("/api/v1/templates").json()[0]["id"]
+    return user_id, project_id, template_id
+
+
+def test_create_cv_replays_response_for_same_key(client: TestClient, mock_llm_response):
+    _, project_id, template_id = _create_project(client, "idem1@example.com")
+    payload = {"project_id": project_id, "template_id": template_id}
+    headers = {"Idempotency-Key": "create-cv-1"}
+    
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.return_value = mock_llm_response
+        
+        first = client.post(f"/api/v1/projects/{project_id}/cvs", json=payload, headers=headers)
+        retry = client.post(f"/api/v1/projects/{project_id}/cvs", json=payload, headers=headers)
+        
+        mock_create.assert_called_once()
+    
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert len(client.get(f"/api/v1/projects/{project_id}/cvs").json()) == 1
+
+
+def test_reused_key_with_different_body_is_rejected(client: TestClient, mock_llm_response):
+    _, project_id, template_id = _create_project(client, "idem2@example.com")
+    headers = {"Idempotency-Key": "create-cv-2"}
+    
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.return_value = mock_llm_response
+        
+        client.post(
+            f"/api/v1/projects/{project_id}/cvs",
+            json={"project_id": project_id, "template_id": template_id},
+            headers=headers,
+        )
+        response = client.post(
+            f"/api/v1/projects/{project_id}/cvs",
+            json={
+                "project_id": project_id,
+                "template_id": template_id,
+                "messages": [{"role": "user", "content": "Otro CV"}],
+            },
+            headers=headers,
+        )
+    
+    assert response.status_code == 422
+
+
+def test_extract_profile_replay_does_not_duplicate_skills(client: TestClient):
+    user_id, _, _ = _create_project(client, "idem3@example.com")
+    extracted = ExtractedProfileData(
+        skills=[ExtractedSkill(skill_text="Go - 2 años", skill_type="dev-skill")],
+    )
+    
+    with patch("app.services.extraction_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.return_value = extracted
+        
+        for _ in range(2):
+            response = client.post(
+                f"/api/v1/users/{user_id}/extract-profile",
+                json={"text": "Trabajo con Go"},
+                headers={"Idempotency-Key": "extract-1"},
+            )
+        
+        mock_create.assert_called_once()
+    
+    assert response.status_code == 200
+    assert response.json()["skills_added"] == 1
+    skills = client.get(f"/api/v1/users/{user_id}/skills").json()
+    assert [skill["skill_text"] for skill in skills["dev_skills"]] == ["Go - 2 años"]
+
+
+def test_failed_request_releases_key(client: TestClient):
+    user_id, _, _ = _create_project(client, "idem4@example.com")
+    request = {
+        "json": {"text": "Trabajo con Rust"},
+        "headers": {"Idempotency-Key": "extract-2"},
+    }
+    
+    with patch("app.services.extraction_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.side_effect = [
+            RuntimeError("timeout"),
+            ExtractedProfileData(skills=[ExtractedSkill(skill_text="Rust", skill_type="dev-skill")]),
+        ]
+        
+        failed = client.post(f"/api/v1/users/{user_id}/extract-profile", **request)
+        retried = client.post(f"/api/v1/users/{user_id}/extract-profile", **request)
+    
+    assert failed.status_code == 500
+    assert retried.status_code == 200
+    assert retried.json()["skills_added"] == 1
+
+
+def test_in_progress_duplicate_waits_for_original(pg, monkeypatch):
+    monkeypatch.setattr(idempotency_service, "POLL_INTERVAL_SECONDS", 0.01)
+    calls = 0
+    
+    async def operation():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"call": calls}
+    
+    async def concurrent_requests():
+        with Session(bind=pg.get_bind()) as first_db, Session(bind=pg.get_bind()) as second_db:
+            return await asyncio.gather(
+                idempotency_service.execute(first_db, "key-1", "POST /test", {"a": 1}, 201, operation),
+                idempotency_service.execute(second_db, "key-1", "POST /test", {"a": 1}, 201, operation),
+            )
+    
+    original, duplicate = asyncio.run(concurrent_requests())
+    
+    assert calls == 1
+    assert json.loads(original.body) == json.loads(duplicate.body) == {"call": 1}
+    assert duplicate.headers["Idempotent-Replayed"] == "true"
+
+
+def test_long_running_request_keeps_its_key(pg, monkeypatch):
+    # Un duplicado deja de esperar rápido, pero la reserva de la key dura más
+    monkeypatch.setattr(settings, "idempotency_wait_seconds", 0)
+    
+    async def slow_operation():
+        # Otra request limpiando keys vencidas mientras esta sigue en curso
+        with Session(bind=pg.get_bind()) as other_db:
+            idempotency_service._purge_expired(other_db)
+        return {"done": True}
+    
+    asyncio.run(idempotency_service.execute(pg, "key-2", "POST /test", {"a": 1}, 201, slow_operation))
+    
+    record = idempotency_service._get(pg, "key-2", "POST /test")
+    assert record.status == IdempotencyKeyStatus.COMPLETED
+
+
+def test_expired_lease_is_stored_again_on_completion(pg):
+    async def operation():
+        with Session(bind=pg.get_bind()) as other_db:
+            other_db.query(IdempotencyKey).delete()
+            other_db.commit()
+        return {"done": True}
+    
+    asyncio.run(idempotency_service.execute(pg, "key-3", "POST /test", {"a": 1}, 201, operation))
+    
+    async def replay():
+        return await idempotency_service.execute(pg, "key-3", "POST /test", {"a": 1}, 201, operation)
+    
+    response = asyncio.run(replay())
+    assert response.headers["Idempotent-Replayed"] == "true"
+    assert json.loads(response.body) == {"done": True}
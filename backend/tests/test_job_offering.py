@@ -1,7 +1,12 @@
+import asyncio
+
 import pytest
 from datetime import datetime
 
+from app.admin.admin import JobOfferingAdmin
 from app.database.models import JobOffering
+from app.schemas.job_offering_schema import JobOfferingCreate, JobOfferingUpdate
+from app.services import job_offering_service
 
 
 def test_list_job_offerings_empty(client):
@@ -419,3 +424,72 @@ def test_multiple_keywords_different_offerings(client, pg):
         assert len(data) == 1
         assert data[0]["keyword"] == keyword
 
+
+
+def test_clean_description_strips_html_and_caps_length():
+    raw = "<h2>Sobre el cargo</h2><p>Trabajarás con&nbsp;<b>Python</b> &amp; SQL.</p>" + "<p>palabra </p>" * 600
+    
+    text = job_offering_service.clean_description(raw)
+    
+    assert text.startswith("Sobre el cargo\nTrabajarás con Python & SQL.")
+    assert "<" not in text
+    assert len(text) <= job_offering_service.DESCRIPTION_TEXT_MAX_CHARS + 1
+    assert text.endswith("palabra…")
+    assert job_offering_service.clean_description(None) is None
+
+
+def test_create_and_update_job_offering_store_clean_description(pg):
+    offering = job_offering_service.create_job_offering(pg, JobOfferingCreate(
+        id="job-clean", keyword="data", description="<p>Analista <i>de datos</i></p>"
+    ))
+    assert offering.description_text == "Analista de datos"
+    
+    offering = job_offering_service.update_job_offering(
+        pg, "job-clean", JobOfferingUpdate(description="<div>Data Engineer</div>")
+    )
+    assert offering.description_text == "Data Engineer"
+
+
+def test_normalized_description_has_snippet_and_tokens(pg):
+    offering = job_offering_service.create_job_offering(pg, JobOfferingCreate(
+        id="job-snippet", keyword="data", description="<p>Primera línea</p><p>" + "dato " * 200 + "</p>"
+    ))
+    
+    assert offering.description_snippet.startswith("Primera línea dato")
+    assert "\n" not in offering.description_snippet
+    assert len(offering.description_snippet) <= job_offering_service.DESCRIPTION_SNIPPET_MAX_CHARS + 1
+    assert offering.description_tokens == len(offering.description_text) // 4 + 1
+
+
+def test_backfill_descriptions_processes_rows_in_chunks(client, pg):
+    for i in range(5):
+        pg.add(JobOffering(id=f"legacy-{i}", keyword="legacy", description=f"<b>Oferta {i}</b>"))
+    pg.add(JobOffering(id="legacy-empty", keyword="legacy"))
+    pg.commit()
+    
+    assert job_offering_service.backfill_descriptions(pg, chunk_size=2) == 5
+    assert job_offering_service.backfill_descriptions(pg, chunk_size=2) == 0
+    
+    response = client.get("/api/v1/job-offerings/legacy-3")
+    assert response.json()["description_text"] == "Oferta 3"
+    assert response.json()["description_snippet"] == "Oferta 3"
+    assert response.json()["description_tokens"] == 3
+    
+    assert job_offering_service.backfill_descriptions(pg, chunk_size=2, recompute=True) == 5
+
+
+def test_admin_edit_normalizes_description(pg):
+    offering = JobOffering(id="admin-1", keyword="python", description="<p>Antes</p>")
+    job_offering_service.normalize_description(offering)
+    pg.add(offering)
+    pg.commit()
+    
+    # Igual que sqladmin: on_model_change antes de copiar el formulario al modelo
+    data = {"description": "<p>Python y <b>FastAPI</b></p>"}
+    asyncio.run(JobOfferingAdmin().on_model_change(data, offering, False, None))
+    for key, value in data.items():
+        setattr(offering, key, value)
+    pg.commit()
+    
+    assert offering.description_text == "Python y FastAPI"
+    assert offering.description_snippet == "Python y FastAPI"
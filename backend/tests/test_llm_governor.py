@@ -0,0 +1,165 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from anthropic import InternalServerError, RateLimitError
+from fastapi.testclient import TestClient
+
+from app.services import llm_governor_service
+from app.services.llm_governor_service import BreakerState, LLMGovernor, LLMUnavailableError
+
+
+@pytest.fixture(autouse=True)
+def fresh_governor():
+    llm_governor_service.reset_governor()
+    yield
+    llm_governor_service.reset_governor()
+
+
+def _provider_error(status_code: int):
+    response = httpx.Response(status_code, request=httpx.Request("POST", "https://api.anthropic.com/v1/messages"))
+    error_class = RateLimitError if status_code == 429 else InternalServerError
+    return error_class("provider error", response=response, body=None)
+
+
+def _governor(**kwargs) -> LLMGovernor:
+    defaults = {"max_in_flight": 2, "backoff_base_seconds": 0, "backoff_max_seconds": 0}
+    return LLMGovernor(**{**defaults, **kwargs})
+
+
+def test_governor_limits_in_flight_calls():
+    governor = _governor(max_in_flight=2)
+    in_flight = 0
+    max_in_flight = 0
+    max_queue_depth = 0
+    
+    async def fake_call():
+        nonlocal in_flight, max_in_flight, max_queue_depth
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        max_queue_depth = max(max_queue_depth, governor.queue_depth)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return "ok"
+    
+    async def run():
+        return await asyncio.gather(*(governor.call(10, fake_call) for _ in range(6)))
+    
+    assert asyncio.run(run()) == ["ok"] * 6
+    assert max_in_flight == 2
+    assert max_queue_depth > 0
+    assert governor.in_flight == 0
+    assert governor.queue_depth == 0
+
+
+def test_governor_retries_rate_limits():
+    governor = _governor()
+    attempts = 0
+    
+    async def flaky_call():
+        nonlocal attempts
+        attempts += 1
+        if attempts < 3:
+            raise _provider_error(429 if attempts == 1 else 529)
+        return "ok"
+    
+    assert asyncio.run(governor.call(10, flaky_call)) == "ok"
+    assert attempts == 3
+    assert governor.consecutive_failures == 0
+
+
+def test_governor_gives_up_after_max_retries():
+    governor = _governor(max_retries=2, breaker_failure_threshold=10)
+    attempts = 0
+    
+    async def overloaded_call():
+        nonlocal attempts
+        attempts += 1
+        raise _provider_error(529)
+    
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(governor.call(10, overloaded_call))
+    assert attempts == 3
+
+
+def test_governor_does_not_retry_other_errors():
+    governor = _governor()
+    attempts = 0
+    
+    async def failing_call():
+        nonlocal attempts
+        attempts += 1
+        raise ValueError("invalid output")
+    
+    with pytest.raises(ValueError):
+        asyncio.run(governor.call(10, failing_call))
+    assert attempts == 1
+    assert governor.consecutive_failures == 0
+
+
+def test_circuit_breaker_opens_and_recovers():
+    governor = _governor(max_retries=0, breaker_failure_threshold=2, breaker_cooldown_seconds=0.05)
+    calls = 0
+    
+    async def server_error():
+        nonlocal calls
+        calls += 1
+        raise _provider_error(500)
+    
+    async def healthy_call():
+        nonlocal calls
+        calls += 1
+        return "ok"
+    
+    for _ in range(2):
+        with pytest.raises(InternalServerError):
+            asyncio.run(governor.call(10, server_error))
+    
+    assert governor.breaker_state == BreakerState.OPEN
+    with pytest.raises(LLMUnavailableError) as exc_info:
+        asyncio.run(governor.call(10, healthy_call))
+    assert exc_info.value.retry_after >= 1
+    assert calls == 2
+    
+    time.sleep(0.06)
+    assert governor.breaker_state == BreakerState.HALF_OPEN
+    assert asyncio.run(governor.call(10, healthy_call)) == "ok"
+    assert governor.breaker_state == BreakerState.CLOSED
+
+
+def test_governor_token_budget_delays_calls(monkeypatch):
+    monkeypatch.setattr(llm_governor_service, "TOKEN_WINDOW_SECONDS", 0.1)
+    governor = _governor(tokens_per_minute=100)
+    
+    async def fast_call():
+        return "ok"
+    
+    async def run():
+        started = time.monotonic()
+        await governor.call(80, fast_call)
+        await governor.call(80, fast_call)
+        return time.monotonic() - started
+    
+    assert asyncio.run(run()) >= 0.1
+    assert governor.tokens_last_minute() == 80
+
+
+def test_open_breaker_returns_503_with_retry_after(client: TestClient):
+    user_id = client.post(
+        "/api/v1/users",
+        json={"email": "governor@example.com", "full_name": "Governor User", "password": "testpass123"},
+    ).json()["id"]
+    governor = llm_governor_service.get_governor()
+    governor.consecutive_failures = governor.breaker_failure_threshold
+    governor._opened_at = time.monotonic()
+    
+    response = client.post(f"/api/v1/users/{user_id}/extract-profile", json={"text": "Sé Python"})
+    
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
+    
+    stats = client.get("/api/v1/metrics/llm-governor").json()
+    assert stats["breaker_state"] == "open"
+    assert stats["queue_depth"] == 0
+    assert stats["in_flight"] == 0
@@ -0,0 +1,165 @@
+import asyncio
+
+import pytest
+from anthropic import APIStatusError
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.services import llm_cassette_service, llm_provider_service, llm_service
+from app.services.llm_governor_service import GovernedLLMClient
+from app.services.llm_provider_service import FakeLLMClient
+from app.types.cv_content_types import GeneratedCVContentSimple
+from app.types.extraction_types import ExtractedProfileData
+
+
+def test_create_client_uses_configured_provider(monkeypatch):
+    monkeypatch.setattr(settings, "llm_provider", "fake")
+    monkeypatch.setattr(settings, "fake_llm_error_rate", 0.25)
+    
+    client = llm_provider_service.create_client()
+    
+    assert isinstance(client, GovernedLLMClient)
+    assert isinstance(client.inner, FakeLLMClient)
+    assert client.inner.error_rate == 0.25
+    
+    # Con Anthropic el SDK no reintenta: los reintentos son del governor
+    monkeypatch.setattr(settings, "llm_provider", "anthropic")
+    monkeypatch.setattr(settings, "anthropic_api_key", "test-key")
+    assert llm_provider_service.create_client().inner.client.max_retries == 0
+    
+    monkeypatch.setattr(settings, "llm_provider", "openai")
+    with pytest.raises(ValueError):
+        llm_provider_service.create_client()
+
+
+def test_fake_responses_are_schema_valid_and_deterministic():
+    messages = [{"role": "user", "content": "Genera un CV"}]
+    
+    cv = llm_provider_service.fake_response(GeneratedCVContentSimple, messages)
+    extracted = llm_provider_service.fake_response(ExtractedProfileData, messages)
+    
+    assert GeneratedCVContentSimple.model_validate(cv.model_dump()) == cv
+    assert len(cv.experiences) >= 2
+    assert "@" in cv.email
+    assert all(s.skill_type in {"experience", "dev-skill", "certificate", "extra"} for s in extracted.skills)
+    assert llm_provider_service.fake_response(GeneratedCVContentSimple, messages) == cv
+    assert llm_provider_service.fake_response(
+        GeneratedCVContentSimple, [{"role": "user", "content": "Otro prompt"}]
+    ) != cv
+
+
+def test_fake_client_error_rate():
+    client = FakeLLMClient(latency_median_ms=0, error_rate=1.0, seed=1)
+    
+    with pytest.raises(APIStatusError) as exc_info:
+        asyncio.run(client.chat.completions.create(
+            response_model=GeneratedCVContentSimple, messages=[]
+        ))
+    
+    assert exc_info.value.status_code == 529
+
+
+def test_fake_client_streams_partials():
+    client = FakeLLMClient(latency_median_ms=0)
+    
+    async def collect():
+        return [
+            partial
+            async for partial in client.chat.completions.create_partial(
+                response_model=GeneratedCVContentSimple, messages=[]
+            )
+        ]
+    
+    partials = asyncio.run(collect())
+    
+    assert len(partials) == len(GeneratedCVContentSimple.model_fields)
+    assert partials[-1].model_dump() == llm_provider_service.fake_response(
+        GeneratedCVContentSimple, []
+    ).model_dump()
+
+
+def test_create_cv_with_fake_provider(client: TestClient, monkeypatch):
+    monkeypatch.setattr(llm_service, "client", FakeLLMClient(latency_median_ms=0))
+    
+    user_id = client.post(
+        "/api/v1/users",
+        json={"email": "fake@example.com", "full_name": "Fake User", "password": "testpass123"},
+    ).json()["id"]
+    project_id = client.post(
+        f"/api/v1/projects?user_id={user_id}",
+        json={"name": "Proyecto Fake", "target_role": "QA"},
+    ).json()["id"]
+    template_id = client.get("/api/v1/templates").json()[0]["id"]
+    
+    response = client.post(
+        f"/api/v1/projects/{project_id}/cvs",
+        json={"project_id": project_id, "template_id": template_id},
+    )
+    
+    assert response.status_code == 201
+    assert response.json()["rendered_content"]
+    assert response.json()["conversation_history"][-1]["role"] == "assistant"
+
+
+def test_cassette_record_then_replay(tmp_path):
+    kwargs = {
+        "model": "claude-haiku-4-5",
+        "max_tokens": 4000,
+        "system": [{"type": "text", "text": "Instrucciones"}],
+        "messages": [{"role": "user", "content": "Genera un CV"}],
+    }
+    recorder = llm_cassette_service.wrap_client(
+        FakeLLMClient(latency_median_ms=0), "record", str(tmp_path)
+    )
+    
+    recorded = asyncio.run(recorder.chat.completions.create(response_model=GeneratedCVContentSimple, **kwargs))
+    
+    assert len(list(tmp_path.rglob("*.json"))) == 1
+    
+    # En replay el proveedor nunca se llama
+    player = llm_cassette_service.wrap_client(
+        FakeLLMClient(latency_median_ms=0, error_rate=1.0), "replay", str(tmp_path)
+    )
+    replayed = asyncio.run(player.chat.completions.create(response_model=GeneratedCVContentSimple, **kwargs))
+    
+    assert replayed == recorded
+    
+    with pytest.raises(llm_cassette_service.CassetteMissError):
+        asyncio.run(player.chat.completions.create(
+            response_model=GeneratedCVContentSimple, **{**kwargs, "model": "otro-modelo"}
+        ))
+
+
+def test_cassette_replays_streamed_responses(tmp_path):
+    kwargs = {"model": "claude-haiku-4-5", "max_tokens": 4000, "messages": [{"role": "user", "content": "CV"}]}
+    
+    async def collect(client):
+        return [
+            partial
+            async for partial in client.chat.completions.create_partial(
+                response_model=GeneratedCVContentSimple, **kwargs
+            )
+        ]
+    
+    recorded = asyncio.run(collect(llm_cassette_service.wrap_client(
+        FakeLLMClient(latency_median_ms=0), "record", str(tmp_path)
+    )))
+    replayed = asyncio.run(collect(llm_cassette_service.wrap_client(
+        FakeLLMClient(latency_median_ms=0), "replay", str(tmp_path)
+    )))
+    
+    assert len(replayed) == 1
+    assert replayed[0].model_dump() == recorded[-1].model_dump()
+
+
+def test_cassette_passthrough_returns_provider_client(monkeypatch):
+    monkeypatch.setattr(settings, "llm_provider", "fake")
+    monkeypatch.setattr(settings, "llm_cassette_mode", "passthrough")
+    assert isinstance(llm_provider_service.create_client(), GovernedLLMClient)
+    
+    monkeypatch.setattr(settings, "llm_cassette_mode", "replay")
+    assert isinstance(llm_provider_service.create_client(), llm_cassette_service.CassetteLLMClient)
+    
+    monkeypatch.setattr(settings, "llm_cassette_mode", "rewind")
+    with pytest.raises(ValueError):
+        llm_provider_service.create_client()
@@ -0,0 +1,315 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.database.models import LLMCacheEntry, LLMCall
+from app.services import llm_cache_service, llm_telemetry_service, prompt_service
+from app.types.cv_content_types import GeneratedCVContentSimple, Experience, Skill
+
+
+@pytest.fixture(autouse=True)
+def reset_cache_counters():
+    llm_cache_service.reset_counters()
+
+
+@pytest.fixture
+def mock_llm_response():
+    return GeneratedCVContentSimple(
+        firstname="Ana",
+        lastname="Rojas",
+        email="ana@example.com",
+        phone="+56911111111",
+        address="Santiago, Chile",
+        summary="Ingeniera de datos con 4 años de experiencia.",
+        experiences=[
+            Experience(title="Data Engineer", company="Data Co", date="2021 - Presente", description="Pipelines."),
+        ],
+        education=[],
+        skills=[Skill(category="Lenguajes", skill_list="Python, SQL")],
+        chat_response="He creado tu CV con 1 experiencia y 1 habilidad.",
+    )
+
+
+def _create_project(client: TestClient, email: str) -> tuple[int, int]:
+    user_id = client.post(
+        "/api/v1/users",
+        json={"email": email, "full_name": "Cache User", "password": "testpass123"},
+    ).json()["id"]
+    project_id = client.post(
+        f"/api/v1/projects?user_id={user_id}",
+        json={"name": "Proyecto Cache", "target_role": "Data Engineer"},
+    ).json()["id"]
+    template_id = client.get("/api/v1/templates").json()[0]["id"]
+    return project_id, template_id
+
+
+def test_llm_cache_stats_empty(client: TestClient):
+    response = client.get("/api/v1/metrics/llm-cache")
+    
+    assert response.status_code == 200
+    assert response.json() == {
+        "hits": 0,
+        "misses": 0,
+        "hit_rate": 0.0,
+        "entries": 0,
+        "size_bytes": 0,
+    }
+
+
+def test_identical_cv_generation_hits_cache(client: TestClient, mock_llm_response):
+    project_id, template_id = _create_project(client, "cache1@example.com")
+    payload = {
+        "project_id": project_id,
+        "template_id": template_id,
+        "messages": [{"role": "user", "content": "Genera un CV de datos"}],
+    }
+    
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.return_value = mock_llm_response
+        
+        first = client.post(f"/api/v1/projects/{project_id}/cvs", json=payload)
+        second = client.post(f"/api/v1/projects/{project_id}/cvs", json=payload)
+        
+        mock_create.assert_called_once()
+    
+    assert first.status_code == 201
+    assert second.status_code == 201
+    assert first.json()["id"] != second.json()["id"]
+    assert second.json()["content"] == first.json()["content"]
+    
+    stats = client.get("/api/v1/metrics/llm-cache").json()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+    assert stats["entries"] == 1
+    assert stats["size_bytes"] > 0
+
+
+def test_different_prompt_misses_cache(client: TestClient, mock_llm_response):
+    project_id, template_id = _create_project(client, "cache2@example.com")
+    
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.return_value = mock_llm_response
+        
+        for content in ("Enfócate en Python", "Enfócate en SQL"):
+            client.post(
+                f"/api/v1/projects/{project_id}/cvs",
+                json={
+                    "project_id": project_id,
+                    "template_id": template_id,
+                    "messages": [{"role": "user", "content": content}],
+                },
+            )
+        
+        assert mock_create.call_count == 2
+    
+    stats = client.get("/api/v1/metrics/llm-cache").json()
+    assert stats["hits"] == 0
+    assert stats["misses"] == 2
+    assert stats["entries"] == 2
+
+
+def test_expired_entry_is_a_miss(client: TestClient, pg, mock_llm_response):
+    key = llm_cache_service.build_cache_key(
+        "claude-haiku-4-5", 4000, [{"role": "user", "content": "prompt"}], GeneratedCVContentSimple
+    )
+    llm_cache_service.store_response(pg, key, "claude-haiku-4-5", mock_llm_response)
+    
+    entry = pg.query(LLMCacheEntry).filter(LLMCacheEntry.key == key).one()
+    entry.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    pg.commit()
+    
+    assert llm_cache_service.get_cached_response(pg, key, GeneratedCVContentSimple) is None
+
+
+def test_cache_evicts_least_recently_used(client: TestClient, pg, mock_llm_response, monkeypatch):
+    keys = [
+        llm_cache_service.build_cache_key(
+            "claude-haiku-4-5", 4000, [{"role": "user", "content": f"prompt {i}"}], GeneratedCVContentSimple
+        )
+        for i in range(3)
+    ]
+    llm_cache_service.store_response(pg, keys[0], "claude-haiku-4-5", mock_llm_response)
+    entry_size = pg.query(LLMCacheEntry).one().size_bytes
+    monkeypatch.setattr(settings, "llm_cache_max_bytes", entry_size * 2)
+    
+    llm_cache_service.store_response(pg, keys[1], "claude-haiku-4-5", mock_llm_response)
+    pg.query(LLMCacheEntry).filter(LLMCacheEntry.key == keys[0]).update(
+        {"last_accessed_at": datetime.utcnow() + timedelta(seconds=1)}
+    )
+    pg.commit()
+    llm_cache_service.store_response(pg, keys[2], "claude-haiku-4-5", mock_llm_response)
+    
+    remaining = {key for (key,) in pg.query(LLMCacheEntry.key).all()}
+    assert remaining == {keys[0], keys[2]}
+
+
+def test_cache_key_ignores_trailing_whitespace():
+    key_a = llm_cache_service.build_cache_key(
+        "claude-haiku-4-5", 4000, [{"role": "user", "content": "hola  \nmundo"}], GeneratedCVContentSimple
+    )
+    key_b = llm_cache_service.build_cache_key(
+        "claude-haiku-4-5", 4000, [{"role": "user", "content": "hola\nmundo\n"}], GeneratedCVContentSimple
+    )
+    key_c = llm_cache_service.build_cache_key(
+        "claude-haiku-4-5", 2000, [{"role": "user", "content": "hola\nmundo"}], GeneratedCVContentSimple
+    )
+    
+    assert key_a == key_b
+    assert key_a != key_c
+
+
+def test_system_blocks_are_not_shared_between_prompts():
+    first = prompt_service.assemble_prompt("INSTRUCCIONES", GeneratedCVContentSimple, "a")
+    first.system[0]["cache_control"]["type"] = "persistent"
+    first.system.append({"type": "text", "text": "extra"})
+    
+    second = prompt_service.assemble_prompt("INSTRUCCIONES", GeneratedCVContentSimple, "b")
+    
+    assert second.system == [{
+        "type": "text",
+        "text": first.system[0]["text"],
+        "cache_control": {"type": "ephemeral"},
+    }]
+
+def test_cv_generation_records_llm_call(client: TestClient, pg, mock_llm_response):
+    project_id, template_id = _create_project(client, "telemetry1@example.com")
+    
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.return_value = mock_llm_response
+        client.post(
+            f"/api/v1/projects/{project_id}/cvs",
+            json={
+                "project_id": project_id,
+                "template_id": template_id,
+                "messages": [{"role": "user", "content": "Genera un CV"}],
+            },
+        )
+    
+    call = pg.query(LLMCall).one()
+    assert call.endpoint == "generate_cv"
+    assert call.model == "claude-haiku-4-5"
+    assert call.outcome == "success"
+    assert call.user_id is not None
+    assert call.latency_ms >= 0
+
+
+def test_failed_llm_call_is_recorded_as_error(client: TestClient, pg):
+    project_id, template_id = _create_project(client, "telemetry2@example.com")
+    
+    with patch("app.services.llm_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.side_effect = RuntimeError("overloaded")
+        with pytest.raises(RuntimeError):
+            client.post(
+                f"/api/v1/projects/{project_id}/cvs",
+                json={
+                    "project_id": project_id,
+                    "template_id": template_id,
+                    "messages": [{"role": "user", "content": "Genera un CV"}],
+                },
+            )
+    
+    call = pg.query(LLMCall).one()
+    assert call.outcome == "error"
+    assert call.error == "overloaded"
+
+
+class FakeStream:
+    """Como `anthropic.AsyncStream`: iterable y con `close()`."""
+    
+    def __init__(self, events):
+        self.events = events
+        self.closed = False
+    
+    def __aiter__(self):
+        return self.events
+    
+    async def close(self):
+        self.closed = True
+
+
+def test_streamed_cv_generation_records_usage(client: TestClient, pg, mock_llm_response):
+    project_id, template_id = _create_project(client, "telemetry3@example.com")
+    
+    async def events():
+        yield SimpleNamespace(type="message_start", message=SimpleNamespace(usage=SimpleNamespace(
+            input_tokens=1200, output_tokens=1, cache_read_input_tokens=800, cache_creation_input_tokens=0,
+        )))
+        yield SimpleNamespace(type="content_block_delta")
+        yield SimpleNamespace(type="message_delta", usage=SimpleNamespace(output_tokens=350))
+    
+    async def messages_create(**kwargs):
+        return FakeStream(events())
+    
+    async def create_partial(**kwargs):
+        # Como instructor: pide el stream a `messages.create` del SDK y lo consume
+        stream = await llm_telemetry_service.record_stream_usage(messages_create)(stream=True)
+        async for _ in stream:
+            pass
+        yield mock_llm_response
+    
+    with patch("app.services.llm_service.client.chat.completions.create_partial", side_effect=create_partial):
+        response = client.post(
+            f"/api/v1/projects/{project_id}/cvs/stream",
+            json={
+                "project_id": project_id,
+                "template_id": template_id,
+                "messages": [{"role": "user", "content": "Genera un CV"}],
+            },
+        )
+    
+    assert response.status_code == 200
+    call = pg.query(LLMCall).one()
+    assert call.endpoint == "stream_cv"
+    assert call.input_tokens == 1200
+    assert call.output_tokens == 350
+    assert call.cache_read_tokens == 800
+
+
+def test_llm_call_stats_percentiles(client: TestClient, pg):
+    for latency in range(1, 101):
+        pg.add(LLMCall(
+            endpoint="generate_cv",
+            model="claude-haiku-4-5",
+            input_tokens=10,
+            output_tokens=5,
+            cache_read_tokens=100,
+            cache_write_tokens=0,
+            latency_ms=latency,
+            retry_count=1 if latency == 100 else 0,
+            outcome="error" if latency > 98 else "success",
+        ))
+    pg.add(LLMCall(
+        endpoint="extract_profile",
+        model="claude-haiku-4-5",
+        input_tokens=1,
+        output_tokens=1,
+        cache_read_tokens=0,
+        cache_write_tokens=0,
+        latency_ms=7,
+        retry_count=0,
+        outcome="success",
+    ))
+    pg.commit()
+    
+    response = client.get("/api/v1/metrics/llm-calls?endpoint=generate_cv")
+    
+    assert response.status_code == 200
+    stats = response.json()
+    assert len(stats) == 1
+    assert stats[0]["endpoint"] == "generate_cv"
+    assert stats[0]["calls"] == 100
+    assert stats[0]["errors"] == 2
+    assert stats[0]["retries"] == 1
+    assert stats[0]["latency_p50_ms"] == 50
+    assert stats[0]["latency_p95_ms"] == 95
+    assert stats[0]["latency_p99_ms"] == 99
+    assert stats[0]["input_tokens"] == 1000
+    assert stats[0]["cache_read_tokens"] == 10000
+    
+    all_stats = client.get("/api/v1/metrics/llm-calls").json()
+    assert {row["endpoint"] for row in all_stats} == {"generate_cv", "extract_profile"}
@@ -0,0 +1,386 @@
+import asyncio
+import sys
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.services import generation_job_service, llm_service, pdf_service
+from app.services.llm_provider_service import FakeLLMClient
+from app.services.pdf_service import TypstCompileError, TypstCompiler
+from app.services.typst_watch_service import TypstSessionManager
+
+
+# Reemplazo del CLI de typst: escribe un "PDF" (o "PNG") con el código fuente y
+# deja registro de cada invocación. Falla si el código contiene `#fail`. En modo
+# `watch` recompila cada vez que cambia el archivo, como el CLI real.
+FAKE_TYPST = f"""#!{sys.executable}
+import sys, time
+args = sys.argv[1:]
+with open(__file__ + ".log", "a") as log:
+    log.write(" ".join(args) + "\\n")
+if args[0] == "watch":
+    compiled = None
+    while True:
+        source = open(args[-2], encoding="utf-8").read()
+        if source != compiled:
+            compiled = source
+            if "#fail" in source:
+                sys.stderr.write("[12:00:00] compiled with errors\\nerror: unknown variable: fail\\n")
+            else:
+                open(args[-1], "w", encoding="utf-8").write("%PDF-1.7\\n" + source)
+                sys.stderr.write("[12:00:00] compiled successfully in 1.00ms\\n")
+            sys.stderr.flush()
+        time.sleep(0.01)
+source = open(args[-2], encoding="utf-8").read()
+if "#sleep" in source:
+    time.sleep(0.1)
+if "#fail" in source:
+    sys.stderr.write("error: unknown variable: fail")
+    sys.exit(1)
+header = "PNG" if args[-1].endswith(".png") else "%PDF-1.7"
+open(args[-1], "w", encoding="utf-8").write(header + "\\n" + source)
+"""
+
+
+@pytest.fixture
+def fake_typst(tmp_path, monkeypatch):
+    binary = tmp_path / "typst"
+    binary.write_text(FAKE_TYPST)
+    binary.chmod(0o755)
+    monkeypatch.setattr(settings, "typst_binary", str(binary))
+    monkeypatch.setattr(settings, "pdf_artifact_dir", str(tmp_path / "artifacts"))
+    pdf_service.reset_compiler()
+    yield binary
+    pdf_service.reset_compiler()
+
+
+def _invocations(binary, output_suffix: str = ".pdf") -> list[str]:
+    log = binary.parent / "typst.log"
+    lines = log.read_text().splitlines() if log.exists() else []
+    return [line for line in lines if line.endswith(output_suffix)]
+
+
+def test_compiler_stores_pdf_by_content_hash(fake_typst, tmp_path):
+    compiler = TypstCompiler(str(fake_typst), 2, 5, tmp_path / "pdfs", package_dir=tmp_path)
+    
+    async def compile_twice():
+        first = await compiler.compile("= Hola")
+        second = await compiler.compile("= Hola")
+        return first, second
+    
+    first, second = asyncio.run(compile_twice())
+    
+    assert first == second == compiler.artifact_path("= Hola")
+    assert first.read_text().startswith("%PDF")
+    assert len(_invocations(fake_typst)) == 1
+    assert f"--package-path {tmp_path}" in _invocations(fake_typst)[0]
+    assert compiler.stats().compiles == 1
+    assert compiler.stats().cache_hits == 1
+
+
+def test_compiler_bounds_concurrent_processes(fake_typst, tmp_path):
+    compiler = TypstCompiler(str(fake_typst), 2, 5, tmp_path / "pdfs")
+    max_queue_depth = 0
+    
+    async def compile_many():
+        nonlocal max_queue_depth
+        tasks = [asyncio.create_task(compiler.compile(f"#sleep {i}")) for i in range(4)]
+        # Dos iguales comparten una sola compilación
+        tasks.append(asyncio.create_task(compiler.compile("#sleep 0")))
+        await asyncio.sleep(0.05)
+        max_queue_depth = compiler.queue_depth
+        assert compiler.in_flight == 2
+        return await asyncio.gather(*tasks)
+    
+    started = time.monotonic()
+    paths = asyncio.run(compile_many())
+    
+    assert time.monotonic() - started >= 0.2
+    assert max_queue_depth == 2
+    assert paths[0] == paths[4]
+    assert len(_invocations(fake_typst)) == 4
+    assert compiler.in_flight == 0
+
+
+def test_cancelled_compile_does_not_fail_waiters(fake_typst, tmp_path):
+    compiler = TypstCompiler(str(fake_typst), 2, 5, tmp_path / "pdfs")
+    
+    async def cancel_first():
+        first = asyncio.create_task(compiler.compile("#sleep"))
+        await asyncio.sleep(0.02)
+        # Llega mientras la primera compila y espera la misma compilación
+        second = asyncio.create_task(compiler.compile("#sleep"))
+        await asyncio.sleep(0.02)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+    
+    path = asyncio.run(cancel_first())
+    
+    assert path == compiler.artifact_path("#sleep")
+    assert path.read_text().startswith("%PDF")
+    assert compiler.in_flight == 0
+
+
+def test_compiler_errors(fake_typst, tmp_path):
+    compiler = TypstCompiler(str(fake_typst), 1, 5, tmp_path / "pdfs")
+    
+    with pytest.raises(TypstCompileError) as exc_info:
+        asyncio.run(compiler.compile("#fail"))
+    assert exc_info.value.status_code == 422
+    assert "unknown variable" in str(exc_info.value)
+    assert compiler.stats().errors == 1
+    
+    missing = TypstCompiler(str(tmp_path / "missing-typst"), 1, 5, tmp_path / "pdfs")
+    with pytest.raises(TypstCompileError) as exc_info:
+        asyncio.run(missing.compile("= Hola"))
+    assert exc_info.value.status_code == 503
+
+
+def _watch_compiler(binary, tmp_path, max_sessions=4, idle_seconds=60) -> TypstCompiler:
+    return TypstCompiler(
+        str(binary), 2, 5, tmp_path / "pdfs",
+        watch_sessions=TypstSessionManager(str(binary), [], max_sessions, idle_seconds),
+    )
+
+
+def test_watch_session_reuses_process(fake_typst, tmp_path):
+    compiler = _watch_compiler(fake_typst, tmp_path)
+    
+    async def edit():
+        try:
+            first = await compiler.compile("= Hola", session_key=1)
+            second = await compiler.compile("= Hola de nuevo", session_key=1)
+            again = await compiler.compile("= Hola", session_key=1)
+            return first, second, again, compiler.stats().watch_sessions
+        finally:
+            await compiler.watch_sessions.close()
+    
+    first, second, again, sessions = asyncio.run(edit())
+    
+    assert first == again == compiler.artifact_path("= Hola")
+    assert first.read_text() == "%PDF-1.7\n= Hola"
+    assert second.read_text() == "%PDF-1.7\n= Hola de nuevo"
+    assert sessions == 1
+    invocations = _invocations(fake_typst)
+    assert len(invocations) == 1
+    assert invocations[0].startswith("watch --root")
+    assert compiler.stats().compiles == 2
+    assert compiler.stats().cache_hits == 1
+
+
+def test_watch_sessions_are_capped_and_evicted(fake_typst, tmp_path):
+    compiler = _watch_compiler(fake_typst, tmp_path, max_sessions=2, idle_seconds=0.2)
+    
+    async def edit_many():
+        try:
+            for cv_id in range(3):
+                await compiler.compile(f"= CV {cv_id}", session_key=cv_id)
+            capped = compiler.watch_sessions.session_count
+            await asyncio.sleep(0.25)
+            evicted = await compiler.watch_sessions.evict_idle()
+            return capped, evicted
+        finally:
+            await compiler.watch_sessions.close()
+    
+    assert asyncio.run(edit_many()) == (2, 2)
+    assert compiler.watch_sessions.session_count == 0
+    assert len(_invocations(fake_typst)) == 3
+
+
+def test_watch_session_errors(fake_typst, tmp_path):
+    compiler = _watch_compiler(fake_typst, tmp_path)
+    
+    async def edit():
+        try:
+            with pytest.raises(TypstCompileError) as exc_info:
+                await compiler.compile("#fail", session_key=1)
+            # La sesión sigue viva y compila la siguiente edición
+            path = await compiler.compile("= Arreglado", session_key=1)
+            return exc_info.value, path
+        finally:
+            await compiler.watch_sessions.close()
+    
+    error, path = asyncio.run(edit())
+    
+    assert error.status_code == 422
+    assert "unknown variable" in str(error)
+    assert path.read_text() == "%PDF-1.7\n= Arreglado"
+    assert len(_invocations(fake_typst)) == 1
+    
+    missing = _watch_compiler(tmp_path / "missing-typst", tmp_path)
+    with pytest.raises(TypstCompileError) as exc_info:
+        asyncio.run(missing.compile("= Hola", session_key=1))
+    assert exc_info.value.status_code == 503
+    assert missing.watch_sessions.session_count == 0
+
+
+def _create_cv(client: TestClient, monkeypatch) -> int:
+    monkeypatch.setattr(llm_service, "client", FakeLLMClient(latency_median_ms=0))
+    user_id = client.post(
+        "/api/v1/users",
+        json={"email": "pdf@example.com", "full_name": "PDF User", "password": "testpass123"},
+    ).json()["id"]
+    project_id = client.post(f"/api/v1/projects?user_id={user_id}", json={"name": "Proyecto PDF"}).json()["id"]
+    template_id = client.get("/api/v1/templates").json()[0]["id"]
+    return client.post(
+        f"/api/v1/projects/{project_id}/cvs",
+        json={"project_id": project_id, "template_id": template_id},
+    ).json()["id"]
+
+
+def test_compile_cv_sets_compiled_path(client: TestClient, fake_typst, monkeypatch):
+    cv_id = _create_cv(client, monkeypatch)
+    
+    response = client.post(f"/api/v1/cvs/{cv_id}/compile")
+    
+    assert response.status_code == 200
+    compiled_path = response.json()["compiled_path"]
+    assert compiled_path.endswith(".pdf")
+    assert client.post(f"/api/v1/cvs/{cv_id}/compile").json()["compiled_path"] == compiled_path
+    assert len(_invocations(fake_typst)) == 1
+    
+    _wait_for_thumbnails(fake_typst, 1)
+    stats = client.get("/api/v1/metrics/pdf-compiler").json()
+    # El PDF y la miniatura que se genera al crear el CV
+    assert stats["compiles"] == 2
+    assert stats["cache_hits"] == 1
+    assert stats["queue_depth"] == 0
+    
+    # Editar el contenido deja el PDF anterior desactualizado
+    content = client.get(f"/api/v1/cvs/{cv_id}").json()["content"]
+    response = client.patch(f"/api/v1/cvs/{cv_id}", json={"content": {**content, "summary": "Otro resumen"}})
+    assert response.json()["compiled_path"] is None
+
+
+def test_compile_cv_errors(client: TestClient, fake_typst, monkeypatch):
+    assert client.post("/api/v1/cvs/99999/compile").status_code == 404
+    
+    cv_id = _create_cv(client, monkeypatch)
+    content = client.get(f"/api/v1/cvs/{cv_id}").json()["content"]
+    client.patch(f"/api/v1/cvs/{cv_id}", json={"content": {**content, "summary": "#fail"}})
+    
+    response = client.post(f"/api/v1/cvs/{cv_id}/compile")
+    
+    assert response.status_code == 422
+    assert "unknown variable" in response.json()["detail"]
+
+
+def test_download_cv_pdf(client: TestClient, fake_typst, monkeypatch):
+    cv_id = _create_cv(client, monkeypatch)
+    
+    response = client.get(f"/api/v1/cvs/{cv_id}/pdf")
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/pdf"
+    assert response.content.startswith(b"%PDF")
+    etag = response.headers["etag"]
+    assert etag == pdf_service.etag(client.get(f"/api/v1/cvs/{cv_id}").json()["rendered_content"])
+    assert client.get(f"/api/v1/cvs/{cv_id}").json()["compiled_path"]
+    
+    # Vista repetida: 304 sin compilar ni enviar el PDF
+    response = client.get(f"/api/v1/cvs/{cv_id}/pdf", headers={"If-None-Match": f'W/"otro", {etag}'})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    
+    response = client.get(f"/api/v1/cvs/{cv_id}/pdf", headers={"Range": "bytes=0-3"})
+    assert response.status_code == 206
+    assert response.content == b"%PDF"
+    assert response.headers["content-range"].startswith("bytes 0-3/")
+    
+    assert len(_invocations(fake_typst)) == 1
+
+
+def test_download_cv_pdf_recompiles_when_content_changes(client: TestClient, fake_typst, monkeypatch):
+    cv_id = _create_cv(client, monkeypatch)
+    first_etag = client.get(f"/api/v1/cvs/{cv_id}/pdf").headers["etag"]
+    
+    content = client.get(f"/api/v1/cvs/{cv_id}").json()["content"]
+    client.patch(f"/api/v1/cvs/{cv_id}", json={"content": {**content, "summary": "Resumen nuevo"}})
+    
+    response = client.get(f"/api/v1/cvs/{cv_id}/pdf", headers={"If-None-Match": first_etag})
+    
+    assert response.status_code == 200
+    assert response.headers["etag"] != first_etag
+    assert b"Resumen nuevo" in response.content
+    assert len(_invocations(fake_typst)) == 2
+    
+    assert client.get("/api/v1/cvs/99999/pdf").status_code == 404
+
+
+def _wait_for_thumbnails(binary, count: int) -> list[str]:
+    """Las miniaturas se generan en background: espera a que haya `count`."""
+    deadline = time.monotonic() + 5
+    while (
+        len(_invocations(binary, ".png")) < count or pdf_service._thumbnail_tasks
+    ) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return _invocations(binary, ".png")
+
+
+def test_cv_thumbnail(client: TestClient, fake_typst, monkeypatch):
+    cv_id = _create_cv(client, monkeypatch)
+    thumbnail_url = client.get(f"/api/v1/cvs/{cv_id}").json()["thumbnail_url"]
+    assert thumbnail_url.startswith(f"/api/v1/cvs/{cv_id}/thumbnail?v=")
+    
+    # La miniatura se genera en background al guardar el CV
+    thumbnails = _wait_for_thumbnails(fake_typst, 1)
+    assert len(thumbnails) == 1
+    assert f"--format png --ppi {settings.thumbnail_ppi} --pages 1" in thumbnails[0]
+    
+    response = client.get(thumbnail_url)
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert response.content.startswith(b"PNG")
+    assert response.headers["cache-control"] == "private, max-age=31536000, immutable"
+    etag = response.headers["etag"]
+    
+    response = client.get(f"/api/v1/cvs/{cv_id}/thumbnail", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["cache-control"] == "private, no-cache"
+    assert len(_invocations(fake_typst, ".png")) == 1
+    
+    # Editar el CV cambia la URL y regenera la miniatura
+    content = client.get(f"/api/v1/cvs/{cv_id}").json()["content"]
+    new_url = client.patch(
+        f"/api/v1/cvs/{cv_id}", json={"content": {**content, "summary": "Resumen nuevo"}}
+    ).json()["thumbnail_url"]
+    assert new_url != thumbnail_url
+    assert len(_wait_for_thumbnails(fake_typst, 2)) == 2
+    
+    response = client.get(thumbnail_url)
+    assert response.headers["cache-control"] == "private, no-cache"
+    assert b"Resumen nuevo" in response.content
+    assert len(_invocations(fake_typst, ".png")) == 2
+    
+    assert client.get("/api/v1/cvs/99999/thumbnail").status_code == 404
+
+
+def test_thumbnail_version_depends_on_ppi(fake_typst, monkeypatch):
+    source = "= Hola"
+    version = pdf_service.thumbnail_version(source)
+    etag = pdf_service.thumbnail_etag(source)
+    
+    monkeypatch.setattr(settings, "thumbnail_ppi", settings.thumbnail_ppi * 2)
+    pdf_service.reset_compiler()
+    
+    assert pdf_service.thumbnail_version(source) != version
+    assert pdf_service.thumbnail_etag(source) != etag
+
+
+def test_generation_job_renders_thumbnail(client: TestClient, pg, fake_typst, monkeypatch):
+    cv_id = _create_cv(client, monkeypatch)
+    _wait_for_thumbnails(fake_typst, 1)
+    job_id = client.post(f"/api/v1/cvs/{cv_id}/regenerate/jobs", json={"messages": [
+        {"role": "user", "content": "Agrega Kubernetes"}
+    ]}).json()["id"]
+    
+    # El job guarda el CV por cv_service, igual que los endpoints
+    asyncio.run(generation_job_service.process_job(pg, job_id))
+    
+    assert len(_wait_for_thumbnails(fake_typst, 2)) == 2
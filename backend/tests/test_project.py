@@ -1,5 +1,7 @@
 from fastapi import status
 
+from app.database.models import JobOffering
+
 
 def test_create_project(client):
     user_response = client.post("/api/v1/users", json={
@@ -149,6 +151,50 @@ def test_update_project_not_found(client):
     assert response.status_code == status.HTTP_404_NOT_FOUND
 
 
+
+def test_update_project_clears_job_offering(client, pg):
+    pg.add(JobOffering(id="offer-project-1", keyword="python", company_name="Acme", role_name="Backend"))
+    pg.commit()
+    
+    user_id = client.post("/api/v1/users", json={
+        "email": "offer-project@example.com",
+        "password": "password",
+        "full_name": "Test User"
+    }).json()["id"]
+    project_id = client.post(
+        f"/api/v1/projects?user_id={user_id}",
+        json={"name": "Postulación", "job_offering_id": "offer-project-1"},
+    ).json()["id"]
+    
+    response = client.patch(f"/api/v1/projects/{project_id}", json={"cv_style": "elegant"})
+    assert response.json()["job_offering_id"] == "offer-project-1"
+    
+    response = client.patch(f"/api/v1/projects/{project_id}", json={"job_offering_id": None, "name": None})
+    
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["job_offering_id"] is None
+    assert data["name"] == "Postulación"
+    assert data["cv_style"] == "elegant"
+
+
+def test_project_job_offering_not_found(client):
+    user_id = client.post("/api/v1/users", json={
+        "email": "offer-missing@example.com",
+        "password": "password",
+        "full_name": "Test User"
+    }).json()["id"]
+    
+    response = client.post(
+        f"/api/v1/projects?user_id={user_id}",
+        json={"name": "Postulación", "job_offering_id": "missing"},
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    
+    project_id = client.post(f"/api/v1/projects?user_id={user_id}", json={"name": "Postulación"}).json()["id"]
+    response = client.patch(f"/api/v1/projects/{project_id}", json={"job_offering_id": "missing"})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
 def test_delete_project(client):
     user_response = client.post("/api/v1/users", json={
         "email": "test@example.com",
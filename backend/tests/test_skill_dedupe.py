@@ -0,0 +1,131 @@
+from unittest.mock import AsyncMock, patch
+
+from fastapi import status
+
+from app.database.models import SkillType, UserSkills
+from app.schemas.user_skills_schema import UserSkillsCreate
+from app.services import skill_dedupe_service
+from app.types.extraction_types import ExtractedProfileData, ExtractedSkill
+
+
+def test_near_duplicate_index_matches_rephrased_skills():
+    index = skill_dedupe_service.NearDuplicateIndex(threshold=0.7)
+    index.add(1, SkillType.DEV_SKILL, "Python - 5 años, Django y FastAPI")
+    index.add(2, SkillType.EXTRA, "Python - 5 años")
+    index.add(3, SkillType.CERTIFICATE, "AWS Certified Developer (2022)")
+    
+    assert index.find(SkillType.DEV_SKILL, "Python (5 años), Django y FastAPI") == 1
+    assert index.find(SkillType.EXTRA, "python: 5 anos") == 2
+    assert index.find(SkillType.CERTIFICATE, "AWS Certified Developers - 2022") == 3
+    assert index.find(SkillType.EXTRA, "Python - 5 años, Django y FastAPI") is None
+    assert index.find(SkillType.CERTIFICATE, "Python - 5 años, Django y FastAPI") is None
+    assert index.find(SkillType.DEV_SKILL, "AWS Certified Developer") is None
+
+
+def test_near_duplicate_index_requires_matching_numbers():
+    index = skill_dedupe_service.NearDuplicateIndex(threshold=0.7)
+    index.add(1, SkillType.DEV_SKILL, "Python - 5 años")
+    index.add(2, SkillType.CERTIFICATE, "AWS Certified Developer (2019)")
+    
+    assert index.find(SkillType.DEV_SKILL, "Python - 10 años") is None
+    assert index.find(SkillType.CERTIFICATE, "AWS Certified Developer (2023)") is None
+
+
+def test_near_duplicate_index_uses_stricter_threshold_for_experience():
+    index = skill_dedupe_service.NearDuplicateIndex(threshold=0.7, experience_threshold=0.85)
+    index.add(1, SkillType.EXPERIENCE, "Desarrollador Backend en Falabella (2019-2021)")
+    index.add(2, SkillType.EXTRA, "Desarrollador Backend en Falabella (2019-2021)")
+    
+    # Dos cargos parecidos en la misma empresa son experiencias distintas...
+    assert index.find(SkillType.EXPERIENCE, "Desarrollador Frontend en Falabella (2019-2021)") is None
+    assert index.find(SkillType.EXTRA, "Desarrollador Frontend en Falabella (2019-2021)") == 2
+    # ...pero la misma experiencia reescrita es un duplicado
+    assert index.find(SkillType.EXPERIENCE, "Desarrollador backend en Falabella, 2019 - 2021") == 1
+
+
+def test_filter_near_duplicates_skips_existing_and_batch_duplicates():
+    existing = [UserSkills(id=1, skill_type=SkillType.DEV_SKILL, skill_text="Python - 5 años, Django y FastAPI")]
+    candidates = [
+        UserSkillsCreate(skill_text="Python, 5 años: Django y FastAPI", skill_type=SkillType.DEV_SKILL),
+        UserSkillsCreate(skill_text="Docker y Kubernetes en producción", skill_type=SkillType.DEV_SKILL),
+        UserSkillsCreate(skill_text="Docker + Kubernetes en producción", skill_type=SkillType.DEV_SKILL),
+    ]
+    
+    kept = skill_dedupe_service.filter_near_duplicates(existing, candidates, threshold=0.7)
+    
+    assert [skill.skill_text for skill in kept] == ["Docker y Kubernetes en producción"]
+
+
+def _create_user(client, email: str) -> int:
+    return client.post("/api/v1/users", json={
+        "email": email,
+        "password": "password",
+        "full_name": "Dedupe User"
+    }).json()["id"]
+
+
+def test_extract_profile_skips_near_duplicate_skills(client):
+    user_id = _create_user(client, "neardup@example.com")
+    client.post(f"/api/v1/users/{user_id}/skills", json={
+        "skill_text": "Python - 5 años, Django y FastAPI",
+        "skill_type": "dev-skill",
+    })
+    extracted = ExtractedProfileData(skills=[
+        ExtractedSkill(skill_text="Python (5 años), Django y FastAPI", skill_type="dev-skill"),
+        ExtractedSkill(skill_text="PostgreSQL y Redis", skill_type="dev-skill"),
+    ])
+    
+    with patch("app.services.extraction_service.client.chat.completions.create", new_callable=AsyncMock) as mock_create:
+        mock_create.return_value = extracted
+        response = client.post(f"/api/v1/users/{user_id}/extract-profile", json={"text": "Python"})
+    
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["skills_added"] == 1
+    skills = client.get(f"/api/v1/users/{user_id}/skills").json()["dev_skills"]
+    assert [skill["skill_text"] for skill in skills] == ["Python - 5 años, Django y FastAPI", "PostgreSQL y Redis"]
+
+
+EXPERIENCE = (
+    "Desarrollador Backend en Falabella (2019-2021). Diseñé APIs REST en Python "
+    "y FastAPI para el checkout."
+)
+EXPERIENCE_REPHRASED = (
+    "Desarrollador Backend en Falabella, 2019-2021: diseñé APIs REST con "
+    "Python/FastAPI para el checkout"
+)
+
+def test_compact_user_skills_marks_duplicates_as_superseded(client, pg):
+    user_id = _create_user(client, "compact@example.com")
+    ids = {}
+    for text, skill_type in [
+        ("Python - 5 años, Django", "dev-skill"),
+        ("Python (5 anos): Django.", "dev-skill"),
+        ("AWS Certified Developer", "dev-skill"),
+        (EXPERIENCE, "experience"),
+        (EXPERIENCE_REPHRASED, "experience"),
+        ("Desarrollador Backend en Falabella (2021-2023)", "experience"),
+        ("Desarrollador Frontend en Falabella (2019-2021)", "experience"),
+    ]:
+        response = client.post(f"/api/v1/users/{user_id}/skills", json={"skill_text": text, "skill_type": skill_type})
+        ids[text] = response.json()["id"]
+    
+    assert skill_dedupe_service.compact_user_skills(pg, user_id, dry_run=True) == 2
+    assert skill_dedupe_service.compact_user_skills(pg, user_id) == 2
+    assert skill_dedupe_service.compact_user_skills(pg, user_id) == 0
+    
+    skills = client.get(f"/api/v1/users/{user_id}/skills").json()
+    assert sorted(skill["skill_text"] for skill in skills["dev_skills"]) == [
+        "AWS Certified Developer",
+        "Python (5 anos): Django.",
+    ]
+    # La experiencia reescrita se compacta; otro período u otro cargo, no
+    assert sorted(skill["skill_text"] for skill in skills["experience"]) == sorted([
+        EXPERIENCE,
+        "Desarrollador Backend en Falabella (2021-2023)",
+        "Desarrollador Frontend en Falabella (2019-2021)",
+    ])
+    assert pg.get(UserSkills, ids[EXPERIENCE_REPHRASED]).superseded_by_id == ids[EXPERIENCE]
+
+    # El reemplazado no se borra
+    superseded = pg.get(UserSkills, ids["Python - 5 años, Django"])
+    assert superseded.superseded_by_id == ids["Python (5 anos): Django."]
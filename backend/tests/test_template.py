@@ -102,3 +102,60 @@ def test_render_template_with_loop(pg):
     assert "- JavaScript" in result
     assert "- Docker" in result
 
+
+
+def test_render_template_reuses_compiled_template(monkeypatch):
+    from app.services import template_service
+    
+    template_service.invalidate_template_cache()
+    compiles = []
+    original_compile = template_service._compile
+    monkeypatch.setattr(
+        template_service, "_compile", lambda name, source: compiles.append(name) or original_compile(name, source)
+    )
+    template = Template(id=501, template_content="Hola << name >>")
+    
+    assert template_service.render_template(template, {"name": "Ana"}) == "Hola Ana"
+    assert template_service.render_template(template, {"name": "Luis"}) == "Hola Luis"
+    assert len(compiles) == 1
+    
+    # Un template editado nunca usa la versión compilada anterior
+    template.template_content = "Chao << name >>"
+    assert template_service.render_template(template, {"name": "Ana"}) == "Chao Ana"
+    assert len(compiles) == 2
+    
+    template_service.invalidate_template_cache(501)
+    template_service.render_template(template, {"name": "Ana"})
+    assert len(compiles) == 3
+
+
+def test_template_cache_is_bounded(monkeypatch):
+    from app.config import settings
+    from app.services import template_service
+    
+    template_service.invalidate_template_cache()
+    monkeypatch.setattr(settings, "template_cache_size", 2)
+    
+    for template_id in range(3):
+        template_service.render_template(Template(id=template_id, template_content="<< x >>"), {"x": 1})
+    
+    stats = template_service.get_template_cache_stats()
+    assert stats["size"] == 2
+    assert stats["max_size"] == 2
+
+
+def test_template_bytecode_cache_on_disk(monkeypatch, tmp_path):
+    from app.config import settings
+    from app.services import template_service
+    
+    monkeypatch.setattr(settings, "template_bytecode_cache_dir", str(tmp_path))
+    monkeypatch.setattr(template_service, "_environment", template_service._create_environment())
+    template_service.invalidate_template_cache()
+    template = Template(id=502, template_content="<% for s in skills %><< s >> <% endfor %>")
+    
+    assert template_service.render_template(template, {"skills": ["Python", "Go"]}) == "Python Go "
+    assert len(list(tmp_path.iterdir())) == 1
+    
+    # Otro proceso (cache en memoria vacío) carga el bytecode desde disco
+    template_service.invalidate_template_cache()
+    assert template_service.render_template(template, {"skills": ["Rust"]}) == "Rust "
@@ -1,4 +1,13 @@
+import asyncio
+from datetime import datetime
+
 from fastapi import status
+from sqlalchemy import Column, DateTime, Enum, Integer, MetaData, String, Table, Text
+
+from app.admin.admin import UserSkillsAdmin
+from app.database.models import SkillType, UserSkills
+from app.services import user_skills_service
+from scripts.backfill_skill_fingerprints import upgrade_user_skills
 
 
 def test_create_user_skill_dev_skill(client):
@@ -214,3 +223,93 @@ def test_delete_user_skill_not_found(client):
     response = client.delete("/api/v1/skills/99999")
     assert response.status_code == status.HTTP_404_NOT_FOUND
 
+
+
+def test_create_duplicate_user_skill_returns_existing(client):
+    user_id = client.post("/api/v1/users", json={
+        "email": "dup@example.com",
+        "password": "password",
+        "full_name": "Dup User"
+    }).json()["id"]
+    
+    first = client.post(f"/api/v1/users/{user_id}/skills", json={"skill_text": "Python", "skill_type": "dev-skill"})
+    second = client.post(f"/api/v1/users/{user_id}/skills", json={"skill_text": "  python ", "skill_type": "dev-skill"})
+    other_type = client.post(f"/api/v1/users/{user_id}/skills", json={"skill_text": "Python", "skill_type": "extra"})
+    
+    assert second.json()["id"] == first.json()["id"]
+    assert other_type.json()["id"] != first.json()["id"]
+    
+    # Editar un skill para que quede igual a otro es un conflicto
+    response = client.patch(f"/api/v1/skills/{other_type.json()['id']}", json={"skill_type": "dev-skill"})
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+
+def test_admin_computes_skill_fingerprint(client, pg):
+    user_id = client.post("/api/v1/users", json={
+        "email": "admin-skill@example.com",
+        "password": "password",
+        "full_name": "Admin Skill"
+    }).json()["id"]
+    view = UserSkillsAdmin()
+    
+    # Igual que sqladmin: on_model_change antes de copiar el formulario al modelo
+    skill = UserSkills()
+    data = {"user_id": user_id, "skill_text": "Python", "skill_type": SkillType.DEV_SKILL, "source": "admin"}
+    asyncio.run(view.on_model_change(data, skill, True, None))
+    for key, value in data.items():
+        setattr(skill, key, value)
+    pg.add(skill)
+    pg.commit()
+    
+    assert skill.fingerprint == user_skills_service.skill_fingerprint("Python")
+    
+    data = {"skill_text": "Django"}
+    asyncio.run(view.on_model_change(data, skill, False, None))
+    skill.skill_text = data["skill_text"]
+    skill.fingerprint = data["fingerprint"]
+    pg.commit()
+    
+    response = client.post(f"/api/v1/users/{user_id}/skills", json={"skill_text": "django", "skill_type": "dev-skill"})
+    assert response.json()["id"] == skill.id
+
+
+def test_upgrade_backfills_fingerprints_and_collapses_duplicates(pg):
+    # Tabla como la creaba create_all antes de fingerprint y superseded_by_id
+    connection = pg.connection()
+    UserSkills.__table__.drop(connection)
+    legacy = Table(
+        "user_skills",
+        MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("user_id", Integer, nullable=False),
+        Column("skill_text", Text, nullable=False),
+        Column("skill_type", Enum(SkillType), nullable=False),
+        Column("raw_input", Text),
+        Column("source", String(100)),
+        Column("created_at", DateTime, nullable=False),
+        Column("updated_at", DateTime, nullable=False),
+    )
+    legacy.create(connection)
+    now = datetime.utcnow()
+    rows = [
+        (1, 1, "Python", SkillType.DEV_SKILL),
+        (2, 1, "python ", SkillType.DEV_SKILL),
+        (3, 1, "Python", SkillType.EXTRA),
+        (4, 2, "Python", SkillType.DEV_SKILL),
+        (5, 1, "Django", SkillType.DEV_SKILL),
+    ]
+    connection.execute(legacy.insert(), [
+        {"id": skill_id, "user_id": user_id, "skill_text": text, "skill_type": skill_type, "created_at": now, "updated_at": now}
+        for skill_id, user_id, text, skill_type in rows
+    ])
+    pg.commit()
+    
+    assert upgrade_user_skills(pg, chunk_size=2) == (5, 1)
+    
+    skills = pg.query(UserSkills).order_by(UserSkills.id).all()
+    assert [skill.id for skill in skills] == [1, 3, 4, 5]
+    assert all(skill.fingerprint == user_skills_service.skill_fingerprint(skill.skill_text) for skill in skills)
+    assert all(skill.superseded_by_id is None for skill in skills)
+    
+    # Segunda corrida: no queda nada por hacer
+    assert upgrade_user_skills(pg) == (0, 0)